@@ -0,0 +1,45 @@
+"""Encode time of the stdlib JSONRenderer against FastJSONRenderer.
+
+    DEBUG=True python benchmarks/bench_json.py [--scenes 50] [--performers 20]
+"""
+import argparse
+import io
+
+from common import best_time, build_dataset, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenes", type=int, default=50)
+    parser.add_argument("--performers", type=int, default=20)
+    parser.add_argument("--animations", type=int, default=4)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from puppetshowapp.parsers import FastJSONParser
+    from puppetshowapp.renderers import FastJSONRenderer, orjson
+    from puppetshowapp.serializers import UserSerializer
+
+    if orjson is None:
+        print("orjson is not installed, FastJSONRenderer is the stdlib renderer.")
+
+    user = build_dataset(args.scenes, args.performers, args.animations)
+    serializer = UserSerializer(user)
+    serializer.prefetch_instances([user])
+    data = serializer.data
+    body = JSONRenderer().render(data)
+    print(f"user document: {len(body) / 1024:.0f} KiB")
+
+    for name, renderer in (("stdlib", JSONRenderer()), ("fast", FastJSONRenderer())):
+        seconds = best_time(lambda: renderer.render(data), number=20)
+        print(f"render {name:<8} {seconds * 1e3:8.2f} ms")
+    for name, json_parser in (("stdlib", JSONParser()), ("fast", FastJSONParser())):
+        seconds = best_time(lambda: json_parser.parse(io.BytesIO(body)), number=20)
+        print(f"parse  {name:<8} {seconds * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
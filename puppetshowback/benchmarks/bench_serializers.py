@@ -0,0 +1,80 @@
+"""Per-object cost of the DRF serializers against fast_serializers.
+
+    DEBUG=True python benchmarks/bench_serializers.py [--scenes 20] [--performers 10]
+"""
+import argparse
+
+from common import best_time, build_dataset, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenes", type=int, default=20)
+    parser.add_argument("--performers", type=int, default=10)
+    parser.add_argument("--animations", type=int, default=4)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from puppetshowapp import fast_serializers
+    from puppetshowapp.models import Outfit, Scene
+    from puppetshowapp.models.new_models import Performer
+    from puppetshowapp.serializers import (
+        OutfitSerializerForPerformer,
+        SceneSerializer,
+        StageSerializer,
+    )
+
+    build_dataset(args.scenes, args.performers, args.animations)
+    performers = list(Performer.objects.all())
+    ordering = ("created_date", "identifier")
+
+    def drf_stage():
+        for performer in Performer.objects.filter(pk__in=[p.pk for p in performers]):
+            StageSerializer(performer).data
+
+    def fast_stage():
+        for performer in performers:
+            fast_serializers.stage_data(performer.identifier)
+
+    report(
+        "stage",
+        best_time(drf_stage, number=5),
+        best_time(fast_stage, number=5),
+        len(performers),
+    )
+
+    def drf_scenes():
+        queryset = Scene.objects.order_by(*ordering)
+        SceneSerializer(SceneSerializer().optimize_queryset(queryset), many=True).data
+
+    def fast_scenes():
+        fast_serializers.FastSceneSerializer(
+            list(Scene.objects.order_by(*ordering)), many=True
+        ).data
+
+    report(
+        "scene list (per scene)",
+        best_time(drf_scenes, number=5),
+        best_time(fast_scenes, number=5),
+        args.scenes,
+    )
+
+    outfits = list(Outfit.objects.order_by("pk"))
+
+    def drf_outfits():
+        OutfitSerializerForPerformer(outfits, many=True).data
+
+    def fast_outfits():
+        fast_serializers.FastOutfitSerializerForPerformer(outfits, many=True).data
+
+    report(
+        "outfit for performer",
+        best_time(drf_outfits, number=2),
+        best_time(fast_outfits, number=2),
+        len(outfits),
+    )
+
+
+if __name__ == "__main__":
+    main()
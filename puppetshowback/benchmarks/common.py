@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+# Benchmarks run against a throwaway test database built from the project's
+# settings, so they need the same environment variables as manage.py.
+# Run them with DEBUG=True to get the SQLite database.
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "puppetshowsite.settings")
+
+
+def setup_django():
+    import django
+
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, keepdb=False)
+
+
+# A user with scene_count scenes, each holding an outfit for every one of their
+# performer_count performers, each outfit with animation_count animations.
+def build_dataset(scene_count, performer_count, animation_count):
+    from puppetshowapp.models import Animation, DiscordPointingUser, Outfit, Scene
+    from puppetshowapp.models.new_models import Performer
+
+    user = DiscordPointingUser.objects.create(
+        discord_snowflake="1", discord_username="bench"
+    )
+    scenes = Scene.objects.bulk_create(
+        Scene(scene_author=user, scene_name=f"scene_{i}") for i in range(scene_count)
+    )
+    performers = Performer.objects.bulk_create(
+        Performer(
+            parent_user=user,
+            discord_snowflake=str(1000 + i),
+            discord_username=f"performer_{i}",
+        )
+        for i in range(performer_count)
+    )
+    outfits = Outfit.objects.bulk_create(
+        Outfit(scene=scene, performer=performer, outfit_name=performer.discord_username)
+        for scene in scenes
+        for performer in performers
+    )
+    types = [choice for choice, _ in Animation.Attributes.choices]
+    Animation.objects.bulk_create(
+        Animation(
+            outfit=outfit,
+            animation_type=types[i % len(types)],
+            animation_path=f"https://example.com/{i}.gif",
+        )
+        for outfit in outfits
+        for i in range(animation_count)
+    )
+    scenes[0].set_active()
+    return user
+
+
+# Runs func repeatedly and returns the best of a few rounds in seconds per call,
+# which is less noisy than the mean on a shared machine.
+def best_time(func, number=50, rounds=5):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def report(name, reference, fast, objects):
+    print(
+        f"{name:<28} drf {reference / objects * 1e6:9.1f} us/obj"
+        f"   fast {fast / objects * 1e6:9.1f} us/obj"
+        f"   x{reference / fast:5.1f}"
+    )
@@ -0,0 +1,7 @@
+import pytest
+
+
+# Going over a view's query_budget fails the test instead of logging a warning.
+@pytest.fixture(autouse=True)
+def enforce_query_budgets(settings):
+    settings.QUERY_BUDGET_ENFORCE = True
@@ -1,6 +1,16 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Scene, Outfit, DiscordPointingUser
+from django.template.response import TemplateResponse
+from django.utils.html import format_html
+from . import memory
+from .models import (
+    Scene,
+    Outfit,
+    DiscordPointingUser,
+    LogEntry,
+    LogFile,
+    RequestProfile,
+)
 from .forms import *
 
 
@@ -10,7 +20,7 @@ class CustomUserAdmin(BaseUserAdmin):
     # form = CustomUserChangeForm
     model = DiscordPointingUser
     date_hierarchy = "created_date"
-    list_display = ("uuid", "discord_snowflake")
+    list_display = ("uuid", "discord_snowflake", "performers_count")
     list_filter = ("uuid", "discord_snowflake")
 
     ordering = ("created_date",)
@@ -39,6 +49,7 @@ class SceneAdmin(admin.ModelAdmin):
     list_display = (
         "scene_name",
         "scene_author",
+        "outfits_count",
         # "view_actors_link"
     )
 
@@ -63,6 +74,7 @@ class SceneAdmin(admin.ModelAdmin):
 
 @admin.register(Outfit)
 class ActorAdmin(admin.ModelAdmin):
+    list_display = ("outfit_name", "scene", "animations_count")
     fieldsets = [
         ("Actor Information", {"fields": ["actor_base_user", "actor_hash", "scene"]}),
         (
@@ -78,3 +90,109 @@ class ActorAdmin(admin.ModelAdmin):
             },
         ),
     ]
+
+
+@admin.register(LogFile)
+class LogFileAdmin(admin.ModelAdmin):
+    list_display = ("id", "log_type", "created", "size", "stored_size", "encoding")
+    list_filter = ("log_type",)
+    date_hierarchy = "created"
+    readonly_fields = ("created", "size", "stored_size", "encoding")
+
+
+# Log search: filter by level and date, or look up a request id or fingerprint.
+# The full entry is served by ps/logs/<log>/download/ as the Range of its offset
+# and length.
+@admin.register(LogEntry)
+class LogEntryAdmin(admin.ModelAdmin):
+    list_display = ("timestamp", "level", "logger", "message", "request_id", "log")
+    list_filter = ("level",)
+    date_hierarchy = "timestamp"
+    search_fields = ("=request_id", "=fingerprint", "=logger")
+    ordering = ("-timestamp", "-id")
+    raw_id_fields = ("log",)
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# Profiles taken with the profile flag, see ProfilingMiddleware.
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        "created",
+        "user",
+        "method",
+        "path",
+        "status",
+        "duration_ms",
+        "query_count",
+        "mode",
+    )
+    list_filter = ("mode", "method")
+    date_hierarchy = "created"
+    search_fields = ("path",)
+    fields = (
+        ("created", "user", "mode"),
+        ("method", "path", "status"),
+        ("duration_ms", "query_count", "query_ms"),
+        "profile_file",
+        "formatted_report",
+    )
+    readonly_fields = (
+        "created",
+        "user",
+        "mode",
+        "method",
+        "path",
+        "status",
+        "duration_ms",
+        "query_count",
+        "query_ms",
+        "profile_file",
+        "formatted_report",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description="Report")
+    def formatted_report(self, obj):
+        return format_html("<pre>{}</pre>", obj.report)
+
+
+# The top allocation sites of a worker's latest memory snapshot, or their growth
+# since its first one, see memory.py. Served at admin-pages/memory/.
+def memory_report(request):
+    workers = sorted({snapshot["worker"] for snapshot in memory.list_snapshots()})
+    worker = request.GET.get("worker") or None
+    group = request.GET.get("group")
+    if group not in memory.GROUPS:
+        group = "lineno"
+    diff = bool(request.GET.get("diff"))
+    report = memory.report(worker, group, limit=50, since_first=diff)
+    context = {
+        **admin.site.each_context(request),
+        "title": "Memory",
+        "workers": workers,
+        "groups": memory.GROUPS,
+        "group": group,
+        "diff": diff,
+        "report": report,
+    }
+    if report is not None:
+        context["taken"] = report["snapshots"][-1]["taken"]
+        context["total"] = memory.format_size(report["total"])
+        context["rows"] = [
+            {
+                "site": entry["site"],
+                "size": memory.format_size(entry.get("size_diff", entry["size"])),
+                "count": entry.get("count_diff", entry["count"]),
+            }
+            for entry in report["sites"]
+        ]
+    return TemplateResponse(request, "admin/memory_report.html", context)
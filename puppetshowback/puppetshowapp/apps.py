@@ -5,3 +5,8 @@ class PuppetshowappConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "puppetshowapp"
     verbose_name = "Puppet Show Backend"
+
+    def ready(self):
+        from .models.counter_cache import connect_counter_signals
+
+        connect_counter_signals(self.get_models())
@@ -0,0 +1,263 @@
+import math
+import platform
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timezone
+
+import django
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from .models.authentication_models import DiscordPointingUser
+from .models.configuration_models import Outfit, Scene
+from .models.data_models import Animation
+from .models.new_models import Performer
+
+# Generated users are named PREFIX-<n>, which is how the benchmark finds them
+# and how --clear removes them again.
+PREFIX = "bench"
+SNOWFLAKE_BASE = 900000000000000000
+BENCHMARK_HOST = "benchmark.invalid"
+ENDPOINTS = ("stage", "user-info", "scene-list", "set-active")
+
+
+# A synthetic dataset shaped like production: every user has a few performers
+# and scenes, one of them active, with an outfit per performer in each scene.
+# The same seed and sizes always give the same rows, identifiers included, so
+# runs against the same dataset can be compared. Each user's rows come from a
+# generator of their own, and the users already generated are skipped, so a
+# second run only adds the users missing from the first. To change the seed or
+# the sizes of the existing users, clear_dataset() first.
+def generate_dataset(
+    users=100,
+    scenes_per_user=5,
+    performers_per_user=4,
+    outfits_per_scene=4,
+    animations_per_outfit=5,
+    seed=0,
+    batch_size=1000,
+):
+    outfits_per_scene = min(outfits_per_scene, performers_per_user)
+    animation_types = list(Animation.Attributes.values)
+
+    def make_uuid():
+        return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+    existing = set(
+        DiscordPointingUser.objects.filter(
+            login_username__startswith=f"{PREFIX}-"
+        ).values_list("login_username", flat=True)
+    )
+    user_rows, tokens, performers, scenes, outfits, animations = [], [], [], [], [], []
+    for index in range(users):
+        if f"{PREFIX}-{index}" in existing:
+            continue
+        rng = random.Random(f"{seed}-{index}")
+        user = DiscordPointingUser(
+            uuid=make_uuid(),
+            login_username=f"{PREFIX}-{index}",
+            discord_snowflake=str(SNOWFLAKE_BASE + index),
+            discord_username=f"{PREFIX} user {index}",
+            performers_count=performers_per_user,
+        )
+        user_rows.append(user)
+        tokens.append(Token(key=f"{rng.getrandbits(160):040x}", user=user))
+        user_performers = [
+            Performer(
+                identifier=make_uuid(),
+                parent_user=user,
+                discord_snowflake=str(snowflake),
+                discord_username=f"performer {snowflake}",
+                discord_avatar=f"https://cdn.discordapp.com/avatars/{snowflake}/a.png",
+            )
+            for snowflake in rng.sample(
+                range(SNOWFLAKE_BASE, SNOWFLAKE_BASE + 10**6), performers_per_user
+            )
+        ]
+        performers.extend(user_performers)
+        for scene_index in range(scenes_per_user):
+            scene = Scene(
+                identifier=make_uuid(),
+                scene_name=f"scene {scene_index}",
+                scene_author=user,
+                is_active=scene_index == 0,
+                outfits_count=outfits_per_scene,
+            )
+            scenes.append(scene)
+            for performer in rng.sample(user_performers, outfits_per_scene):
+                outfit = Outfit(
+                    identifier=make_uuid(),
+                    performer=performer,
+                    scene=scene,
+                    outfit_name=f"outfit {rng.randrange(1000)}",
+                    animations_count=animations_per_outfit,
+                )
+                outfits.append(outfit)
+                animations.extend(
+                    Animation(
+                        identifier=make_uuid(),
+                        outfit=outfit,
+                        animation_type=animation_types[i % len(animation_types)],
+                        animation_path=f"https://cdn.example.com/{rng.getrandbits(64):x}.gif",
+                    )
+                    for i in range(animations_per_outfit)
+                )
+
+    with transaction.atomic():
+        for model, rows in (
+            (DiscordPointingUser, user_rows),
+            (Token, tokens),
+            (Performer, performers),
+            (Scene, scenes),
+            (Outfit, outfits),
+            (Animation, animations),
+        ):
+            model.objects.bulk_create(rows, batch_size=batch_size)
+    return {
+        "users": len(user_rows),
+        "performers": len(performers),
+        "scenes": len(scenes),
+        "outfits": len(outfits),
+        "animations": len(animations),
+    }
+
+
+def clear_dataset():
+    users = DiscordPointingUser.objects.filter(login_username__startswith=f"{PREFIX}-")
+    count = users.count()
+    users.delete()
+    return count
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+# The requests of one endpoint, for a user picked from the generated dataset.
+def build_request(endpoint, user):
+    if endpoint == "stage":
+        return "get", reverse("stage-performance", args=[user["performer"]])
+    if endpoint == "user-info":
+        return "get", reverse("user-info")
+    if endpoint == "scene-list":
+        return "get", reverse("scene-list")
+    if endpoint == "set-active":
+        return "post", reverse("set-active-scene", args=[user["scene"]])
+    raise ValueError(f"Unknown endpoint {endpoint}")
+
+
+def benchmark_users(sample_size, rng):
+    users = list(
+        DiscordPointingUser.objects.filter(
+            login_username__startswith=f"{PREFIX}-"
+        ).values_list("uuid", "auth_token__key")
+    )
+    if not users:
+        raise ValueError(
+            "No generated users found, run the generateDataset command first."
+        )
+    users = rng.sample(users, min(sample_size, len(users)))
+    user_ids = [user_id for user_id, _ in users]
+    performers, scenes = {}, {}
+    for user_id, identifier in Performer.objects.filter(
+        parent_user_id__in=user_ids
+    ).values_list("parent_user_id", "identifier"):
+        performers.setdefault(user_id, []).append(identifier)
+    for user_id, identifier in Scene.objects.filter(
+        scene_author_id__in=user_ids
+    ).values_list("scene_author_id", "identifier"):
+        scenes.setdefault(user_id, []).append(identifier)
+    return [
+        {
+            "token": key,
+            "performers": performers.get(user_id, []),
+            "scenes": scenes.get(user_id, []),
+        }
+        for user_id, key in users
+        if performers.get(user_id) and scenes.get(user_id)
+    ]
+
+
+# Serves `requests` requests to each endpoint through the whole middleware stack
+# with Django's test client, and reports their latency percentiles and query
+# counts. set-active writes, so only run this against a throwaway database.
+def run_benchmarks(endpoints=ENDPOINTS, requests=200, warmup=20, users=50, seed=0):
+    rng = random.Random(seed)
+    sample = benchmark_users(users, rng)
+    client = Client(HTTP_HOST=BENCHMARK_HOST)
+    results = {}
+    with override_settings(
+        ALLOWED_HOSTS=[BENCHMARK_HOST],
+        QUERY_BUDGET_ENFORCE=False,
+        SERVER_TIMING=False,
+        STAGE_THROTTLE=False,
+    ):
+        for endpoint in endpoints:
+            latencies, queries = [], []
+            for iteration in range(warmup + requests):
+                user = rng.choice(sample)
+                method, url = build_request(
+                    endpoint,
+                    {
+                        "performer": rng.choice(user["performers"]),
+                        "scene": rng.choice(user["scenes"]),
+                    },
+                )
+                start = time.perf_counter()
+                response = getattr(client, method)(
+                    url, HTTP_AUTHORIZATION=f"Token {user['token']}"
+                )
+                elapsed = time.perf_counter() - start
+                if response.status_code >= 400:
+                    raise RuntimeError(
+                        f"{endpoint} answered {response.status_code} for {url}"
+                    )
+                if iteration >= warmup:
+                    latencies.append(elapsed * 1000)
+                    queries.append(response.wsgi_request.query_stats.count)
+            results[endpoint] = {
+                "requests": requests,
+                "p50_ms": round(percentile(latencies, 50), 3),
+                "p99_ms": round(percentile(latencies, 99), 3),
+                "mean_ms": round(statistics.fmean(latencies), 3),
+                "queries_per_request": round(statistics.fmean(queries), 2),
+                "max_queries": max(queries),
+            }
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+        },
+        "dataset": {
+            "users": DiscordPointingUser.objects.count(),
+            "performers": Performer.objects.count(),
+            "scenes": Scene.objects.count(),
+            "outfits": Outfit.objects.count(),
+            "animations": Animation.objects.count(),
+        },
+        "settings": {"requests": requests, "warmup": warmup, "users": len(sample)},
+        "results": results,
+    }
+
+
+# {endpoint: {metric: (baseline, current, change in percent)}} for the metrics
+# two benchmark runs share.
+def compare(baseline, current):
+    changes = {}
+    for endpoint, metrics in current["results"].items():
+        before = baseline.get("results", {}).get(endpoint)
+        if before is None:
+            continue
+        changes[endpoint] = {}
+        for metric in ("p50_ms", "p99_ms", "queries_per_request"):
+            old, new = before[metric], metrics[metric]
+            change = (new - old) / old * 100 if old else 0.0
+            changes[endpoint][metric] = (old, new, round(change, 1))
+    return changes
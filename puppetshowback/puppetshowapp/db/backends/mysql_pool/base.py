@@ -0,0 +1,56 @@
+from django.db.backends.mysql import base as mysql
+
+from ...pool import PoolTimeout, get_pool
+
+
+# The MySQL backend, with connections borrowed from a per-worker ConnectionPool.
+# Closing a connection returns it to the pool instead of closing the socket, so
+# with CONN_MAX_AGE = 0 every request, sync or ASGI, borrows a connection when it
+# first queries and gives it back when it finishes.
+# The pool is configured by the "POOL" key of the database's settings:
+#     "POOL": {"MAX_SIZE": 10, "TIMEOUT": 10, "RECYCLE": 3600, "CHECK_INTERVAL": 30}
+class DatabaseWrapper(mysql.DatabaseWrapper):
+    def get_pool(self, conn_params):
+        options = self.settings_dict.get("POOL", {})
+        # Keyed by the target as well as the alias, as the test runner renames
+        # the database of an alias once the test database is created.
+        key = (self.alias,) + tuple(
+            self.settings_dict[name] for name in ("HOST", "PORT", "NAME", "USER")
+        )
+        return get_pool(
+            key,
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            max_size=options.get("MAX_SIZE", 10),
+            timeout=options.get("TIMEOUT", 10.0),
+            recycle=options.get("RECYCLE", 3600.0),
+            check_interval=options.get("CHECK_INTERVAL", 30.0),
+            is_usable=ping,
+        )
+
+    def get_new_connection(self, conn_params):
+        try:
+            return self.get_pool(conn_params).acquire()
+        except PoolTimeout as e:
+            raise mysql.Database.OperationalError(str(e)) from e
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = self.get_pool(self.get_connection_params())
+        # A connection left inside a transaction or after an error is not trusted
+        # by the next borrower, unless rolling back works.
+        reusable = not self.in_atomic_block
+        if reusable:
+            try:
+                self.connection.rollback()
+            except mysql.Database.Error:
+                reusable = False
+        pool.release(self.connection, reusable=reusable)
+
+
+def ping(connection):
+    try:
+        connection.ping()
+    except mysql.Database.Error:
+        return False
+    return True
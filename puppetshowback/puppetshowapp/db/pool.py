@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# A bounded pool of DB-API connections, shared by every thread of one worker.
+# Connections are handed out most recently used first, so that idle ones age out
+# at the back. On checkout, a connection past its `recycle` age is replaced, and
+# one idle for longer than `check_interval` is pinged before it is handed out.
+# At most `max_size` connections exist at once. Past that, acquire() waits up to
+# `timeout` seconds for one to be released. A worker forked from a process that
+# already held connections starts over with an empty pool instead of sharing
+# the parent's sockets.
+class ConnectionPool:
+    def __init__(
+        self,
+        connect,
+        max_size=10,
+        timeout=10.0,
+        recycle=3600.0,
+        check_interval=30.0,
+        is_usable=None,
+    ):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.check_interval = check_interval
+        self.is_usable = is_usable
+        self.lock = threading.Condition()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        # (connection, last_used) of the connections waiting to be used.
+        self.idle = deque()
+        self.created_at = {}
+        self.size = 0
+        self.counters = dict.fromkeys(
+            ("created", "reused", "recycled", "failed_checks", "waits", "timeouts"), 0
+        )
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self.lock:
+            if self.pid != os.getpid():
+                self.reset()
+            while True:
+                connection = self.take_idle()
+                if connection is not None:
+                    self.counters["reused"] += 1
+                    return connection
+                if self.size < self.max_size:
+                    self.size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.counters["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No database connection was released within {self.timeout}s"
+                    )
+                self.counters["waits"] += 1
+                self.lock.wait(remaining)
+        # Connect outside the lock, it is the slow part.
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self.lock:
+                self.size -= 1
+                self.lock.notify()
+            raise
+        with self.lock:
+            self.created_at[connection] = time.monotonic()
+            self.counters["created"] += 1
+        return connection
+
+    # Called with the lock held. Pinging under the lock is fine, it only happens
+    # to connections that have been idle for a while.
+    def take_idle(self):
+        now = time.monotonic()
+        while self.idle:
+            connection, last_used = self.idle.pop()
+            if now - self.created_at[connection] > self.recycle:
+                self.counters["recycled"] += 1
+            elif (
+                now - last_used > self.check_interval
+                and self.is_usable is not None
+                and not self.is_usable(connection)
+            ):
+                self.counters["failed_checks"] += 1
+            else:
+                return connection
+            self.discard(connection)
+        return None
+
+    def release(self, connection, reusable=True):
+        with self.lock:
+            if self.pid != os.getpid() or connection not in self.created_at:
+                return
+            if reusable:
+                self.idle.append((connection, time.monotonic()))
+            else:
+                self.discard(connection)
+            self.lock.notify()
+
+    # Called with the lock held.
+    def discard(self, connection):
+        self.created_at.pop(connection, None)
+        self.size -= 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close_idle(self):
+        with self.lock:
+            while self.idle:
+                connection, _ = self.idle.pop()
+                self.discard(connection)
+            self.lock.notify_all()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "pid": self.pid,
+                "max_size": self.max_size,
+                "size": self.size,
+                "idle": len(self.idle),
+                "in_use": self.size - len(self.idle),
+                **self.counters,
+            }
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+# The pool for a database in this worker, created on first use.
+def get_pool(key, connect, **options):
+    with pools_lock:
+        if key not in pools:
+            pools[key] = ConnectionPool(connect, **options)
+        return pools[key]
+
+
+# [{"alias": alias, **stats}] for every pool in this worker.
+def pool_stats():
+    with pools_lock:
+        return [{"alias": key[0], **pool.stats()} for key, pool in pools.items()]
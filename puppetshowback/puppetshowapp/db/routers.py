@@ -0,0 +1,102 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ..metrics import count_cache_lookup
+from ..stage_cache import bump_stage_version
+
+# The replica that a view that opted in with ReplicaReadsMixin reads from while
+# its handler runs, and False otherwise. It is picked once per request, so that
+# a response is not made of rows from replicas lagging behind by different amounts.
+replica_reads = ContextVar("replica_reads", default=False)
+# Set once the current request has written to the database.
+wrote = ContextVar("wrote", default=False)
+
+
+def replicas():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+def pick_replica():
+    return random.choice(replicas()) if replicas() else False
+
+
+def pin_key(user_id):
+    return f"replica-pin:{user_id}"
+
+
+# Sends the user's reads to the primary for REPLICA_PIN_SECONDS, so that they
+# see their own writes however far the replicas lag behind.
+def pin_to_primary(user_id):
+    cache.set(pin_key(user_id), True, getattr(settings, "REPLICA_PIN_SECONDS", 5))
+
+
+def is_pinned(user_id):
+    if user_id is None:
+        return False
+    pinned = cache.get(pin_key(user_id)) is not None
+    count_cache_lookup("replica-pin", pinned)
+    return pinned
+
+
+@contextmanager
+def primary_reads():
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+# Sends reads to the request's replica in the views that allow it, and
+# everything else to the primary. Writes always go to the primary and are
+# noted, so that ReplicaPinMiddleware can pin the writer to it. Rows related to
+# an instance, e.g. the scenes of the request's user, are read from where the
+# instance came from, except on the replica reads of a request that has not
+# written: those follow the request to its replica even for instances read from
+# the primary, such as the user its token belongs to.
+# Replicas are listed in the DATABASE_REPLICAS setting and are never migrated.
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = replica_reads.get()
+        if replica and not wrote.get():
+            return replica
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db is not None:
+            return instance._state.db
+        return None
+
+    def db_for_write(self, model, **hints):
+        wrote.set(True)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
+
+
+# Pins the users whose request wrote to the primary, and makes their cached
+# stages out of date, see stage_cache.py.
+class ReplicaPinMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = wrote.set(False)
+        try:
+            response = self.get_response(request)
+            user = getattr(request, "user", None)
+            if wrote.get() and user is not None and user.is_authenticated:
+                pin_to_primary(user.pk)
+                bump_stage_version(user.pk)
+        finally:
+            wrote.reset(token)
+        return response
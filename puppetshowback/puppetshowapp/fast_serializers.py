@@ -0,0 +1,212 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict
+
+from django.db.models import Subquery
+
+from .models.configuration_models import Outfit, Scene
+from .models.data_models import Animation
+from .models.new_models import Performer
+from .timing import timed
+
+
+# Read-only serializers for the hot read paths.
+# These build plain dicts straight from values_list() rows, skipping DRF's
+# per-field machinery. Their output must match the ModelSerializers in
+# serializers.py exactly, including which values are UUID objects and which are
+# strings, so both render to the same JSON. serializers.py stays the reference,
+# and tests/serializers/test_fast_serializers.py checks the two against each other.
+
+PERFORMER_COLUMNS = (
+    "identifier",
+    "discord_snowflake",
+    "discord_avatar",
+    "settings",
+    "parent_user_id",
+)
+OUTFIT_COLUMNS = ("identifier", "outfit_name", "settings")
+SCENE_OUTFIT_COLUMNS = (
+    "scene_id",
+    "identifier",
+    "performer_id",
+    "outfit_name",
+    "settings",
+)
+ANIMATION_COLUMNS = ("outfit_id", "animation_type", "animation_path", "identifier")
+
+
+# Mirrors AnimationSerializer, grouped by the outfit the animations belong to.
+def animations_by_outfit(outfit_ids):
+    animations = defaultdict(list)
+    if not outfit_ids:
+        return animations
+    rows = (
+        Animation.objects.filter(outfit_id__in=outfit_ids)
+        .order_by("id")
+        .values_list(*ANIMATION_COLUMNS)
+    )
+    for outfit_id, animation_type, animation_path, identifier in rows:
+        animations[outfit_id].append(
+            {
+                "animation_type": animation_type,
+                "animation_path": animation_path,
+                "identifier": str(identifier),
+            }
+        )
+    return animations
+
+
+# Mirrors OutfitSerializerForPerformer for an (identifier, outfit_name, settings) row.
+def build_outfit_for_performer(row, animations):
+    identifier, outfit_name, settings = row
+    return {
+        "outfit_name": outfit_name,
+        "animations": animations.get(identifier, []),
+        "settings": settings,
+        "identifier": str(identifier),
+    }
+
+
+def outfit_for_performer_data(outfits):
+    rows = [
+        (outfit.identifier, outfit.outfit_name, outfit.settings) for outfit in outfits
+    ]
+    animations = animations_by_outfit([row[0] for row in rows])
+    return [build_outfit_for_performer(row, animations) for row in rows]
+
+
+# Mirrors StageSerializer for a PERFORMER_COLUMNS row and an optional OUTFIT_COLUMNS row.
+def build_stage(performer_row, outfit_row):
+    with timed("serialize"):
+        return build_stage_data(performer_row, outfit_row)
+
+
+def build_stage_data(performer_row, outfit_row):
+    identifier, discord_snowflake, discord_avatar, settings, _ = performer_row
+    outfit = None
+    if outfit_row is not None:
+        animations = animations_by_outfit([outfit_row[0]])
+        outfit = build_outfit_for_performer(outfit_row, animations)
+    return {
+        "identifier": str(identifier),
+        "discord_snowflake": discord_snowflake,
+        "discord_avatar": discord_avatar,
+        "get_outfit": outfit,
+        "settings": settings,
+    }
+
+
+# The same outfit Performer.get_outfit picks, in one query instead of four.
+def active_outfit_row(performer_id, parent_user_id):
+    active_scene = (
+        Scene.objects.filter(scene_author_id=parent_user_id, is_active=True)
+        .order_by("pk")
+        .values("pk")[:1]
+    )
+    return (
+        Outfit.objects.filter(
+            scene_id=Subquery(active_scene), performer_id=performer_id
+        )
+        .order_by("pk")
+        .values_list(*OUTFIT_COLUMNS)
+        .first()
+    )
+
+
+def stage_performer_row(identifier):
+    return (
+        Performer.objects.filter(identifier=identifier)
+        .values_list(*PERFORMER_COLUMNS)
+        .first()
+    )
+
+
+def stage_data_for_row(performer_row):
+    outfit_row = active_outfit_row(performer_row[0], performer_row[4])
+    return build_stage(performer_row, outfit_row)
+
+
+def stage_data(identifier):
+    performer_row = stage_performer_row(identifier)
+    if performer_row is None:
+        return None
+    return stage_data_for_row(performer_row)
+
+
+# StageSerializerCustomOutfit, for a performer and outfit that are already loaded.
+def stage_data_for_outfit(performer, outfit):
+    performer_row = tuple(getattr(performer, column) for column in PERFORMER_COLUMNS)
+    outfit_row = (outfit.identifier, outfit.outfit_name, outfit.settings)
+    return build_stage(performer_row, outfit_row)
+
+
+# Mirrors SceneSerializer (with OutfitSerializerNoScene) for a list of scenes.
+def scene_data(scenes):
+    outfits_by_scene = defaultdict(list)
+    rows = []
+    if scenes:
+        rows = list(
+            Outfit.objects.filter(scene_id__in=[scene.identifier for scene in scenes])
+            .order_by("created_date", "identifier")
+            .values_list(*SCENE_OUTFIT_COLUMNS)
+        )
+    animations = animations_by_outfit([row[1] for row in rows])
+    for scene_id, identifier, performer_id, outfit_name, settings in rows:
+        outfits_by_scene[scene_id].append(
+            {
+                "performer": performer_id,
+                "outfit_name": outfit_name,
+                "animations": animations.get(identifier, []),
+                "settings": settings,
+                "identifier": str(identifier),
+            }
+        )
+    return [
+        {
+            "scene_name": scene.scene_name,
+            "scene_settings": scene.scene_settings,
+            "is_active": scene.is_active,
+            "outfits": outfits_by_scene.get(scene.identifier, []),
+            "identifier": str(scene.identifier),
+            "scene_author": scene.scene_author_id,
+            "outfits_count": scene.outfits_count,
+        }
+        for scene in scenes
+    ]
+
+
+# Stands in for a read-only DRF serializer in the generic views. Only the parts
+# of the serializer interface that a GET goes through are implemented.
+# Subclasses give build(), which serializes a list of instances.
+class FastSerializer(ABC):
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @abstractmethod
+    def build(self, instances):
+        pass
+
+    @property
+    def data(self):
+        with timed("serialize"):
+            if self.many:
+                return self.build(list(self.instance))
+            return self.build([self.instance])[0]
+
+    # The rows are loaded in bulk by build(), the queryset needs no extra joins.
+    def optimize_queryset(self, queryset):
+        return queryset
+
+    def prefetch_instances(self, instances):
+        pass
+
+
+class FastSceneSerializer(FastSerializer):
+    def build(self, instances):
+        return scene_data(instances)
+
+
+class FastOutfitSerializerForPerformer(FastSerializer):
+    def build(self, instances):
+        return outfit_for_performer_data(instances)
@@ -0,0 +1,221 @@
+import atexit
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from . import log_storage
+from .log_index import index_log, level_of
+
+logger = logging.getLogger(__name__)
+
+
+# The JSON objects of an NDJSON body, at most `limit` of them, and how many
+# lines were rejected, for not being objects or for going past the limit.
+def parse_events(body, limit):
+    events, rejected = [], 0
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        if len(events) >= limit:
+            rejected += 1
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError:
+            rejected += 1
+            continue
+        if isinstance(event, dict):
+            events.append(event)
+        else:
+            rejected += 1
+    return events, rejected
+
+
+def log_type(event):
+    return level_of(event.get("level", "error"))
+
+
+# Whether the events of `client` at `level` are kept, for LOG_INGEST_SAMPLE
+# ({type: rate}). The decision is the same for every batch of a client, so that
+# the clients that are kept are kept whole rather than as scattered events.
+def sampled(client, level):
+    rate = float(settings.LOG_INGEST_SAMPLE.get(level, 1.0))
+    if rate >= 1.0:
+        return True
+    digest = hashlib.blake2b(f"{client}:{level}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2**64 < rate
+
+
+# How many of `count` events `client`, the pseudonym of an address, may still
+# send in the current minute, at most LOG_INGEST_RATE per minute, and the
+# seconds until the next minute.
+# The count lives in the default cache, so it is shared by the workers when
+# that is Redis or memcached.
+def allowance(client, count):
+    window = int(time.time() // 60)
+    key = f"log-ingest:{client}:{window}"
+    cache.add(key, 0, 120)
+    try:
+        total = cache.incr(key, count)
+    except ValueError:
+        # Evicted in between, start the window over.
+        cache.set(key, count, 120)
+        total = count
+    allowed = max(min(count, settings.LOG_INGEST_RATE - (total - count)), 0)
+    return allowed, 60 - int(time.time() % 60)
+
+
+# Events waiting to be stored, as NDJSON per LogFile type. Events are stored
+# in one LogFile per type and flush, written sequentially by a background
+# thread, once LOG_INGEST_FLUSH_BYTES have been buffered or the oldest event
+# has waited LOG_INGEST_FLUSH_SECONDS, which a timer checks for when no batch
+# comes in to notice. Past LOG_INGEST_BUFFER_BYTES, when the flushes fall
+# behind, new events are dropped rather than let memory grow.
+class IngestBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lines = {}
+        self.size = 0
+        self.oldest = None
+        self.flushing = None
+        self.timer = None
+        self.exit_registered = False
+
+    def add(self, events):
+        dropped = 0
+        with self.lock:
+            for event in events:
+                line = json.dumps(event, separators=(",", ":")).encode() + b"\n"
+                if self.size + len(line) > settings.LOG_INGEST_BUFFER_BYTES:
+                    dropped += 1
+                    continue
+                self.lines.setdefault(log_type(event), []).append(line)
+                self.size += len(line)
+                if self.oldest is None:
+                    self.oldest = time.monotonic()
+            if not self.exit_registered:
+                atexit.register(self.flush)
+                self.exit_registered = True
+            if self.oldest is not None and self.timer is None:
+                self.schedule()
+        if self.due():
+            self.flush_in_background()
+        return dropped
+
+    # Wakes up once the oldest event has waited LOG_INGEST_FLUSH_SECONDS.
+    # Called with the lock held.
+    def schedule(self):
+        delay = self.oldest + settings.LOG_INGEST_FLUSH_SECONDS - time.monotonic()
+        self.timer = threading.Timer(max(delay, 0), self.flush_on_time)
+        self.timer.daemon = True
+        self.timer.start()
+
+    # A flush that is still running may have taken its events before the ones
+    # due now came in, so this waits for it before starting the next.
+    def flush_on_time(self):
+        with self.lock:
+            self.timer = None
+            flushing = self.flushing
+        if flushing is not None:
+            flushing.join()
+        if self.due():
+            self.flush_in_background()
+            return
+        with self.lock:
+            # Flushed in between, wait for the events buffered since.
+            if self.oldest is not None and self.timer is None:
+                self.schedule()
+
+    def due(self):
+        if self.oldest is None:
+            return False
+        return (
+            self.size >= settings.LOG_INGEST_FLUSH_BYTES
+            or time.monotonic() - self.oldest >= settings.LOG_INGEST_FLUSH_SECONDS
+        )
+
+    def take(self):
+        with self.lock:
+            lines, self.lines = self.lines, {}
+            self.size, self.oldest = 0, None
+        return lines
+
+    # Puts the batches a flush could not store back in front of the events
+    # buffered since, as far as LOG_INGEST_BUFFER_BYTES allows, to be tried
+    # again LOG_INGEST_FLUSH_SECONDS from now. Returns how many were dropped.
+    def put_back(self, batches):
+        dropped = 0
+        with self.lock:
+            for level, lines in batches.items():
+                kept = []
+                for line in lines:
+                    if self.size + len(line) > settings.LOG_INGEST_BUFFER_BYTES:
+                        dropped += 1
+                        continue
+                    kept.append(line)
+                    self.size += len(line)
+                if kept:
+                    self.lines[level] = kept + self.lines.get(level, [])
+            if self.size:
+                self.oldest = time.monotonic()
+                if self.timer is None:
+                    self.schedule()
+        return dropped
+
+    # Stores the buffered events, returning the LogFiles written.
+    # Stores every batch before indexing any, so that a log that fails to
+    # index loses no events; indexLogs indexes it later. The batches left
+    # unstored when storing one fails are put back in the buffer. Ingested
+    # logs are pruned like uploaded ones, see log_storage.maybe_prune().
+    def flush(self):
+        batches = self.take()
+        logs, failure = [], None
+        for level in list(batches):
+            try:
+                logs.append(log_storage.store_log(level, batches[level]))
+            except Exception as exc:
+                failure = exc
+                break
+            del batches[level]
+        if batches:
+            dropped = self.put_back(batches)
+            if dropped:
+                logger.warning(
+                    "Dropped %d ingested events that were not stored", dropped
+                )
+        for log in logs:
+            try:
+                index_log(log)
+            except Exception:
+                logger.exception("Indexing ingested log %s failed", log.pk)
+        if logs:
+            log_storage.maybe_prune()
+        if failure is not None:
+            raise failure
+        return logs
+
+    def flush_in_background(self):
+        with self.lock:
+            if self.flushing is not None and self.flushing.is_alive():
+                return
+            self.flushing = threading.Thread(
+                target=self.background_flush, name="log-ingest-flush", daemon=True
+            )
+            self.flushing.start()
+
+    def background_flush(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Storing ingested logs failed")
+        finally:
+            connection.close()
+
+
+buffer = IngestBuffer()
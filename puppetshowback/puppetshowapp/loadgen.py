@@ -0,0 +1,247 @@
+import asyncio
+import random
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from .benchmark import percentile
+
+
+class HTTPError(Exception):
+    pass
+
+
+# A keep-alive HTTP/1.1 connection on asyncio streams, just enough of a client
+# for the load generator. Each simulated browser source holds one, the way OBS
+# keeps a connection open per source, and reconnects when the server closes it.
+class Connection:
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == "https" else 80)
+        self.ssl = url.scheme == "https"
+        self.host_header = url.netloc
+        self.prefix = url.path.rstrip("/")
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port, ssl=self.ssl
+            )
+        lines = [
+            f"{method} {self.prefix}{path} HTTP/1.1",
+            f"Host: {self.host_header}",
+            "Connection: keep-alive",
+            "Content-Length: 0",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        try:
+            await self.writer.drain()
+            return await self.read_response()
+        except BaseException:
+            await self.close()
+            raise
+
+    async def read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise HTTPError("Connection closed by the server")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await self.read_chunked()
+        else:
+            body = await self.reader.read()
+            headers["connection"] = "close"
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, body
+
+    async def read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                await self.reader.readline()
+                return b"".join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (OSError, asyncio.CancelledError):
+                pass
+        self.reader = self.writer = None
+
+
+# Latencies and failures of one kind of request.
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = {}
+
+    def record(self, latency, error=None):
+        self.latencies.append(latency)
+        if error is not None:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    def summary(self, duration):
+        count = len(self.latencies)
+        errors = sum(self.errors.values())
+        milliseconds = [latency * 1000 for latency in self.latencies] or [0.0]
+        return {
+            "requests": count,
+            "throughput_rps": round(count / duration, 2),
+            "error_rate": round(errors / count, 4) if count else 0.0,
+            "errors": dict(self.errors),
+            "p50_ms": round(percentile(milliseconds, 50), 3),
+            "p90_ms": round(percentile(milliseconds, 90), 3),
+            "p99_ms": round(percentile(milliseconds, 99), 3),
+            "max_ms": round(max(milliseconds), 3),
+            "mean_ms": round(statistics.fmean(milliseconds), 3),
+        }
+
+
+# Simulates the production traffic on a running server:
+# - `clients` overlays, each polling stage/<performer>/ every `interval` seconds
+#   for one of the streamers' performers
+# - every `switch_every` seconds a streamer switches scenes through setActive,
+#   after which all of their overlays poll at once
+# - `dashboard_clients` signed in users browsing their user, scenes and active
+#   scene every `dashboard_interval` seconds
+# `streamers` are dicts with the token, performers and scenes of a user, see
+# benchmark.benchmark_users(). Latency is measured from when a request was due
+# rather than when it was sent, so that a server falling behind shows up in the
+# percentiles instead of slowing the load down.
+class LoadGenerator:
+    def __init__(
+        self,
+        base_url,
+        streamers,
+        clients=1000,
+        interval=1.0,
+        switch_every=10.0,
+        dashboard_clients=20,
+        dashboard_interval=5.0,
+        seed=0,
+    ):
+        self.base_url = base_url
+        self.streamers = streamers
+        self.clients = clients
+        self.interval = interval
+        self.switch_every = switch_every
+        self.dashboard_clients = dashboard_clients
+        self.dashboard_interval = dashboard_interval
+        self.rng = random.Random(seed)
+        self.stats = {}
+        self.switched = [asyncio.Event() for _ in streamers]
+
+    async def send(self, kind, connection, method, path, due, token=None):
+        headers = {"Authorization": f"Token {token}"} if token else None
+        error = None
+        try:
+            status, _ = await connection.request(method, path, headers)
+            if status >= 400:
+                error = str(status)
+        except (OSError, HTTPError, asyncio.IncompleteReadError, ValueError) as e:
+            error = type(e).__name__
+        self.stats.setdefault(kind, Stats()).record(time.monotonic() - due, error)
+
+    async def overlay(self, index, deadline):
+        streamer = self.streamers[index % len(self.streamers)]
+        switched = self.switched[index % len(self.streamers)]
+        path = f"/ps/stage/{self.rng.choice(streamer['performers'])}/"
+        connection = Connection(self.base_url)
+        # Overlays start spread over one interval, like sources added over time.
+        due = time.monotonic() + self.rng.uniform(0, self.interval)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(
+                        switched.wait(), max(due - time.monotonic(), 0)
+                    )
+                    kind, due = "stage-burst", time.monotonic()
+                except asyncio.TimeoutError:
+                    kind = "stage"
+                if due >= deadline:
+                    return
+                await self.send(kind, connection, "GET", path, due)
+                due = max(due + self.interval, time.monotonic())
+        finally:
+            await connection.close()
+
+    async def scene_switches(self, deadline):
+        connection = Connection(self.base_url)
+        try:
+            while time.monotonic() + self.switch_every < deadline:
+                await asyncio.sleep(self.switch_every)
+                index = self.rng.randrange(len(self.streamers))
+                streamer = self.streamers[index]
+                scene = self.rng.choice(streamer["scenes"])
+                path = f"/ps/scenes/{scene}/setActive/"
+                due = time.monotonic()
+                await self.send(
+                    "set-active", connection, "POST", path, due, streamer["token"]
+                )
+                # Wake the streamer's overlays, then re-arm for the next switch.
+                self.switched[index].set()
+                await asyncio.sleep(0)
+                self.switched[index].clear()
+        finally:
+            await connection.close()
+
+    async def dashboard(self, index, deadline):
+        streamer = self.streamers[index % len(self.streamers)]
+        connection = Connection(self.base_url)
+        paths = ["/ps/user/", "/ps/scenes/", "/ps/scenes/active/"]
+        due = time.monotonic() + self.rng.uniform(0, self.dashboard_interval)
+        try:
+            while True:
+                await asyncio.sleep(max(due - time.monotonic(), 0))
+                if due >= deadline:
+                    return
+                path = self.rng.choice(paths)
+                await self.send(
+                    "dashboard", connection, "GET", path, due, streamer["token"]
+                )
+                due = max(due + self.dashboard_interval, time.monotonic())
+        finally:
+            await connection.close()
+
+    async def run(self, duration):
+        start = time.monotonic()
+        deadline = start + duration
+        tasks = [self.overlay(index, deadline) for index in range(self.clients)]
+        tasks += [
+            self.dashboard(index, deadline) for index in range(self.dashboard_clients)
+        ]
+        if self.switch_every > 0:
+            tasks.append(self.scene_switches(deadline))
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - start
+        total = Stats()
+        for stats in self.stats.values():
+            total.latencies.extend(stats.latencies)
+            for error, count in stats.errors.items():
+                total.errors[error] = total.errors.get(error, 0) + count
+        return {
+            "duration": round(elapsed, 2),
+            "total": total.summary(elapsed),
+            "requests": {
+                kind: stats.summary(elapsed)
+                for kind, stats in sorted(self.stats.items())
+            },
+        }
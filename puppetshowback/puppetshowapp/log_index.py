@@ -0,0 +1,254 @@
+import hashlib
+import json
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import Count, Max, Min, Q
+from django.utils.dateparse import parse_datetime
+
+from .log_storage import raw_size, read_range
+from .models.data_models import LogEntry, LogFile
+
+# Levels as clients and logging libraries name them, to the LogFile types.
+LEVELS = {
+    "trace": LogFile.LogType.INFO,
+    "debug": LogFile.LogType.INFO,
+    "info": LogFile.LogType.INFO,
+    "log": LogFile.LogType.INFO,
+    "warn": LogFile.LogType.WARNING,
+    "warning": LogFile.LogType.WARNING,
+    "error": LogFile.LogType.ERROR,
+    "fatal": LogFile.LogType.CRITICAL,
+    "critical": LogFile.LogType.CRITICAL,
+}
+TIMESTAMP = re.compile(
+    r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"
+)
+LEVEL = re.compile(r"\b(TRACE|DEBUG|INFO|WARN|WARNING|ERROR|FATAL|CRITICAL)\b")
+# What varies between occurrences of the same issue: quoted values, uuids,
+# hexadecimal ids and numbers.
+VARIABLE = re.compile(
+    r"'[^']*'|\"[^\"]*\""
+    r"|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+    r"|\b0x[0-9a-f]+\b|\b[0-9a-f]*\d[0-9a-f]*\b",
+    re.IGNORECASE,
+)
+BATCH_SIZE = 1000
+
+
+def level_of(value, default=LogFile.LogType.ERROR):
+    return LEVELS.get(str(value).lower(), default)
+
+
+# Entries that differ only in their variable parts share a fingerprint.
+def fingerprint(logger, message):
+    first_line = message.strip().split("\n", 1)[0]
+    normalized = VARIABLE.sub("?", first_line)[:500]
+    digest = hashlib.blake2b(
+        f"{logger}|{normalized}".encode(), digest_size=8
+    ).hexdigest()
+    return digest
+
+
+def parse_timestamp(value):
+    if isinstance(value, (int, float)):
+        # Seconds, or milliseconds as javascript's Date.now().
+        seconds = value / 1000 if value > 1e11 else value
+        try:
+            return datetime.fromtimestamp(seconds, dt_timezone.utc)
+        except (OSError, OverflowError, ValueError):
+            # Out of range, or NaN.
+            return None
+    if isinstance(value, str):
+        try:
+            parsed = parse_datetime(value.replace(",", "."))
+        except ValueError:
+            return None
+        if parsed is not None and parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=dt_timezone.utc)
+        return parsed
+    return None
+
+
+def first(document, *names):
+    for name in names:
+        value = document.get(name)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+# (timestamp, level, logger, request id, message) of one line: a JSON object
+# as written by logs.JSONFormatter or posted to LogIngest, or a text line with
+# a timestamp and level somewhere near its start.
+def parse_line(text, log):
+    text = text.strip()
+    if text.startswith("{"):
+        try:
+            document = json.loads(text)
+        except ValueError:
+            document = None
+        if isinstance(document, dict):
+            message = first(document, "message", "msg") or ""
+            exception = first(document, "exc", "stack")
+            if exception:
+                message = f"{message}\n{exception}"
+            return (
+                parse_timestamp(first(document, "ts", "timestamp", "time", "received")),
+                level_of(first(document, "level", "levelname") or log.log_type),
+                str(first(document, "logger", "name") or "")[:100],
+                str(first(document, "request_id", "requestId") or "")[:64],
+                str(message),
+            )
+    # The message is what is left once the timestamp and level are cut out.
+    timestamp = TIMESTAMP.search(text[:80])
+    if timestamp:
+        text = text[: timestamp.start()] + text[timestamp.end() :]
+    level = LEVEL.search(text[:60])
+    if level:
+        text = text[: level.start()] + text[level.end() :]
+    return (
+        parse_timestamp(timestamp.group()) if timestamp else None,
+        level_of(level.group()) if level else log.log_type,
+        "",
+        "",
+        text.strip(" \t-:|[]"),
+    )
+
+
+# Whether a line belongs to the entry before it: indented lines, the start of
+# a traceback, and the lines of a traceback up to the next timestamped line.
+def continues(line, in_traceback):
+    if line[:1] in (b" ", b"\t") or line.startswith(b"Traceback"):
+        return True
+    return in_traceback and not TIMESTAMP.match(line.decode("utf-8", "replace"))
+
+
+# (line, length in the log) of the lines of a log, newlines included.
+def split_lines(log):
+    size = raw_size(log)
+    if size == 0:
+        return
+    pending = b""
+    for block in read_range(log, 0, size - 1):
+        *lines, pending = (pending + block).split(b"\n")
+        for line in lines:
+            yield line, len(line) + 1
+    if pending:
+        yield pending, len(pending)
+
+
+# [offset, length, lines] of the entries of a log.
+def split_entries(log):
+    offset, current, in_traceback = 0, None, False
+    for line, length in split_lines(log):
+        if current is not None and continues(line, in_traceback):
+            current[1] += length
+            current[2].append(line)
+        else:
+            if current is not None:
+                yield current
+            current, in_traceback = [offset, length, [line]], False
+        in_traceback = in_traceback or line.startswith(b"Traceback")
+        offset += length
+    if current is not None:
+        yield current
+
+
+# Indexes the entries of a stored log, reading it back frame by frame so that
+# memory stays flat however large the log is. Entries without a timestamp of
+# their own are dated from the entry before them, or from the log. `replace`
+# drops the entries the log was indexed with before.
+def index_log(log, replace=False):
+    if replace:
+        LogEntry.objects.filter(log=log).delete()
+    batch, count, last_timestamp = [], 0, log.created
+    for offset, length, lines in split_entries(log):
+        text = b"\n".join(lines).decode("utf-8", "replace")
+        if not text.strip():
+            continue
+        timestamp, level, logger, request_id, message = parse_line(text, log)
+        timestamp = timestamp or last_timestamp
+        last_timestamp = timestamp
+        batch.append(
+            LogEntry(
+                log=log,
+                timestamp=timestamp,
+                level=level,
+                logger=logger,
+                request_id=request_id,
+                fingerprint=fingerprint(logger, message),
+                message=message.strip().split("\n", 1)[0][:200],
+                offset=offset,
+                length=length,
+            )
+        )
+        if len(batch) >= BATCH_SIZE:
+            LogEntry.objects.bulk_create(batch)
+            count += len(batch)
+            batch = []
+    LogEntry.objects.bulk_create(batch)
+    return count + len(batch)
+
+
+def parse_bound(value):
+    parsed = parse_timestamp(value)
+    if parsed is None:
+        raise ValueError(f"{value} is not a date and time")
+    return parsed
+
+
+# The entries matching the search `params`: since and until (ISO 8601, both
+# included), level (one or more, comma separated), logger (and its children),
+# request_id, fingerprint and log. Raises ValueError for malformed values.
+def search(params):
+    entries = LogEntry.objects.all()
+    if params.get("since"):
+        entries = entries.filter(timestamp__gte=parse_bound(params["since"]))
+    if params.get("until"):
+        entries = entries.filter(timestamp__lte=parse_bound(params["until"]))
+    if params.get("level"):
+        levels = [level_of(level, None) for level in params["level"].split(",")]
+        if None in levels:
+            raise ValueError(f"Unknown level in {params['level']}")
+        entries = entries.filter(level__in=levels)
+    if params.get("logger"):
+        logger = params["logger"]
+        entries = entries.filter(Q(logger=logger) | Q(logger__startswith=f"{logger}."))
+    for name in ("request_id", "fingerprint"):
+        if params.get(name):
+            entries = entries.filter(**{name: params[name]})
+    if params.get("log"):
+        try:
+            entries = entries.filter(log_id=int(params["log"]))
+        except ValueError:
+            raise ValueError(f"{params['log']} is not a log id")
+    return entries
+
+
+# The most frequent issues among `entries`: their fingerprint, count, first and
+# last occurrence, and the message of the latest one.
+def top_issues(entries, limit=50):
+    issues = list(
+        entries.values("fingerprint")
+        .annotate(
+            count=Count("id"), first_seen=Min("timestamp"), last_seen=Max("timestamp")
+        )
+        .order_by("-count", "-last_seen")[:limit]
+    )
+    if not issues:
+        return issues
+    # One index lookup per issue, on (fingerprint, timestamp).
+    latest_entries = Q()
+    for issue in issues:
+        latest_entries |= Q(
+            fingerprint=issue["fingerprint"], timestamp=issue["last_seen"]
+        )
+    latest = {}
+    for fingerprint, logger, level, message in entries.filter(
+        latest_entries
+    ).values_list("fingerprint", "logger", "level", "message"):
+        latest.setdefault(fingerprint, (logger, level, message))
+    for issue in issues:
+        issue["logger"], issue["level"], issue["message"] = latest[issue["fingerprint"]]
+    return issues
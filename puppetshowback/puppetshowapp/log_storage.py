@@ -0,0 +1,267 @@
+import bisect
+import gzip
+import logging
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import connection
+from django.utils import timezone
+
+from .models.data_models import LogFile, RequestProfile
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - gzip takes over
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+READ_BLOCK = 64 * 1024
+
+
+def default_encoding():
+    if settings.LOG_COMPRESSION == "zstd" and zstandard is not None:
+        return "zstd"
+    return "gzip"
+
+
+def compress(data, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(data, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+# Compresses a stream of bytes into `file` as independent frames of
+# `chunk_size` raw bytes each, so that at most one frame is ever held in memory.
+# Concatenated frames are still a valid gzip or zstd file, and `index` records
+# the [raw offset, stored offset] of each, so that a range of the log can be
+# read by decompressing only the frames it covers.
+class ChunkedWriter:
+    def __init__(self, file, encoding=None, chunk_size=None):
+        self.file = file
+        self.encoding = encoding or default_encoding()
+        self.chunk_size = chunk_size or settings.LOG_CHUNK_BYTES
+        self.buffer = bytearray()
+        self.index = []
+        self.size = 0
+        self.stored_size = 0
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.chunk_size:
+            self.write_frame(bytes(self.buffer[: self.chunk_size]))
+            del self.buffer[: self.chunk_size]
+
+    def write_frame(self, data):
+        frame = compress(data, self.encoding)
+        self.index.append([self.size, self.stored_size])
+        self.file.write(frame)
+        self.size += len(data)
+        self.stored_size += len(frame)
+
+    def close(self):
+        if self.buffer:
+            self.write_frame(bytes(self.buffer))
+            self.buffer.clear()
+        self.file.flush()
+
+
+# An upload that CompressingUploadHandler has already compressed.
+class CompressedUpload(UploadedFile):
+    def __init__(self, writer, name, content_type, charset, content_type_extra):
+        super().__init__(
+            writer.file,
+            name,
+            content_type,
+            writer.stored_size,
+            charset,
+            content_type_extra,
+        )
+        self.writer = writer
+
+
+# Compresses uploaded files as their chunks arrive, into a temporary file, so
+# that an upload never sits in memory or on disk uncompressed.
+class CompressingUploadHandler(FileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.writer = ChunkedWriter(tempfile.TemporaryFile())
+
+    def receive_data_chunk(self, raw_data, start):
+        self.writer.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.writer.close()
+        self.writer.file.seek(0)
+        return CompressedUpload(
+            self.writer,
+            self.file_name,
+            self.content_type,
+            self.charset,
+            self.content_type_extra,
+        )
+
+
+def save_log(log_type, writer):
+    log = LogFile(
+        log_type=log_type,
+        size=writer.size,
+        stored_size=writer.stored_size,
+        encoding=writer.encoding,
+        chunks=writer.index,
+    )
+    writer.file.seek(0)
+    log.log_file.save(f"log{EXTENSIONS[writer.encoding]}", File(writer.file))
+    writer.file.close()
+    return log
+
+
+# Stores `chunks`, an iterable of bytes, as a new log.
+def store_log(log_type, chunks):
+    writer = ChunkedWriter(tempfile.TemporaryFile())
+    for chunk in chunks:
+        writer.write(chunk)
+    writer.close()
+    return save_log(log_type, writer)
+
+
+def store_upload(log_type, upload):
+    if isinstance(upload, CompressedUpload):
+        return save_log(log_type, upload.writer)
+    return store_log(log_type, upload.chunks())
+
+
+def raw_size(log):
+    return log.size if log.encoding else log.log_file.size
+
+
+# The (start, end) byte positions, both included, asked for by a Range header
+# on a log of `size` bytes, or None for the whole log. Only single ranges are
+# served; a header asking for several is ignored, which RFC 9110 allows.
+# Raises ValueError for a range that cannot be satisfied.
+def parse_range(header, size):
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes=") :].strip().partition("-")
+    try:
+        if not first:
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise ValueError(f"Range {header} is outside of {size} bytes")
+    return start, end
+
+
+# Yields the raw bytes start..end of a log, both included, decompressing only
+# the frames that cover them.
+def read_range(log, start, end):
+    with log.log_file.open("rb") as file:
+        if not log.encoding:
+            file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                block = file.read(min(READ_BLOCK, remaining))
+                if not block:
+                    return
+                remaining -= len(block)
+                yield block
+            return
+        frames = log.chunks
+        index = bisect.bisect_right([raw for raw, _ in frames], start) - 1
+        for position in range(max(index, 0), len(frames)):
+            raw_offset, stored_offset = frames[position]
+            if raw_offset > end:
+                return
+            if position + 1 < len(frames):
+                stored_end = frames[position + 1][1]
+            else:
+                stored_end = log.stored_size
+            file.seek(stored_offset)
+            data = decompress(file.read(stored_end - stored_offset), log.encoding)
+            yield data[max(start - raw_offset, 0) : end - raw_offset + 1]
+
+
+def delete_logs(logs):
+    for log in logs:
+        log.log_file.delete(save=False)
+    LogFile.objects.filter(pk__in=[log.pk for log in logs]).delete()
+    return len(logs)
+
+
+# Deletes the logs older than LOG_RETENTION_DAYS for their type, then the oldest
+# logs of each type that go past LOG_MAX_BYTES of storage for it, and the request
+# profiles older than PROFILE_RETENTION_DAYS. Returns how many were deleted.
+def prune_logs(now=None):
+    now = now or timezone.now()
+    deleted = 0
+    for log_type in LogFile.LogType.values:
+        logs = LogFile.objects.filter(log_type=log_type).only(
+            "pk", "log_file", "stored_size"
+        )
+        days = settings.LOG_RETENTION_DAYS.get(log_type)
+        if days is not None:
+            cutoff = now - timedelta(days=float(days))
+            deleted += delete_logs(list(logs.filter(created__lt=cutoff)))
+        cap = settings.LOG_MAX_BYTES.get(log_type)
+        if cap is not None:
+            total, over = 0, []
+            for log in logs.order_by("-created", "-pk").iterator():
+                total += log.stored_size
+                if total > int(cap):
+                    over.append(log)
+            deleted += delete_logs(over)
+    cutoff = now - timedelta(days=settings.PROFILE_RETENTION_DAYS)
+    profiles = list(RequestProfile.objects.filter(created__lt=cutoff))
+    for profile in profiles:
+        profile.profile_file.delete(save=False)
+    RequestProfile.objects.filter(pk__in=[profile.pk for profile in profiles]).delete()
+    return deleted + len(profiles)
+
+
+state = {"pruned": time.monotonic(), "running": False}
+state_lock = threading.Lock()
+
+
+def prune_in_background():
+    try:
+        deleted = prune_logs()
+        if deleted:
+            logger.info("Pruned %d logs", deleted)
+    except Exception:
+        logger.exception("Pruning logs failed")
+    finally:
+        connection.close()
+        state["running"] = False
+
+
+# Prunes the logs on a background thread of this worker, at most every
+# LOG_PRUNE_SECONDS, so that storage stays bounded without a cron job and
+# without the request that triggers it waiting. 0 turns it off, for when the
+# pruneLogs command runs on a schedule instead.
+def maybe_prune():
+    interval = settings.LOG_PRUNE_SECONDS
+    if interval <= 0 or time.monotonic() - state["pruned"] < interval:
+        return
+    with state_lock:
+        if state["running"]:
+            return
+        state["pruned"] = time.monotonic()
+        state["running"] = True
+    threading.Thread(target=prune_in_background, name="log-pruner", daemon=True).start()
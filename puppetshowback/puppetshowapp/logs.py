@@ -0,0 +1,176 @@
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+# This module is imported while Django configures logging, before the apps are
+# loaded, so it must not import models or anything that does.
+
+# The attributes every LogRecord has. Anything else on a record was passed in
+# `extra` and goes into the JSON output as is.
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+# One JSON object per line: ts, level, logger, message, process, thread, the
+# fields passed in `extra`, and exc for exceptions.
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        document = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "process": record.process,
+            "thread": record.thread,
+        }
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES and not name.startswith("_"):
+                document[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            document["exc"] = record.exc_text
+        if record.stack_info:
+            document["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(document, default=str)
+
+
+# Keeps only a `rate` fraction of the records below `level` from the loggers in
+# `rates` ({logger name: rate}, children included), so that hot-path debug
+# logs can stay on in production. Other records always pass.
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates=None, level="INFO"):
+        super().__init__()
+        self.rates = {name: float(rate) for name, rate in (rates or {}).items()}
+        self.level = logging._checkLevel(level)
+
+    def rate(self, name):
+        while True:
+            if name in self.rates:
+                return self.rates[name]
+            if "." not in name:
+                return 1.0
+            name = name.rpartition(".")[0]
+
+    def filter(self, record):
+        if record.levelno >= self.level or not self.rates:
+            return True
+        rate = self.rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+# Hands records to a background thread that writes them, so that logging never
+# blocks a request on I/O. The queue is bounded: when the writer falls behind,
+# records are dropped and counted rather than making requests wait, and the
+# count is logged once there is room again.
+#
+# Records go to stderr at `console_level` and, if `filename` is given, to that
+# file as JSON at the handler's level. Every worker process appends to the same
+# file with O_APPEND, one write per record, and rotation is left to an external
+# tool such as logrotate: the file is reopened when it has been moved away.
+#
+# The writer thread is started in the process that first logs, so that workers
+# forked after settings were loaded get their own, and logging.shutdown() drains
+# the queue at exit.
+class QueueHandler(logging.handlers.QueueHandler):
+    def __init__(
+        self,
+        filename=None,
+        console_level="INFO",
+        console_json=True,
+        maxsize=10000,
+    ):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.handlers = []
+        console = logging.StreamHandler(sys.stderr)
+        console.setLevel(console_level)
+        console.setFormatter(
+            JSONFormatter()
+            if console_json
+            else logging.Formatter("{levelname} {name} {message}", style="{")
+        )
+        self.handlers.append(console)
+        if filename:
+            os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+            file = logging.handlers.WatchedFileHandler(filename, delay=True)
+            file.setFormatter(JSONFormatter())
+            self.handlers.append(file)
+        self.listener = None
+        self.pid = None
+        self.dropped = 0
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        with self.start_lock:
+            if self.pid == os.getpid():
+                return
+            # A forked child inherits the parent's queue but not its thread.
+            self.queue = queue.Queue(self.maxsize)
+            self.listener = logging.handlers.QueueListener(
+                self.queue, *self.handlers, respect_handler_level=True
+            )
+            self.listener.start()
+            self.pid = os.getpid()
+
+    def stop(self):
+        with self.start_lock:
+            if self.listener is not None and self.pid == os.getpid():
+                self.listener.stop()
+            self.listener = None
+            self.pid = None
+
+    # Formats the message and traceback on the calling thread, so the writer
+    # never touches arguments that the caller may still be changing.
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.pid != os.getpid():
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            notice = logging.makeLogRecord(
+                {
+                    "name": __name__,
+                    "levelno": logging.WARNING,
+                    "levelname": "WARNING",
+                    "msg": f"Dropped {dropped} log records, the log writer fell behind.",
+                    "dropped": dropped,
+                }
+            )
+            try:
+                self.queue.put_nowait(notice)
+            except queue.Full:
+                self.dropped += dropped
+
+    # Waits for the records queued so far to be written.
+    def flush(self):
+        if self.listener is not None and self.pid == os.getpid():
+            self.queue.join()
+
+    def close(self):
+        self.stop()
+        for handler in self.handlers:
+            handler.close()
+        super().close()
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from puppetshowapp.benchmark import clear_dataset, generate_dataset
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic dataset for the benchmarks, see puppetshowapp/benchmark.py"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--scenes-per-user", type=int, default=5)
+        parser.add_argument("--performers-per-user", type=int, default=4)
+        parser.add_argument("--outfits-per-scene", type=int, default=4)
+        parser.add_argument("--animations-per-outfit", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete the previously generated users and their data first. "
+            "Without it, the users that already exist are kept as they are.",
+        )
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            print(f"Deleted {clear_dataset()} generated users")
+        counts = generate_dataset(
+            users=options["users"],
+            scenes_per_user=options["scenes_per_user"],
+            performers_per_user=options["performers_per_user"],
+            outfits_per_scene=options["outfits_per_scene"],
+            animations_per_outfit=options["animations_per_outfit"],
+            seed=options["seed"],
+        )
+        print(
+            "Created " + ", ".join(f"{count} {name}" for name, count in counts.items())
+        )
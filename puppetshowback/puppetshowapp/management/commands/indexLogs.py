@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from puppetshowapp.log_index import index_log
+from puppetshowapp.models import LogFile
+
+
+class Command(BaseCommand):
+    help = "Index the entries of stored logs, by default those without any yet."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--all", action="store_true", help="Index every log over again."
+        )
+
+    def handle(self, *args, **options):
+        logs = LogFile.objects.order_by("pk")
+        if not options["all"]:
+            logs = logs.filter(entries__isnull=True)
+        for log in logs.iterator():
+            count = index_log(log, replace=options["all"])
+            print(f"Indexed {count} entries of log {log.pk}")
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from puppetshowapp.benchmark import benchmark_users
+from puppetshowapp.loadgen import LoadGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate OBS overlays polling the stage, scene switches and dashboard "
+        "traffic against a running server, as the users made by generateDataset."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument("--clients", type=int, default=1000)
+        parser.add_argument("--interval", type=float, default=1.0)
+        parser.add_argument("--duration", type=float, default=60.0)
+        parser.add_argument(
+            "--switch-every",
+            type=float,
+            default=10.0,
+            help="Seconds between scene switches, 0 to disable them.",
+        )
+        parser.add_argument("--dashboard-clients", type=int, default=20)
+        parser.add_argument("--dashboard-interval", type=float, default=5.0)
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Also write the report to this file.")
+
+    def handle(self, *args, **options):
+        try:
+            streamers = benchmark_users(
+                options["users"], random.Random(options["seed"])
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        generator = LoadGenerator(
+            options["url"],
+            streamers,
+            clients=options["clients"],
+            interval=options["interval"],
+            switch_every=options["switch_every"],
+            dashboard_clients=options["dashboard_clients"],
+            dashboard_interval=options["dashboard_interval"],
+            seed=options["seed"],
+        )
+        print(
+            f"{options['clients']} overlays and {options['dashboard_clients']} "
+            f"dashboards for {options['duration']}s against {options['url']}"
+        )
+        report = asyncio.run(generator.run(options["duration"]))
+        for kind, summary in [("total", report["total"]), *report["requests"].items()]:
+            print(
+                f"{kind}: {summary['requests']} requests, "
+                f"{summary['throughput_rps']} req/s, "
+                f"p50 {summary['p50_ms']}ms, p90 {summary['p90_ms']}ms, "
+                f"p99 {summary['p99_ms']}ms, {summary['error_rate']:.2%} errors"
+            )
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(report, file, indent=2)
+            print(f"Wrote {options['output']}")
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from puppetshowapp import memory
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the top allocation sites in the latest memory snapshot of a worker, "
+        "or what grew since its first one."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--list", action="store_true", help="List the snapshots and stop."
+        )
+        parser.add_argument(
+            "--worker", help="host-pid of the worker, by default the latest one."
+        )
+        parser.add_argument(
+            "--diff",
+            action="store_true",
+            help="Compare the worker's latest snapshot to its first.",
+        )
+        parser.add_argument("--group", choices=memory.GROUPS, default="lineno")
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--dir", help="By default MEMORY_SNAPSHOT_DIR.")
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            for snapshot in memory.list_snapshots(options["dir"]):
+                print(f"{snapshot['taken']:%Y-%m-%d %H:%M:%S}  {snapshot['name']}")
+            return
+        report = memory.report(
+            options["worker"],
+            options["group"],
+            options["limit"],
+            since_first=options["diff"],
+            directory=options["dir"],
+        )
+        if report is None:
+            raise CommandError("No memory snapshots, is MEMORY_SNAPSHOT_DIR set?")
+        snapshots = report["snapshots"]
+        print(
+            f"Worker {report['worker']}: {len(snapshots)} snapshots, "
+            f"{memory.format_size(report['total'])} traced at "
+            f"{snapshots[-1]['taken']:%Y-%m-%d %H:%M:%S}"
+        )
+        if "since" in report:
+            print(f"Growth since {report['since']:%Y-%m-%d %H:%M:%S}:")
+        for entry in report["sites"]:
+            if "size_diff" in entry:
+                print(
+                    f"{memory.format_size(entry['size_diff']):>12} "
+                    f"{entry['count_diff']:+9} blocks  {entry['site']}"
+                )
+            else:
+                print(
+                    f"{memory.format_size(entry['size']):>12} "
+                    f"{entry['count']:9} blocks  {entry['site']}"
+                )
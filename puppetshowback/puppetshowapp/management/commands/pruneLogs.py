@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from puppetshowapp.log_storage import prune_logs
+
+
+class Command(BaseCommand):
+    help = "Delete the stored logs past their retention or their type's size cap."
+
+    def handle(self, *args, **options):
+        print(f"Deleted {prune_logs()} logs")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from puppetshowapp.models import Animation, Outfit, Performer
+from puppetshowapp.models.counter_cache import rebuild_counter
+
+
+class Command(BaseCommand):
+    help = "Recompute the performer, outfit and animation counter caches."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        with transaction.atomic(using=using):
+            for model in (Performer, Outfit, Animation):
+                fk_name, counter = model.counter_cache
+                related_model = model._meta.get_field(fk_name).related_model
+                count = rebuild_counter(model, related_model, fk_name, counter, using)
+                print(f"Rebuilt {related_model.__name__}.{counter} on {count} rows")
@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from puppetshowapp.replay import Remapper, Replayer, load_dataset
+from puppetshowapp.traffic import read_trace
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay traffic recorded by TrafficCaptureMiddleware against a running "
+        "server, mapped onto the users made by generateDataset."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("trace", nargs="+", help="Trace files or directories.")
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument(
+            "--speed",
+            type=float,
+            default=1.0,
+            help="1 replays in real time, 10 ten times faster, 0 as fast as possible.",
+        )
+        parser.add_argument("--concurrency", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Also write the report to this file.")
+
+    def handle(self, *args, **options):
+        records = read_trace(options["trace"])
+        if not records:
+            raise CommandError("The trace is empty.")
+        try:
+            remapper = Remapper(load_dataset(), seed=options["seed"])
+        except ValueError as e:
+            raise CommandError(e)
+        replayer = Replayer(
+            options["url"],
+            records,
+            remapper,
+            speed=options["speed"],
+            concurrency=options["concurrency"],
+        )
+        span = records[-1]["t"] - records[0]["t"]
+        print(f"Replaying {len(records)} requests recorded over {span:.0f}s")
+        report = asyncio.run(replayer.run())
+        print(
+            f"Replayed {report['replayed']} requests in {report['duration']}s, "
+            f"skipped {report['skipped']}"
+        )
+        for route, summary in report["routes"].items():
+            print(
+                f"{route}: {summary['requests']} requests, "
+                f"p50 {summary['p50_ms']}ms (recorded {summary['recorded_p50_ms']}ms), "
+                f"p99 {summary['p99_ms']}ms (recorded {summary['recorded_p99_ms']}ms), "
+                f"{summary['error_rate']:.2%} errors"
+            )
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(report, file, indent=2)
+            print(f"Wrote {options['output']}")
@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from puppetshowapp.benchmark import ENDPOINTS, compare, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the latency and queries of the hot endpoints against the "
+        "generated dataset. set-active writes, use a throwaway database."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS
+        )
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=20)
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", default="benchmark.json")
+        parser.add_argument(
+            "--compare", metavar="BASELINE", help="A previous --output to diff against."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = run_benchmarks(
+                endpoints=options["endpoints"],
+                requests=options["requests"],
+                warmup=options["warmup"],
+                users=options["users"],
+                seed=options["seed"],
+            )
+        except (ValueError, RuntimeError) as e:
+            raise CommandError(e)
+        with open(options["output"], "w") as file:
+            json.dump(report, file, indent=2)
+        for endpoint, result in report["results"].items():
+            print(
+                f"{endpoint}: p50 {result['p50_ms']}ms, p99 {result['p99_ms']}ms, "
+                f"{result['queries_per_request']} queries per request"
+            )
+        print(f"Wrote {options['output']}")
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                baseline = json.load(file)
+            for endpoint, metrics in compare(baseline, report).items():
+                for metric, (old, new, change) in metrics.items():
+                    print(f"{endpoint} {metric}: {old} -> {new} ({change:+}%)")
@@ -0,0 +1,201 @@
+import linecache
+import logging
+import os
+import socket
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = ".snapshot"
+GROUPS = ("lineno", "filename", "traceback")
+# Allocations made by tracemalloc and the import machinery are noise.
+FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+state = {"pid": None, "due": 0.0, "running": False}
+state_lock = threading.Lock()
+
+
+def worker_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+# Dumps a snapshot of what is traced now to MEMORY_SNAPSHOT_DIR, and deletes
+# the snapshots of every worker older than MEMORY_SNAPSHOT_KEEP periods.
+def save_snapshot(directory=None):
+    directory = directory or settings.MEMORY_SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+    snapshot = tracemalloc.take_snapshot().filter_traces(FILTERS)
+    path = os.path.join(directory, f"{worker_name()}-{time.time() * 1000:.0f}{SUFFIX}")
+    snapshot.dump(path)
+    cutoff = (
+        time.time() - settings.MEMORY_SNAPSHOT_KEEP * settings.MEMORY_SNAPSHOT_SECONDS
+    )
+    for entry in os.scandir(directory):
+        if entry.name.endswith(SUFFIX) and entry.stat().st_mtime < cutoff:
+            os.unlink(entry.path)
+    return path
+
+
+def snapshot_in_background(stop):
+    try:
+        save_snapshot()
+    except Exception:
+        logger.exception("Taking a memory snapshot failed")
+    finally:
+        if stop:
+            tracemalloc.stop()
+        state["running"] = False
+
+
+# Called on every request when MEMORY_SNAPSHOT_DIR is set; costs a clock read
+# until something is due. In "full" mode every allocation of the worker is
+# traced from its first request on, and a snapshot taken every
+# MEMORY_SNAPSHOT_SECONDS, so that diffing two of them shows what grew between
+# them. Tracing slows allocations down noticeably, so production uses "sample"
+# mode instead: allocations are only traced for MEMORY_SAMPLE_SECONDS out of
+# every MEMORY_SNAPSHOT_SECONDS, and the snapshot taken at the end of each
+# window holds what the window allocated and kept. A site that keeps showing up
+# window after window is where the worker grows.
+def maybe_snapshot():
+    if not settings.MEMORY_SNAPSHOT_DIR:
+        return
+    now = time.monotonic()
+    if state["pid"] == os.getpid() and now < state["due"]:
+        return
+    with state_lock:
+        if state["pid"] == os.getpid() and (state["running"] or now < state["due"]):
+            return
+        sampling = settings.MEMORY_PROFILE == "sample"
+        if state["pid"] != os.getpid() or not tracemalloc.is_tracing():
+            # A new worker, or the start of a sampling window.
+            if state["pid"] != os.getpid() and tracemalloc.is_tracing():
+                tracemalloc.stop()  # inherited through fork
+            state["pid"], state["running"] = os.getpid(), False
+            tracemalloc.start(settings.MEMORY_TRACE_FRAMES)
+            if sampling:
+                state["due"] = now + settings.MEMORY_SAMPLE_SECONDS
+            else:
+                state["due"] = now + settings.MEMORY_SNAPSHOT_SECONDS
+            return
+        state["running"] = True
+        state["due"] = now + settings.MEMORY_SNAPSHOT_SECONDS
+        if sampling:
+            state["due"] -= settings.MEMORY_SAMPLE_SECONDS
+    threading.Thread(
+        target=snapshot_in_background,
+        args=(sampling,),
+        name="memory-snapshot",
+        daemon=True,
+    ).start()
+
+
+# The snapshots in `directory`, oldest first, as dicts with their path, the
+# worker that took them and when.
+def list_snapshots(directory=None):
+    directory = directory or settings.MEMORY_SNAPSHOT_DIR
+    if not directory or not os.path.isdir(directory):
+        return []
+    snapshots = []
+    for name in os.listdir(directory):
+        if not name.endswith(SUFFIX):
+            continue
+        worker, _, stamp = name[: -len(SUFFIX)].rpartition("-")
+        try:
+            taken = datetime.fromtimestamp(int(stamp) / 1000, dt_timezone.utc)
+        except ValueError:
+            continue
+        path = os.path.join(directory, name)
+        snapshots.append({"path": path, "name": name, "worker": worker, "taken": taken})
+    return sorted(snapshots, key=lambda snapshot: (snapshot["taken"], snapshot["name"]))
+
+
+# The snapshots to report on: those of `worker`, by default the worker that
+# took the latest snapshot.
+def worker_snapshots(worker=None, directory=None):
+    snapshots = list_snapshots(directory)
+    if worker is None and snapshots:
+        worker = snapshots[-1]["worker"]
+    return [snapshot for snapshot in snapshots if snapshot["worker"] == worker]
+
+
+def load(path):
+    return tracemalloc.Snapshot.load(path)
+
+
+def site(traceback, group):
+    if group == "filename":
+        return traceback[0].filename
+    if group == "traceback":
+        return "\n".join(traceback.format(most_recent_first=True))
+    frame = traceback[0]
+    line = linecache.getline(frame.filename, frame.lineno).strip()
+    return f"{frame.filename}:{frame.lineno}" + (f"  {line}" if line else "")
+
+
+def check_group(group):
+    if group not in GROUPS:
+        raise ValueError(f"{group} is not one of {', '.join(GROUPS)}")
+
+
+# The `limit` allocation sites of a snapshot holding the most memory.
+def top(snapshot, group="lineno", limit=20):
+    check_group(group)
+    return [
+        {"site": site(stat.traceback, group), "size": stat.size, "count": stat.count}
+        for stat in snapshot.statistics(group)[:limit]
+    ]
+
+
+# The `limit` allocation sites that grew the most from `old` to `new`.
+def diff(old, new, group="lineno", limit=20):
+    check_group(group)
+    stats = [stat for stat in new.compare_to(old, group) if stat.size_diff > 0]
+    stats.sort(key=lambda stat: stat.size_diff, reverse=True)
+    return [
+        {
+            "site": site(stat.traceback, group),
+            "size": stat.size,
+            "size_diff": stat.size_diff,
+            "count": stat.count,
+            "count_diff": stat.count_diff,
+        }
+        for stat in stats[:limit]
+    ]
+
+
+# The top sites of the latest snapshot of `worker`, or how they grew since its
+# first one when `since_first` and there are two.
+def report(worker=None, group="lineno", limit=20, since_first=False, directory=None):
+    snapshots = worker_snapshots(worker, directory)
+    if not snapshots:
+        return None
+    latest = load(snapshots[-1]["path"])
+    result = {
+        "worker": snapshots[-1]["worker"],
+        "snapshots": snapshots,
+        "total": sum(stat.size for stat in latest.statistics("filename")),
+    }
+    if since_first and len(snapshots) > 1:
+        result["since"] = snapshots[0]["taken"]
+        result["sites"] = diff(load(snapshots[0]["path"]), latest, group, limit)
+    else:
+        result["sites"] = top(latest, group, limit)
+    return result
+
+
+def format_size(size):
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
@@ -0,0 +1,387 @@
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from django.conf import settings
+
+from .timing import timed
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Every thread records into its own dict of values, behind a lock of its own,
+# so recording never waits on another thread, only on a reader copying the
+# shard. Readers copy each shard, histogram lists included, under its lock, so
+# that they never see an observation half made. A shard is registered once,
+# when its thread first records something.
+shards = []
+shards_lock = threading.Lock()
+local = threading.local()
+state = {"pid": os.getpid(), "flushed": 0.0, "started": (None, 0)}
+registry = {}
+
+
+def shard():
+    values = getattr(local, "values", None)
+    if values is None or local.pid != os.getpid():
+        values = local.values = {}
+        local.lock = threading.Lock()
+        local.pid = os.getpid()
+        with shards_lock:
+            if state["pid"] != local.pid:
+                # A forked worker starts from zero instead of repeating the
+                # parent's values.
+                state["pid"] = local.pid
+                shards.clear()
+            shards.append((local.lock, values))
+    return local.lock, values
+
+
+def reset():
+    with shards_lock:
+        for lock, values in shards:
+            with lock:
+                values.clear()
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry[name] = self
+
+    def key(self, labels):
+        return (self.name, tuple(str(labels[name]) for name in self.labelnames))
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        lock, values = shard()
+        key = self.key(labels)
+        with lock:
+            values[key] = values.get(key, 0) + amount
+
+    def merge(self, total, value):
+        return (total or 0) + value
+
+    def samples(self, labels, value):
+        yield self.name + "_total", labels, value
+
+
+# Values are kept as a count per bucket, the last one for values above every
+# bound, followed by their sum. The cumulative counts Prometheus expects are only
+# worked out when rendering.
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        lock, values = shard()
+        key = self.key(labels)
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        with lock:
+            counts = values.get(key)
+            if counts is None:
+                counts = values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def merge(self, total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def samples(self, labels, value):
+        cumulative = 0
+        for bound, count in zip(self.buckets, value):
+            cumulative += count
+            yield self.name + "_bucket", labels + (("le", f"{bound:g}"),), cumulative
+        cumulative += value[-2]
+        yield self.name + "_bucket", labels + (("le", "+Inf"),), cumulative
+        yield self.name + "_sum", labels, value[-1]
+        yield self.name + "_count", labels, cumulative
+
+
+http_requests = Counter(
+    "puppetshow_http_requests",
+    "Requests served, by route, method and status code.",
+    ["route", "method", "status"],
+)
+http_request_duration = Histogram(
+    "puppetshow_http_request_duration_seconds",
+    "Time spent serving a request, middleware included.",
+    ["route", "method"],
+)
+http_response_size = Histogram(
+    "puppetshow_http_response_size_bytes",
+    "Size of the response bodies, streaming responses excluded.",
+    ["route", "method"],
+    buckets=SIZE_BUCKETS,
+)
+db_queries = Histogram(
+    "puppetshow_db_queries_per_request",
+    "Database queries run by a request, on every database.",
+    ["route", "method"],
+    buckets=QUERY_BUCKETS,
+)
+db_duration = Histogram(
+    "puppetshow_db_duration_seconds",
+    "Time a request spent waiting on the database.",
+    ["route", "method"],
+)
+discord_request_duration = Histogram(
+    "puppetshow_discord_request_duration_seconds",
+    "Latency of the calls to the Discord API.",
+    ["endpoint"],
+)
+discord_errors = Counter(
+    "puppetshow_discord_errors",
+    "Failed calls to the Discord API, by HTTP status or exception.",
+    ["endpoint", "reason"],
+)
+# A cache's hit ratio is the rate of its result="hit" lookups over all of them.
+cache_requests = Counter(
+    "puppetshow_cache_requests",
+    "Cache lookups, by cache and result.",
+    ["cache", "result"],
+)
+stage_rebuilds = Counter(
+    "puppetshow_stage_rebuilds",
+    "Stages rebuilt after a cache miss (built), and the requests that shared "
+    "another's rebuild (shared) or gave up waiting for it (timeout).",
+    ["result"],
+)
+
+
+# requests.get() or requests.post() to the Discord API, recording the latency and
+# failures of the call under `endpoint`, which names the kind of call so that
+# snowflakes and tokens stay out of the labels.
+def discord_request(endpoint, method, url, **kwargs):
+    with discord_request_duration.time(endpoint=endpoint), timed("http"):
+        try:
+            response = getattr(requests, method)(url, **kwargs)
+        except requests.RequestException as e:
+            discord_errors.inc(endpoint=endpoint, reason=type(e).__name__)
+            raise
+    if not response.ok:
+        discord_errors.inc(endpoint=endpoint, reason=response.status_code)
+    return response
+
+
+def count_cache_lookup(name, hit):
+    cache_requests.inc(cache=name, result="hit" if hit else "miss")
+
+
+# {key: value} of this process, summed over its threads.
+def collect_local():
+    with shards_lock:
+        registered = list(shards)
+    copies = []
+    for lock, values in registered:
+        with lock:
+            copies.append(
+                {
+                    key: list(value) if isinstance(value, list) else value
+                    for key, value in values.items()
+                }
+            )
+    totals = {}
+    for values in copies:
+        for key, value in values.items():
+            totals[key] = registry[key[0]].merge(totals.get(key), value)
+    return totals
+
+
+# With METRICS_DIR set, every worker writes its values to a file of its own
+# there, at most every METRICS_FLUSH_SECONDS, and /metrics sums the files of all
+# of them. A file is named after the worker's pid and the time it first wrote
+# it, so that a new worker given the pid of an exited one does not overwrite
+# its values. The values of exited workers are merged into AGGREGATE, so that
+# counters never go backwards, which is why the directory should be emptied
+# when the service starts.
+WORKER_FILE = re.compile(r"metrics-(\d+)-(\d+)\.json")
+AGGREGATE = "metrics-aggregate.json"
+# Held exclusively while merging and shared while reading, so that a reader
+# never counts a file both on its own and in AGGREGATE.
+LOCK_FILE = "metrics.lock"
+
+
+def metrics_dir():
+    return getattr(settings, "METRICS_DIR", "")
+
+
+def worker_file(directory):
+    with shards_lock:
+        if state["started"][0] != os.getpid():
+            state["started"] = (os.getpid(), time.time_ns() // 1000)
+        pid, started = state["started"]
+    return os.path.join(directory, f"metrics-{pid}-{started}.json")
+
+
+def write_json(path, data):
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, "w") as file:
+        json.dump(data, file)
+    os.replace(temporary, path)
+
+
+def read_json(path, default):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return default
+
+
+def flush():
+    directory = metrics_dir()
+    if not directory:
+        return
+    state["flushed"] = time.monotonic()
+    rows = [[key[0], key[1], value] for key, value in collect_local().items()]
+    write_json(worker_file(directory), rows)
+
+
+@contextmanager
+def locked(directory, operation):
+    with open(os.path.join(directory, LOCK_FILE), "a") as file:
+        fcntl.flock(file, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def add_rows(totals, rows):
+    for name, labels, value in rows:
+        if name not in registry:
+            continue
+        key = (name, tuple(labels))
+        totals[key] = registry[name].merge(totals.get(key), value)
+    return totals
+
+
+# The files of the workers that exited: those of a pid that is gone, and those
+# of a pid that a newer worker has taken over.
+def exited_files(filenames):
+    workers = {}
+    for filename in filenames:
+        match = WORKER_FILE.fullmatch(filename)
+        if match:
+            workers[filename] = (int(match[1]), int(match[2]))
+    newest = {}
+    for pid, started in workers.values():
+        newest[pid] = max(newest.get(pid, started), started)
+    return [
+        filename
+        for filename, (pid, started) in workers.items()
+        if started < newest[pid] or not running(pid)
+    ]
+
+
+# Adds the files of exited workers to AGGREGATE and deletes them. AGGREGATE
+# names the files it last took in, so that one left behind by a merge that
+# died before deleting it is not counted twice.
+def merge_exited(directory):
+    if not exited_files(os.listdir(directory)):
+        return
+    with locked(directory, fcntl.LOCK_EX):
+        exited = exited_files(os.listdir(directory))
+        path = os.path.join(directory, AGGREGATE)
+        aggregate = read_json(path, {"rows": [], "merged": []})
+        totals = add_rows({}, aggregate["rows"])
+        merged = []
+        for filename in exited:
+            if filename not in aggregate["merged"]:
+                add_rows(totals, read_json(os.path.join(directory, filename), []))
+            merged.append(filename)
+        rows = [[key[0], key[1], value] for key, value in totals.items()]
+        write_json(path, {"rows": rows, "merged": merged})
+        for filename in merged:
+            try:
+                os.unlink(os.path.join(directory, filename))
+            except FileNotFoundError:
+                pass
+
+
+def maybe_flush():
+    interval = getattr(settings, "METRICS_FLUSH_SECONDS", 5.0)
+    if metrics_dir() and time.monotonic() - state["flushed"] >= interval:
+        flush()
+
+
+def collect():
+    directory = metrics_dir()
+    if not directory:
+        return collect_local()
+    flush()
+    merge_exited(directory)
+    with locked(directory, fcntl.LOCK_SH):
+        aggregate = read_json(os.path.join(directory, AGGREGATE), {"rows": []})
+        totals = add_rows({}, aggregate["rows"])
+        for filename in os.listdir(directory):
+            if WORKER_FILE.fullmatch(filename):
+                add_rows(totals, read_json(os.path.join(directory, filename), []))
+    return totals
+
+
+def format_value(value):
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# The values in the Prometheus text exposition format.
+def render(totals):
+    by_metric = {}
+    for (name, labelvalues), value in sorted(totals.items()):
+        by_metric.setdefault(name, []).append((labelvalues, value))
+    lines = []
+    for name, metric in registry.items():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for labelvalues, value in by_metric.get(name, []):
+            labels = tuple(zip(metric.labelnames, labelvalues))
+            for sample, sample_labels, sample_value in metric.samples(labels, value):
+                text = ",".join(f'{k}="{escape(v)}"' for k, v in sample_labels)
+                labelled = f"{sample}{{{text}}}" if text else sample
+                lines.append(f"{labelled} {format_value(sample_value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,200 @@
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import memory, metrics, profiling, traffic
+from .timing import ServerTimings, current
+
+logger = logging.getLogger("puppetshowapp.queries")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+# Counts the queries a request runs, on every database, through execute_wrapper().
+# Queries are told apart by their SQL with the parameters left out, so a query
+# seen more than once per request is usually an N+1 in the making.
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.signatures = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.signatures[sql] += 1
+
+    @property
+    def duplicates(self):
+        return {sql: count for sql, count in self.signatures.items() if count > 1}
+
+
+# Records the number of queries, the time spent in the database and the repeated
+# queries of every request, and checks them against the query_budget of the view
+# that served it. Every view in puppetshowapp/urls.py declares one.
+# Going over budget is logged as a warning, or raises QueryBudgetExceeded when
+# QUERY_BUDGET_ENFORCE is set, as it is in the tests (see conftest.py).
+# The stats are left on request.query_stats for the other instrumentation.
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        request.query_stats = stats
+        request.query_budget = None
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        self.report(request, response, stats)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "view_class", None)
+        request.query_view = getattr(view_class, "__name__", view_func.__name__)
+        request.query_budget = getattr(view_class, "query_budget", None)
+
+    def report(self, request, response, stats):
+        view = getattr(request, "query_view", None)
+        duplicates = stats.duplicates
+        logger.debug(
+            "%s %s (%s) %s: %d queries in %.1fms, %d repeated",
+            request.method,
+            request.path,
+            view,
+            response.status_code,
+            stats.count,
+            stats.duration * 1000,
+            sum(duplicates.values()) - len(duplicates),
+        )
+        budget = request.query_budget
+        if budget is None or stats.count <= budget:
+            return
+        message = (
+            f"{view} ran {stats.count} queries for {request.method} {request.path},"
+            f" over its budget of {budget}."
+        )
+        if duplicates:
+            repeated = "\n".join(
+                f"  {count}x {sql}" for sql, count in duplicates.items()
+            )
+            message += f" Repeated queries:\n{repeated}"
+        if getattr(settings, "QUERY_BUDGET_ENFORCE", False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+# Records the route, status, latency and response size of every request, and the
+# query stats left by QueryBudgetMiddleware, which must come after it. Routes are
+# labelled by their URL pattern so that identifiers do not end up in the labels.
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        labels = {
+            "route": match.route if match is not None else "<unmatched>",
+            "method": request.method,
+        }
+        metrics.http_requests.inc(status=response.status_code, **labels)
+        metrics.http_request_duration.observe(duration, **labels)
+        if not response.streaming:
+            metrics.http_response_size.observe(len(response.content), **labels)
+        stats = getattr(request, "query_stats", None)
+        if stats is not None:
+            metrics.db_queries.observe(stats.count, **labels)
+            metrics.db_duration.observe(stats.duration, **labels)
+        metrics.maybe_flush()
+        return response
+
+
+# Adds a Server-Timing header to the /ps/ responses when SERVER_TIMING is on,
+# with the time spent in each phase of the request, see timing.py. Comes after
+# QueryBudgetMiddleware, whose query stats give the db entry.
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SERVER_TIMING or not request.path.startswith("/ps/"):
+            return self.get_response(request)
+        timings = ServerTimings(getattr(request, "query_stats", None))
+        token = current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        response["Server-Timing"] = timings.header(time.perf_counter() - start)
+        return response
+
+
+# Records the shape of every /ps/ request to TRAFFIC_CAPTURE_DIR when it is set,
+# or of a TRAFFIC_CAPTURE_SAMPLE share of them, for the replayTraffic command.
+# Identifiers and users are pseudonymized, see traffic.py. Comes after
+# AuthenticationMiddleware, and after QueryBudgetMiddleware for the query counts.
+class TrafficCaptureMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (
+            not settings.TRAFFIC_CAPTURE_DIR
+            or not request.path.startswith("/ps/")
+            or random.random() >= settings.TRAFFIC_CAPTURE_SAMPLE
+        ):
+            return self.get_response(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+        if request.resolver_match is not None:
+            record = traffic.capture_record(request, response, duration)
+            traffic.get_writer().write(record)
+        return response
+
+
+# Profiles the /ps/ requests of superusers that ask for it with a profile query
+# parameter or an X-Profile header: "sample" for the sampling profiler, anything
+# else for cProfile. See profiling.py. Other requests pay one lookup for the
+# flag. Comes first, so that the whole stack is profiled and the token lookup
+# and the saved profile stay out of the query budget.
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.GET.get("profile") or request.META.get("HTTP_X_PROFILE")
+        if not mode or not request.path.startswith("/ps/"):
+            return self.get_response(request)
+        user = profiling.superuser(request)
+        if user is None:
+            return self.get_response(request)
+        return profiling.profile_request(self.get_response, request, user, mode)
+
+
+# Takes this worker's memory snapshots when MEMORY_SNAPSHOT_DIR is set, see
+# memory.py. Requests pay a clock read unless a snapshot is due, and the
+# snapshot is written from a thread of its own.
+class MemorySnapshotMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        memory.maybe_snapshot()
+        return self.get_response(request)
@@ -0,0 +1,58 @@
+# Generated by Django 4.1.7 on 2026-10-19 15:51
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("puppetshowapp", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outfit",
+            name="created_date",
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="performer",
+            name="created_date",
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="scene",
+            name="created_date",
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="outfit",
+            index=models.Index(
+                fields=["scene", "created_date", "identifier"],
+                name="outfits_scene_keyset_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="performer",
+            index=models.Index(
+                fields=["parent_user", "created_date", "identifier"],
+                name="performers_user_keyset_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="scene",
+            index=models.Index(
+                fields=["scene_author", "created_date", "identifier"],
+                name="scenes_author_keyset_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.1.7 on 2026-10-19 15:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+# A copy of puppetshowapp.models.counter_cache.rebuild_counter as of this
+# migration, so that later changes to the app do not change what it does.
+def rebuild_counter(model, related_model, fk_name, counter, using):
+    counts = (
+        model._base_manager.db_manager(using)
+        .filter(**{fk_name: OuterRef("pk")})
+        .order_by()
+        .values(fk_name)
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    related_model._base_manager.db_manager(using).all().update(
+        **{counter: Coalesce(Subquery(counts, output_field=models.IntegerField()), 0)}
+    )
+
+
+def fill_counters(apps, schema_editor):
+    using = schema_editor.connection.alias
+    user = apps.get_model("puppetshowapp", "DiscordPointingUser")
+    performer = apps.get_model("puppetshowapp", "Performer")
+    scene = apps.get_model("puppetshowapp", "Scene")
+    outfit = apps.get_model("puppetshowapp", "Outfit")
+    animation = apps.get_model("puppetshowapp", "Animation")
+    rebuild_counter(performer, user, "parent_user", "performers_count", using)
+    rebuild_counter(outfit, scene, "scene", "outfits_count", using)
+    rebuild_counter(animation, outfit, "outfit", "animations_count", using)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("puppetshowapp", "0002_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="discordpointinguser",
+            name="performers_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="outfit",
+            name="animations_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="scene",
+            name="outfits_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 4.1.7 on 2026-10-19 16:03
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+# Lists the rows of `model` sharing the values of `fields` with another row,
+# one line per group, with the primary keys of its rows.
+def duplicates(model, fields, using):
+    groups = (
+        model.objects.using(using)
+        .values(*fields)
+        .annotate(rows=Count("pk"))
+        .filter(rows__gt=1)
+        .order_by(*fields)
+    )
+    lines = []
+    for group in groups:
+        values = {field: group[field] for field in fields}
+        pks = model.objects.using(using).filter(**values).values_list("pk", flat=True)
+        described = ", ".join(f"{field}={value}" for field, value in values.items())
+        lines.append(f"  {described}: {', '.join(str(pk) for pk in sorted(pks))}")
+    return lines
+
+
+# Gets the rows ready for the new unique constraints. Scenes past the first
+# active one of their author are only switched off. Duplicate outfits and
+# performers hold user data that the API still serves, outfits through the
+# scene and outfit lists and their stage links, so they are never deleted here:
+# the migration fails listing them, to be merged or deleted by hand first.
+def check_duplicates(apps, schema_editor):
+    using = schema_editor.connection.alias
+    scene = apps.get_model("puppetshowapp", "Scene")
+    outfit = apps.get_model("puppetshowapp", "Outfit")
+    performer = apps.get_model("puppetshowapp", "Performer")
+    first_active = (
+        scene.objects.using(using)
+        .filter(is_active=True)
+        .values("scene_author")
+        .annotate(first=Min("pk"))
+        .values_list("first", flat=True)
+    )
+    scene.objects.using(using).filter(is_active=True).exclude(
+        pk__in=list(first_active)
+    ).update(is_active=False)
+    problems = []
+    for model, fields in (
+        (outfit, ("scene", "performer")),
+        (performer, ("parent_user", "discord_snowflake")),
+    ):
+        lines = duplicates(model, fields, using)
+        if lines:
+            problems.append(
+                f"{model._meta.db_table} rows with the same {' and '.join(fields)}:"
+            )
+            problems.extend(lines)
+    if problems:
+        raise RuntimeError(
+            "Merge or delete these rows before migrating again, the new unique "
+            "constraints reject them.\n" + "\n".join(problems)
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("puppetshowapp", "0003_counter_caches"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="animation",
+            index=models.Index(
+                fields=["outfit", "animation_type"], name="animations_outfit_type_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="scene",
+            index=models.Index(
+                fields=["scene_author", "is_active"], name="scenes_author_active_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="outfit",
+            constraint=models.UniqueConstraint(
+                fields=("scene", "performer"), name="outfits_scene_performer_uniq"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="performer",
+            constraint=models.UniqueConstraint(
+                fields=("parent_user", "discord_snowflake"),
+                name="performers_user_snowflake_uniq",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="scene",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_active", True)),
+                fields=("scene_author",),
+                name="scenes_one_active_per_author",
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.1.7 on 2026-10-19 16:29
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("puppetshowapp", "0004_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="logfile",
+            name="chunks",
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name="logfile",
+            name="created",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+        migrations.AddField(
+            model_name="logfile",
+            name="encoding",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=10
+            ),
+        ),
+        migrations.AddField(
+            model_name="logfile",
+            name="size",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="logfile",
+            name="stored_size",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="logfile",
+            index=models.Index(
+                fields=["log_type", "created"], name="log_files_type_created_idx"
+            ),
+        ),
+    ]
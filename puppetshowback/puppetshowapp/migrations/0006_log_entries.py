@@ -0,0 +1,77 @@
+# Generated by Django 4.1.7 on 2026-10-19 16:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("puppetshowapp", "0005_log_file_storage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LogEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("timestamp", models.DateTimeField()),
+                (
+                    "level",
+                    models.CharField(
+                        choices=[
+                            ("INFO", "Info"),
+                            ("WARNING", "Warning"),
+                            ("ERROR", "Error"),
+                            ("CRITICAL", "Critical"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("logger", models.CharField(blank=True, default="", max_length=100)),
+                ("request_id", models.CharField(blank=True, default="", max_length=64)),
+                ("fingerprint", models.CharField(max_length=16)),
+                ("message", models.CharField(blank=True, default="", max_length=200)),
+                ("offset", models.BigIntegerField()),
+                ("length", models.IntegerField()),
+                (
+                    "log",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="entries",
+                        to="puppetshowapp.logfile",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "log_entries",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="logentry",
+            index=models.Index(fields=["timestamp", "id"], name="log_entries_time_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="logentry",
+            index=models.Index(
+                fields=["level", "timestamp", "id"], name="log_entries_level_time_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="logentry",
+            index=models.Index(
+                fields=["fingerprint", "timestamp"], name="log_entries_fingerprint_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="logentry",
+            index=models.Index(fields=["request_id"], name="log_entries_request_idx"),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.1.7 on 2026-10-19 16:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import puppetshowapp.models.data_models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("puppetshowapp", "0006_log_entries"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RequestProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                (
+                    "mode",
+                    models.CharField(
+                        choices=[("cprofile", "Deterministic"), ("sample", "Sampling")],
+                        max_length=10,
+                    ),
+                ),
+                ("method", models.CharField(max_length=10)),
+                ("path", models.CharField(max_length=500)),
+                ("status", models.PositiveSmallIntegerField()),
+                ("duration_ms", models.FloatField()),
+                ("query_count", models.IntegerField()),
+                ("query_ms", models.FloatField()),
+                (
+                    "profile_file",
+                    models.FileField(
+                        upload_to=puppetshowapp.models.data_models.default_profile_location
+                    ),
+                ),
+                ("report", models.TextField()),
+                (
+                    "user",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "request_profiles",
+            },
+        ),
+    ]
@@ -7,6 +7,8 @@ from django.db import models
 
 
 from rest_framework.authtoken.models import Token
+from ..metrics import discord_request
+from .counter_cache import CounterColumnsMixin
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +26,9 @@ class DiscordPointingUserManager(BaseUserManager):
         return user
 
 
-class DiscordPointingUser(AbstractBaseUser):
+class DiscordPointingUser(CounterColumnsMixin, AbstractBaseUser):
+    counter_columns = ("performers_count",)
+
     # TODO re-evaluate use of storing tokens in the database. ATM the use case is nonexistant.
     login_username = models.CharField(max_length=25, unique=True)
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -34,6 +38,9 @@ class DiscordPointingUser(AbstractBaseUser):
     is_superuser = models.BooleanField(default=False)
     created_date = models.DateTimeField(auto_now_add=True)
 
+    # Counter cache of this user's performers, see counter_cache.py
+    performers_count = models.IntegerField(default=0)
+
     discord_auth_token = models.CharField(max_length=100)
     discord_refresh_token = models.CharField(max_length=100)
     discord_avatar = models.CharField(max_length=100)
@@ -109,9 +116,7 @@ class DiscordPointingUser(AbstractBaseUser):
 
     @property
     def added_performers_count(self):
-        from .new_models import Performer
-
-        return Performer.objects.filter(parent_user=self).count()
+        return self.performers_count
 
     def refresh_token(self):
         API_ENDPOINT = "https://discord.com/api/v10/oauth2/token"
@@ -122,7 +127,9 @@ class DiscordPointingUser(AbstractBaseUser):
             "refresh_token": self.discord_refresh_token,
         }
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        r = requests.post(url=API_ENDPOINT, data=data, headers=headers, timeout=4)
+        r = discord_request(
+            "oauth2/token", "post", API_ENDPOINT, data=data, headers=headers, timeout=4
+        )
         try:
             r.raise_for_status()
             response = r.json()
@@ -132,7 +139,7 @@ class DiscordPointingUser(AbstractBaseUser):
         except requests.exceptions.HTTPError as e:
             logger.error(f"Error refreshing token for user {self.login_username}")
             logger.error(e)
-            logger.error("Response text: " + r.text)
+            logger.error("Discord answered %s", r.status_code)
             logger.error("Revoking token for user" + self.discord_username)
             Token.objects.delete(user=self)
 
@@ -142,9 +149,10 @@ class DiscordPointingUser(AbstractBaseUser):
         headers = {
             "Authorization": f"Bearer {self.discord_auth_token}",
         }
-        print(headers)
-        r = requests.get(
-            url=url,
+        r = discord_request(
+            "user",
+            "get",
+            url,
             headers=headers,
             timeout=4,
         )
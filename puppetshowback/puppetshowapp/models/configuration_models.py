@@ -1,10 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from .authentication_models import DiscordPointingUser
 from .new_models import Performer
 from enum import Enum
 from uuid import uuid4
 import os
 from ..constants import DEFAULT_OUTFIT_SETTINGS, DEFAULT_SCENE_SETTINGS
+from ..stage_cache import bump_stage_version
+from .counter_cache import CounterCacheMixin, CounterColumnsMixin
 
 
 def user_outfit_path(instance, filename):
@@ -13,18 +15,44 @@ def user_outfit_path(instance, filename):
 
 # A "scene" is a configuration of the specific information of displayed users.
 # The active scene dictates how loaded users will be displayed.
-class Scene(models.Model):
+class Scene(CounterColumnsMixin, models.Model):
+    counter_columns = ("outfits_count",)
+
     identifier = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     scene_name = models.CharField(max_length=30)
     scene_author = models.ForeignKey(DiscordPointingUser, on_delete=models.CASCADE)
     scene_settings = models.JSONField(default=DEFAULT_SCENE_SETTINGS)
     is_active = models.BooleanField(default=False)
+    created_date = models.DateTimeField(auto_now_add=True)
+
+    # Counter cache of this scene's outfits, see counter_cache.py
+    outfits_count = models.IntegerField(default=0)
 
     def __str__(self) -> str:
         return f"{self.scene_name} scene"
 
     class Meta:
         db_table = "scenes"
+        indexes = [
+            # Keyset pagination key for SceneList, see pagination.py
+            models.Index(
+                fields=["scene_author", "created_date", "identifier"],
+                name="scenes_author_keyset_idx",
+            ),
+            # User.active_scene and the stage's active outfit lookup.
+            models.Index(
+                fields=["scene_author", "is_active"], name="scenes_author_active_idx"
+            ),
+        ]
+        constraints = [
+            # At most one active scene per author. MySQL has no partial indexes,
+            # there Scene.set_active() alone keeps this true.
+            models.UniqueConstraint(
+                fields=["scene_author"],
+                condition=models.Q(is_active=True),
+                name="scenes_one_active_per_author",
+            ),
+        ]
 
     @property
     def outfits(self):
@@ -34,23 +62,29 @@ class Scene(models.Model):
     def get_owner(self):
         return self.scene_author
 
+    # Also makes the author's cached stages out of date, once the change is in.
     def set_active(self):
-        for scene in Scene.objects.filter(scene_author=self.scene_author):
-            scene.is_active = False
-            scene.save()
-        self.is_active = True
-        self.save()
+        with transaction.atomic():
+            Scene.objects.filter(
+                scene_author_id=self.scene_author_id, is_active=True
+            ).exclude(pk=self.pk).update(is_active=False)
+            self.is_active = True
+            self.save()
+        bump_stage_version(self.scene_author_id)
 
     @property
     def preview_image(self):
-        if self.outfits.count() == 0:
+        if self.outfits_count == 0:
             return None
         return self.outfits.first().getFirstImage()
 
 
 # An "Outfit" is a configuration of a performer's appearance.
 # It is bound to a scene and a performer.
-class Outfit(models.Model):
+class Outfit(CounterCacheMixin, CounterColumnsMixin, models.Model):
+    counter_cache = ("scene", "outfits_count")
+    counter_columns = ("animations_count",)
+
     # The identifier
     identifier = models.UUIDField(primary_key=True, default=uuid4, editable=False)
 
@@ -66,6 +100,11 @@ class Outfit(models.Model):
     # Any additional settings
     settings = models.JSONField(default=DEFAULT_OUTFIT_SETTINGS)
 
+    created_date = models.DateTimeField(auto_now_add=True)
+
+    # Counter cache of this outfit's animations, see counter_cache.py
+    animations_count = models.IntegerField(default=0)
+
     @property
     def animations(self):
         from .data_models import Animation
@@ -89,6 +128,19 @@ class Outfit(models.Model):
 
     class Meta:
         db_table = "charactor_actors"
+        indexes = [
+            # Keyset pagination key for OutfitList, see pagination.py
+            models.Index(
+                fields=["scene", "created_date", "identifier"],
+                name="outfits_scene_keyset_idx",
+            ),
+        ]
+        constraints = [
+            # A performer has one outfit per scene, see Performer.get_outfit
+            models.UniqueConstraint(
+                fields=["scene", "performer"], name="outfits_scene_performer_uniq"
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.performer.discord_username}'s {self.scene.scene_name} outfit"
@@ -0,0 +1,194 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import models, router, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, pre_delete
+
+
+# Keeps a count of a model's rows on the row its foreign key points to, e.g.
+# Scene.outfits_count for Outfit.scene. A model opts in with
+#     counter_cache = ("scene", "outfits_count")
+# Creating a row bumps the count in the same transaction as the INSERT. Deleting
+# one, including through a cascade or a queryset delete, lowers it inside the
+# deletion's transaction. bulk_create() and queryset.update() skip both, so bulk
+# writers call adjust_counter() or set the counts themselves, see
+# counters_suspended(). The rebuildCounters command recomputes every counter from
+# scratch. The model holding the counter column uses CounterColumnsMixin.
+class CounterCacheMixin:
+    counter_cache = None
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding or self.counter_cache is None:
+            return super().save(*args, **kwargs)
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            fk_name, _ = self.counter_cache
+            adjust_counter(type(self), {getattr(self, f"{fk_name}_id"): 1}, using)
+
+
+# For the models that hold counter columns, e.g. counter_columns = ("outfits_count",)
+# Saving an existing row leaves those columns out of the UPDATE, so that a stale
+# count on an instance never overwrites the one kept up to date by adjust_counter().
+class CounterColumnsMixin:
+    counter_columns = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            self.counter_columns
+            and not args
+            and not self._state.adding
+            and not kwargs.get("force_insert")
+            and kwargs.get("update_fields") is None
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_columns
+            ]
+        return super().save(*args, **kwargs)
+
+
+_suspended = ContextVar("counter_cache_suspended", default=False)
+
+
+# Stops deletes from touching counters, for bulk writers that set the counts
+# themselves once they are done. Saves are not affected.
+@contextmanager
+def counters_suspended():
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+# Applies {related pk: delta} to a model's counter column, one UPDATE per distinct delta.
+def adjust_counter(model, deltas, using=None):
+    fk_name, counter = model.counter_cache
+    related_model = model._meta.get_field(fk_name).related_model
+    by_delta = {}
+    for pk, delta in deltas.items():
+        if pk is not None and delta:
+            by_delta.setdefault(delta, []).append(pk)
+    manager = related_model._base_manager.db_manager(using)
+    for delta, pks in by_delta.items():
+        manager.filter(pk__in=pks).update(**{counter: F(counter) + delta})
+
+
+# The deletions under way in this thread, by id() of their origin: the parent
+# rows being deleted with them, the counter deltas of the counted rows, and how
+# many of those rows are left to delete. pre_delete is sent for every row of a
+# deletion before any is deleted, so the deltas are complete once post_delete
+# has been sent for the last counted row of a model. Each model's counters are
+# then lowered with one UPDATE per distinct delta, leaving out the parents
+# deleted along with the rows.
+_deletions = ContextVar("counter_cache_deletions", default=None)
+
+
+def deletion_for(origin, sender, pk):
+    deletions = _deletions.get()
+    if deletions is None:
+        deletions = {}
+        _deletions.set(deletions)
+    deletion = deletions.get(id(origin))
+    if (
+        deletion is None
+        or deletion["origin"] is not origin
+        or deletion["started"]
+        or pk in deletion["deleted"][sender]
+    ):
+        # A new deletion, or one left over by a deletion that failed. Those
+        # without counted rows left, or any at all, are done with.
+        for key, other in list(deletions.items()):
+            if not +other["pending"]:
+                del deletions[key]
+        deletion = {
+            "origin": origin,
+            "started": False,
+            "deleted": defaultdict(set),
+            "deltas": defaultdict(Counter),
+            "pending": Counter(),
+        }
+        deletions[id(origin)] = deletion
+    return deletion
+
+
+def note_delete(sender, instance, using, origin=None, **kwargs):
+    if _suspended.get():
+        return
+    deletion = deletion_for(origin, sender, instance.pk)
+    deletion["deleted"][sender].add(instance.pk)
+    if getattr(sender, "counter_cache", None) is not None:
+        fk_name, _ = sender.counter_cache
+        deletion["deltas"][sender][getattr(instance, f"{fk_name}_id")] -= 1
+        deletion["pending"][sender] += 1
+
+
+def lower_counter_on_delete(sender, instance, using, origin=None, **kwargs):
+    deletions = _deletions.get() or {}
+    deletion = deletions.get(id(origin))
+    if deletion is None or deletion["origin"] is not origin:
+        return
+    deletion["started"] = True
+    deletion["pending"][sender] -= 1
+    if deletion["pending"][sender] > 0:
+        return
+    fk_name, _ = sender.counter_cache
+    related_model = sender._meta.get_field(fk_name).related_model
+    deleted = deletion["deleted"][related_model]
+    deltas = deletion["deltas"].pop(sender)
+    adjust_counter(
+        sender, {pk: delta for pk, delta in deltas.items() if pk not in deleted}, using
+    )
+    if not deletion["deltas"]:
+        del deletions[id(origin)]
+
+
+# Connected for the counted models and the models holding their counters only,
+# see PuppetshowappConfig.ready(), so that every other model keeps Django's fast
+# deletes, which skip the signals.
+def connect_counter_signals(models):
+    for model in models:
+        if not issubclass(model, CounterCacheMixin) or model.counter_cache is None:
+            continue
+        fk_name, _ = model.counter_cache
+        related_model = model._meta.get_field(fk_name).related_model
+        for sender in (model, related_model):
+            pre_delete.connect(
+                note_delete,
+                sender=sender,
+                dispatch_uid=f"counter-cache-{sender._meta.label}",
+            )
+        post_delete.connect(
+            lower_counter_on_delete,
+            sender=model,
+            dispatch_uid=f"counter-cache-{model._meta.label}",
+        )
+
+
+# Recomputes a counter column for every row of the related model.
+# Takes the model classes so that migrations can pass their historical models.
+def rebuild_counter(model, related_model, fk_name, counter, using=None):
+    counts = (
+        model._base_manager.db_manager(using)
+        .filter(**{fk_name: OuterRef("pk")})
+        .order_by()
+        .values(fk_name)
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return (
+        related_model._base_manager.db_manager(using)
+        .all()
+        .update(
+            **{
+                counter: Coalesce(
+                    Subquery(counts, output_field=models.IntegerField()), 0
+                )
+            }
+        )
+    )
@@ -1,8 +1,10 @@
+from django.conf import settings
 from django.db import models
 from enum import Enum
 import uuid
 import os
 from .configuration_models import Outfit
+from .counter_cache import CounterCacheMixin
 from django.utils import timezone
 
 
@@ -15,7 +17,9 @@ def user_outfit_path(instance, filename):
 
 
 # An outfit's animation
-class Animation(models.Model):
+class Animation(CounterCacheMixin, models.Model):
+    counter_cache = ("outfit", "animations_count")
+
     class Attributes(models.TextChoices):
         START_SPEAKING = "START_SPEAKING"
         STOP_SPEAKING = "NOT_SPEAKING"
@@ -38,6 +42,12 @@ class Animation(models.Model):
 
     class Meta:
         db_table = "animations"
+        indexes = [
+            # Outfit.getImage() and the stage's animation lookups.
+            models.Index(
+                fields=["outfit", "animation_type"], name="animations_outfit_type_idx"
+            ),
+        ]
 
 
 def default_log_location(instance, filename):
@@ -48,6 +58,9 @@ def default_log_location(instance, filename):
 
 
 # A file for handling and mapping the storage of logs.
+# Logs are stored compressed as a series of frames, see log_storage. `chunks`
+# holds the [raw offset, stored offset] of every frame. Logs stored before
+# compression have no encoding and are read as they are.
 class LogFile(models.Model):
     class LogType(models.TextChoices):
         INFO = "INFO"
@@ -57,9 +70,90 @@ class LogFile(models.Model):
 
     log_type = models.CharField(max_length=30, choices=LogType.choices)
     log_file = models.FileField(upload_to=default_log_location)
+    created = models.DateTimeField(default=timezone.now, editable=False)
+    size = models.BigIntegerField(default=0, editable=False)
+    stored_size = models.BigIntegerField(default=0, editable=False)
+    encoding = models.CharField(max_length=10, blank=True, default="", editable=False)
+    chunks = models.JSONField(default=list, blank=True, editable=False)
 
     def __str__(self) -> str:
         return str(f"{self.log_type}" + f"{self.log_file}")
 
     class Meta:
         db_table = "log_files"
+        indexes = [
+            # The pruner's retention and size cap scans.
+            models.Index(
+                fields=["log_type", "created"], name="log_files_type_created_idx"
+            ),
+        ]
+
+
+# One entry of a stored log, indexed when the log is stored, see log_index.
+# Only a prefix of the message is kept; the whole entry is `length` bytes at
+# `offset` in the uncompressed log, which LogDownload serves as a Range.
+class LogEntry(models.Model):
+    log = models.ForeignKey(LogFile, on_delete=models.CASCADE, related_name="entries")
+    timestamp = models.DateTimeField()
+    level = models.CharField(max_length=10, choices=LogFile.LogType.choices)
+    logger = models.CharField(max_length=100, blank=True, default="")
+    request_id = models.CharField(max_length=64, blank=True, default="")
+    fingerprint = models.CharField(max_length=16)
+    message = models.CharField(max_length=200, blank=True, default="")
+    offset = models.BigIntegerField()
+    length = models.IntegerField()
+
+    def __str__(self) -> str:
+        return f"{self.timestamp} {self.level} {self.message}"
+
+    class Meta:
+        db_table = "log_entries"
+        indexes = [
+            # Time range searches, with or without a level.
+            models.Index(fields=["timestamp", "id"], name="log_entries_time_idx"),
+            models.Index(
+                fields=["level", "timestamp", "id"], name="log_entries_level_time_idx"
+            ),
+            # Aggregation by fingerprint and the occurrences of one issue.
+            models.Index(
+                fields=["fingerprint", "timestamp"],
+                name="log_entries_fingerprint_idx",
+            ),
+            models.Index(fields=["request_id"], name="log_entries_request_idx"),
+        ]
+
+
+def default_profile_location(instance, filename):
+    now = timezone.now()
+    base, extension = os.path.splitext(filename.lower())
+    return f"request-profiles/{now:%Y%m%d%H%M%S}{now.microsecond // 1000}{extension}"
+
+
+# The profile of one /ps/ request that a superuser asked for, see profiling.
+# `profile_file` holds the raw profile: pstats data for cProfile, which
+# snakeviz or pstats can open, or folded stacks for the sampling profiler,
+# which flamegraph tools read. `report` is the readable summary, with the SQL.
+class RequestProfile(models.Model):
+    class Mode(models.TextChoices):
+        DETERMINISTIC = "cprofile"
+        SAMPLING = "sample"
+
+    created = models.DateTimeField(default=timezone.now, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, on_delete=models.SET_NULL
+    )
+    mode = models.CharField(max_length=10, choices=Mode.choices)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    status = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.IntegerField()
+    query_ms = models.FloatField()
+    profile_file = models.FileField(upload_to=default_profile_location)
+    report = models.TextField()
+
+    def __str__(self) -> str:
+        return f"{self.method} {self.path} ({self.duration_ms:.0f}ms)"
+
+    class Meta:
+        db_table = "request_profiles"
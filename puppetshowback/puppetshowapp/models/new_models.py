@@ -2,14 +2,20 @@ from django.db import models
 from .authentication_models import DiscordPointingUser
 import uuid
 from django.conf import settings
-import requests
 from ..constants import DEFAULT_PERFORMER_SETTINGS
+from ..metrics import discord_request
+from .counter_cache import CounterCacheMixin
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 # This model is created by DPUs are are bound to them.
 # It contains an identifier, a discord snowflake, and a discord username.
 # When the identifier is called in the URL, access the parent user's default scene and load this user's corresponding actor.
-class Performer(models.Model):
+class Performer(CounterCacheMixin, models.Model):
+    counter_cache = ("parent_user", "performers_count")
+
     identifier = models.UUIDField(
         default=uuid.uuid4, editable=False, unique=True, primary_key=True
     )
@@ -18,6 +24,23 @@ class Performer(models.Model):
     discord_username = models.CharField(max_length=30)
     discord_avatar = models.URLField(max_length=200)
     settings = models.JSONField(default=DEFAULT_PERFORMER_SETTINGS)
+    created_date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination key for PerformerList, see pagination.py
+            models.Index(
+                fields=["parent_user", "created_date", "identifier"],
+                name="performers_user_keyset_idx",
+            ),
+        ]
+        constraints = [
+            # The duplicate check in PerformerList.perform_create
+            models.UniqueConstraint(
+                fields=["parent_user", "discord_snowflake"],
+                name="performers_user_snowflake_uniq",
+            ),
+        ]
 
     @property
     def get_outfit(self):
@@ -33,7 +56,7 @@ class Performer(models.Model):
     def request_update_user_info(self, save=True):
         url = f"{settings.DISCORD.get('URLS').get('API_ENDPOINT')}/users/{self.discord_snowflake}"
         headers = {"Authorization": f"Bot {settings.DISCORD['BOT_TOKEN']}"}
-        response = requests.get(url, headers=headers, timeout=4)
+        response = discord_request("users/{id}", "get", url, headers=headers, timeout=4)
         if response.status_code == 200:
             response_json = response.json()
             self.discord_username = response_json["username"]
@@ -41,6 +64,8 @@ class Performer(models.Model):
             if save:
                 self.save()
         else:
-            print(f"Failed to update user info for {self.discord_username}")
-            print(f"Response code: {response.status_code}")
-            print(f"Response json: {response.json()}")
+            logger.warning(
+                "Failed to update user info for %s, Discord answered %s",
+                self.discord_username,
+                response.status_code,
+            )
@@ -0,0 +1,136 @@
+import base64
+import binascii
+import uuid
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# Keyset ("cursor") pagination over (created_date, identifier).
+# Every paginated model carries a composite index on its owner, created_date and
+# identifier, so any page is a single index range scan, however deep it is.
+# The cursor is an opaque token holding the key of the last row that was sent.
+class KeysetPagination(BasePagination):
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    ordering = ("created_date", "identifier")
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, base_url=None):
+        # The URL that next links are built from. Defaults to the request's URL,
+        # but the paged user document points its links at the list endpoints.
+        self.base_url = base_url
+        self.next_cursor = None
+        self.request = None
+
+    def encode_cursor(self, row):
+        raw = f"{row.created_date.isoformat()}|{row.identifier}"
+        return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii")
+
+    def decode_cursor(self, encoded):
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode("ascii")).decode("ascii")
+            created, identifier = raw.split("|")
+            created_date = parse_datetime(created)
+            identifier = uuid.UUID(identifier)
+        except (binascii.Error, UnicodeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_date, identifier
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_page(self, queryset, cursor=None, page_size=None):
+        page_size = page_size or self.page_size
+        queryset = queryset.order_by(*self.ordering)
+        if cursor is not None:
+            created_date, identifier = cursor
+            queryset = queryset.filter(
+                Q(created_date__gt=created_date)
+                | Q(created_date=created_date, identifier__gt=identifier)
+            )
+        # Fetch one extra row to find out if there is a next page without a COUNT.
+        rows = list(queryset[: page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_cursor = self.encode_cursor(rows[-1])
+        else:
+            self.next_cursor = None
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        encoded = request.query_params.get(self.cursor_query_param)
+        cursor = self.decode_cursor(encoded) if encoded else None
+        return self.get_page(queryset, cursor, self.get_page_size(request))
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        if self.base_url is None:
+            url = self.request.build_absolute_uri()
+        else:
+            url = self.request.build_absolute_uri(self.base_url)
+            page_size = self.request.query_params.get(self.page_size_query_param)
+            if page_size:
+                url = replace_query_param(url, self.page_size_query_param, page_size)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict([("next", self.get_next_link()), ("results", data)])
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+
+# Keyset pagination over log entries' (timestamp, id), newest first, on the
+# (timestamp, id) and (level, timestamp, id) indexes.
+class LogEntryPagination(KeysetPagination):
+    ordering = ("-timestamp", "-id")
+
+    def encode_cursor(self, row):
+        raw = f"{row.timestamp.isoformat()}|{row.id}"
+        return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii")
+
+    def decode_cursor(self, encoded):
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode("ascii")).decode("ascii")
+            timestamp, last_id = raw.split("|")
+            timestamp = parse_datetime(timestamp)
+            last_id = int(last_id)
+        except (binascii.Error, UnicodeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if timestamp is None:
+            raise NotFound(self.invalid_cursor_message)
+        return timestamp, last_id
+
+    def get_page(self, queryset, cursor=None, page_size=None):
+        if cursor is not None:
+            timestamp, last_id = cursor
+            queryset = queryset.filter(
+                Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=last_id)
+            )
+        return super().get_page(queryset, None, page_size)
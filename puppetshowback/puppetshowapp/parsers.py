@@ -0,0 +1,31 @@
+import io
+import re
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from .renderers import FastJSONRenderer, orjson
+
+# orjson reads integers past 64 bits as floats, losing digits. Bodies with a
+# number that may be one are left to the stdlib parser.
+LONG_NUMBER = re.compile(rb"\d{19}")
+
+
+# A drop-in JSONParser backed by orjson. UTF-8 bodies orjson cannot parse, e.g.
+# NaN, which JSONParser's strict mode refuses as well, and the other encodings
+# are parsed by JSONParser, so that they give the same data or errors.
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        body = stream.read()
+        if encoding.lower().replace("-", "") == "utf8" and not LONG_NUMBER.search(body):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -1,4 +1,5 @@
 from rest_framework import permissions
+from rest_framework.authentication import TokenAuthentication
 from rest_framework.authtoken.models import Token
 
 
@@ -22,7 +23,17 @@ class UserIsUser(permissions.BasePermission):
 
 class HasValidToken(permissions.BasePermission):
     def has_permission(self, request, view):
-        # Get the token from the request, and then get the user from the token
+        token = request.auth
+        if token is None:
+            return False
+        # TokenAuthentication has just looked the key up.
+        if isinstance(request.successful_authenticator, TokenAuthentication):
+            return True
+        return Token.objects.filter(key=token).exists()
+
+
+class IsSuperuser(permissions.BasePermission):
+    def has_permission(self, request, view):
         token = request.auth
         if token is None:
             return False
@@ -30,4 +41,4 @@ class HasValidToken(permissions.BasePermission):
             user = Token.objects.get(key=token).user
         except Token.DoesNotExist:
             return False
-        return True
+        return user.is_superuser
@@ -0,0 +1,176 @@
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+from rest_framework.authtoken.models import Token
+
+from .models.data_models import RequestProfile
+
+MAX_QUERIES = 1000
+MAX_DEPTH = 100
+
+
+# The user of the request's token when they are a superuser, else None. Only
+# runs for requests that ask for a profile.
+def superuser(request):
+    scheme, _, key = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+    if scheme.lower() != "token" or not key:
+        return None
+    token = Token.objects.select_related("user").filter(key=key.strip()).first()
+    if token is None or not token.user.is_superuser:
+        return None
+    return token.user
+
+
+# Stands in for the values of query parameters, which can be API tokens or
+# password hashes, with their types, so stored profiles hold no secrets.
+def redacted(params):
+    if isinstance(params, dict):
+        return {name: redacted(value) for name, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return type(params)(redacted(value) for value in params)
+    if params is None:
+        return None
+    return f"<{type(params).__name__}>"
+
+
+# Records every query of the request with the types of its parameters and its
+# duration.
+class SQLRecorder:
+    def __init__(self):
+        self.queries = []
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append((elapsed, sql, redacted(params)))
+
+
+# Samples the stack of one thread every `interval` seconds from a thread of its
+# own, counting how often each stack is seen. Costs the profiled thread nothing
+# but the GIL switches, unlike cProfile, so timings stay close to real ones.
+class Sampler:
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="profiler", daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+    # The functions seen in the most samples, anywhere in their stacks.
+    def summary(self, limit=40):
+        total = sum(self.stacks.values())
+        inclusive, own = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+        lines = [f"{total} samples, every {self.interval * 1000:g}ms", ""]
+        lines.append(f"{'total':>7} {'self':>7}  function")
+        for frame, count in inclusive.most_common(limit):
+            lines.append(f"{count / total:7.1%} {own[frame] / total:7.1%}  {frame}")
+        return "\n".join(lines)
+
+
+def sql_report(recorder):
+    lines = [f"{recorder.count} queries in {recorder.duration * 1000:.1f}ms", ""]
+    for elapsed, sql, params in recorder.queries:
+        lines.append(f"{elapsed * 1000:8.2f}ms  {sql}")
+        if params:
+            lines.append(f"{'':12}{params!r}")
+    if recorder.count > len(recorder.queries):
+        lines.append(f"... and {recorder.count - len(recorder.queries)} more")
+    return "\n".join(lines)
+
+
+# Serves the request under the profiler `mode` asks for ("sample" for the
+# sampling profiler, cProfile otherwise), records its SQL, and stores the lot as
+# a RequestProfile. The response says which in its X-Profile-Id header.
+def profile_request(get_response, request, user, mode):
+    mode = (
+        RequestProfile.Mode.SAMPLING
+        if mode == "sample"
+        else RequestProfile.Mode.DETERMINISTIC
+    )
+    recorder = SQLRecorder()
+    start = time.perf_counter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        if mode == RequestProfile.Mode.SAMPLING:
+            with Sampler(
+                threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL
+            ) as sampler:
+                response = get_response(request)
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+    duration = time.perf_counter() - start
+
+    if mode == RequestProfile.Mode.SAMPLING:
+        content = ContentFile(sampler.folded().encode(), name="profile.folded")
+        summary = sampler.summary()
+    else:
+        stats = pstats.Stats(profiler)
+        content = ContentFile(marshal.dumps(stats.stats), name="profile.prof")
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(40)
+        summary = output.getvalue().strip()
+    profile = RequestProfile(
+        user=user,
+        mode=mode,
+        method=request.method,
+        path=request.get_full_path()[:500],
+        status=response.status_code,
+        duration_ms=duration * 1000,
+        query_count=recorder.count,
+        query_ms=recorder.duration * 1000,
+        report=f"{summary}\n\n{sql_report(recorder)}",
+    )
+    profile.profile_file.save(content.name, content)
+    response["X-Profile-Id"] = str(profile.pk)
+    return response
@@ -0,0 +1,70 @@
+import datetime
+
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+from .timing import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the stdlib renderer takes over
+    orjson = None
+
+
+_fallback_encoder = encoders.JSONEncoder()
+_datetime_field = serializers.DateTimeField()
+_date_field = serializers.DateField()
+_time_field = serializers.TimeField()
+
+
+# Called by orjson for anything it cannot encode natively.
+# Dates and times are passed through to here so that they are formatted with
+# REST_FRAMEWORK's DATETIME_FORMAT, DATE_FORMAT and TIME_FORMAT, the same as
+# serializer fields would format them. Everything else (Decimals, lazy strings,
+# querysets...) is handed to DRF's encoder.
+def encode_default(obj):
+    if isinstance(obj, datetime.datetime):
+        return _datetime_field.to_representation(obj)
+    if isinstance(obj, datetime.date):
+        return _date_field.to_representation(obj)
+    if isinstance(obj, datetime.time):
+        return _time_field.to_representation(obj)
+    return _fallback_encoder.default(obj)
+
+
+# A drop-in JSONRenderer backed by orjson.
+# UUIDs are encoded as strings like DRF's encoder does. Output is compact and
+# uses the same escaping as JSONRenderer, and the same bytes except for floats:
+# orjson writes exponents without padding or a plus sign (1e-7, 1e16 rather
+# than 1e-07, 1e+16), which parse to the same values, and writes NaN and the
+# infinities as null where JSONRenderer refuses them. Requests for an indent
+# orjson cannot produce, data it cannot encode, such as integers past 64 bits,
+# or a missing orjson, fall back to the stdlib renderer.
+class FastJSONRenderer(JSONRenderer):
+    options = (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if orjson is not None
+        else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed("render"):
+            return self.render_json(data, accepted_media_type, renderer_context)
+
+    def render_json(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if orjson is None or indent is not None or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=encode_default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escape \u2028 and \u2029 like JSONRenderer does, for strict javascript.
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028")
+            ret = ret.replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
@@ -0,0 +1,185 @@
+import asyncio
+import random
+import time
+from urllib.parse import urlencode
+
+from rest_framework.authtoken.models import Token
+
+from .benchmark import PREFIX, percentile
+from .loadgen import Connection, HTTPError, Stats
+from .models.configuration_models import Outfit, Scene
+from .models.data_models import Animation
+from .models.new_models import Performer
+from .traffic import ARGUMENT
+
+
+# The users made by generateDataset and what they own, for Remapper.
+def load_dataset():
+    generated = {"user__login_username__startswith": f"{PREFIX}-"}
+    dataset = {
+        "tokens": dict(Token.objects.filter(**generated).values_list("user_id", "key")),
+        "by_user": {},
+        "by_performer": {},
+    }
+    if not dataset["tokens"]:
+        raise ValueError("No generated users found, run generateDataset first.")
+    owned = [
+        ("performer", Performer, "parent_user_id"),
+        ("scene", Scene, "scene_author_id"),
+        ("outfit", Outfit, "scene__scene_author_id"),
+        ("animation", Animation, "outfit__scene__scene_author_id"),
+    ]
+    for kind, model, owner in owned:
+        rows = model.objects.filter(
+            **{f"{owner}__in": list(dataset["tokens"])}
+        ).values_list(owner, "identifier")
+        for user_id, identifier in rows:
+            pools = dataset["by_user"].setdefault(user_id, {})
+            pools.setdefault(kind, []).append(identifier)
+    for performer_id, identifier in Outfit.objects.filter(
+        performer__parent_user_id__in=list(dataset["tokens"])
+    ).values_list("performer_id", "identifier"):
+        dataset["by_performer"].setdefault(performer_id, []).append(identifier)
+    return dataset
+
+
+# Maps the pseudonyms of a trace onto the generated dataset. Each pseudonymous
+# user becomes a generated user, and each pseudonymous object an object of the
+# same kind that the request can reach: one of the user's own, one of the
+# performer's outfits for the stage, or any for anonymous requests. Distinct
+# pseudonyms get distinct objects for as long as there are enough of them, so
+# the skew of the trace (a few hot streamers, many quiet ones) is kept.
+class Remapper:
+    def __init__(self, dataset, seed=0):
+        self.rng = random.Random(seed)
+        self.dataset = dataset
+        self.mapped = {}
+        self.cursors = {}
+        self.users = sorted(dataset["tokens"], key=str)
+        self.rng.shuffle(self.users)
+        self.everything = {}
+        for pools in dataset["by_user"].values():
+            for kind, identifiers in pools.items():
+                self.everything.setdefault(kind, []).extend(identifiers)
+
+    def pick(self, scope, pool):
+        if not pool:
+            return None
+        if scope not in self.cursors:
+            self.cursors[scope] = (self.rng.sample(pool, len(pool)), [0])
+        ordered, cursor = self.cursors[scope]
+        value = ordered[cursor[0] % len(ordered)]
+        cursor[0] += 1
+        return value
+
+    def user(self, name):
+        key = ("user", name)
+        if key not in self.mapped:
+            self.mapped[key] = self.pick("users", self.users)
+        return self.mapped[key]
+
+    # The path and token to replay `record` with, or None when the dataset has
+    # nothing it could be mapped to.
+    def request(self, record):
+        user_id = self.user(record["u"]) if "u" in record else None
+        values = {}
+        performer = None
+        for name, value in record["a"].items():
+            kind, _, name_pseudonym = value.partition(":")
+            key = (kind, name_pseudonym)
+            if key not in self.mapped:
+                if kind == "outfit" and performer is not None:
+                    scope = ("performer", performer)
+                    pool = self.dataset["by_performer"].get(performer, [])
+                elif user_id is not None:
+                    scope = ("user", user_id, kind)
+                    pool = self.dataset["by_user"].get(user_id, {}).get(kind, [])
+                else:
+                    scope, pool = ("all", kind), self.everything.get(kind, [])
+                self.mapped[key] = self.pick(scope, pool)
+            if self.mapped[key] is None:
+                return None
+            values[name] = self.mapped[key]
+            if kind == "performer":
+                performer = self.mapped[key]
+        path = "/" + ARGUMENT.sub(
+            lambda match: str(values[match.group(1)]), record["r"]
+        )
+        if record.get("q"):
+            path += "?" + urlencode(record["q"])
+        token = self.dataset["tokens"][user_id] if user_id is not None else None
+        return path, token
+
+
+# Re-issues a trace against a running server, keeping the gaps between requests
+# divided by `speed` (0 sends them as fast as `concurrency` allows). Requests
+# with a body, and deletes, are skipped: their payloads are not recorded, and
+# deletes would eat the dataset away.
+class Replayer:
+    def __init__(self, base_url, records, remapper, speed=1.0, concurrency=100):
+        self.base_url = base_url
+        self.records = records
+        self.remapper = remapper
+        self.speed = speed
+        self.concurrency = concurrency
+        self.idle = []
+        self.stats = {}
+        self.recorded = {}
+        self.skipped = 0
+
+    def replayable(self, record):
+        return record["m"] != "DELETE" and not record.get("rb")
+
+    async def send(self, semaphore, record, path, token, due):
+        async with semaphore:
+            connection = self.idle.pop() if self.idle else Connection(self.base_url)
+            headers = {"Authorization": f"Token {token}"} if token else None
+            error = None
+            try:
+                status, _ = await connection.request(record["m"], path, headers)
+                if status >= 400:
+                    error = str(status)
+            except (OSError, HTTPError, asyncio.IncompleteReadError, ValueError) as e:
+                error = type(e).__name__
+            self.idle.append(connection)
+            kind = f"{record['m']} {record['r']}"
+            self.stats.setdefault(kind, Stats()).record(time.monotonic() - due, error)
+            self.recorded.setdefault(kind, []).append(record["d"])
+
+    async def run(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        start = time.monotonic()
+        first = self.records[0]["t"] if self.records else 0
+        tasks = []
+        for record in self.records:
+            request = self.remapper.request(record) if self.replayable(record) else None
+            if request is None:
+                self.skipped += 1
+                continue
+            due = start + ((record["t"] - first) / self.speed if self.speed else 0)
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(
+                asyncio.create_task(self.send(semaphore, record, *request, due))
+            )
+        await asyncio.gather(*tasks)
+        for connection in self.idle:
+            await connection.close()
+        elapsed = time.monotonic() - start
+        routes = {}
+        for kind, stats in self.stats.items():
+            summary = stats.summary(elapsed)
+            summary["recorded_p50_ms"] = percentile(self.recorded[kind], 50)
+            summary["recorded_p99_ms"] = percentile(self.recorded[kind], 99)
+            summary["total_ms"] = round(sum(stats.latencies) * 1000, 1)
+            routes[kind] = summary
+        return {
+            "duration": round(elapsed, 2),
+            "replayed": sum(len(stats.latencies) for stats in self.stats.values()),
+            "skipped": self.skipped,
+            # Hot spots first: the routes the server spent the most time on.
+            "routes": dict(
+                sorted(routes.items(), key=lambda item: -item[1]["total_ms"])
+            ),
+        }
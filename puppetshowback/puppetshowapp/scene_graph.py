@@ -0,0 +1,192 @@
+import uuid
+
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from .constants import DEFAULT_OUTFIT_SETTINGS
+from .models.configuration_models import Outfit, Scene
+from .models.counter_cache import counters_suspended
+from .models.data_models import Animation
+from .models.new_models import Performer
+
+
+# Writes a whole scene -> outfits -> animations tree in one transaction.
+# The tree replaces what is stored: outfits and animations that carry an
+# identifier are updated, ones without are created, and stored ones missing from
+# the tree are deleted. Every level is read, inserted, updated and deleted in bulk,
+# so the number of queries does not depend on the size of the scene.
+# Identifiers must already belong to this scene. Animations may move between
+# the scene's outfits. An outfit without an identifier takes over the stored
+# outfit of its performer, as a scene holds one outfit per performer.
+def apply_scene_graph(scene, data):
+    try:
+        with transaction.atomic():
+            return write_scene_graph(scene, data)
+    except IntegrityError:
+        # e.g. two outfits for one performer, or performers swapped between outfits.
+        raise serializers.ValidationError(
+            {"outfits": ["A scene can only hold one outfit per performer."]}
+        )
+
+
+def write_scene_graph(scene, data):
+    outfits_data = data.get("outfits", [])
+    # Serializes concurrent saves of the same scene.
+    Scene.objects.select_for_update().filter(pk=scene.pk).exists()
+
+    # Only the scene author's own performers can be cast, the others are
+    # reported as missing.
+    performer_ids = {outfit_data["performer"] for outfit_data in outfits_data}
+    performer_names = dict(
+        Performer.objects.filter(
+            identifier__in=performer_ids, parent_user_id=scene.scene_author_id
+        ).values_list("identifier", "discord_username")
+    )
+    missing = performer_ids - set(performer_names)
+    if missing:
+        raise serializers.ValidationError(
+            {"outfits": [f"performer {pk} does not exist." for pk in missing]}
+        )
+
+    stored_outfits = {
+        outfit.identifier: outfit for outfit in Outfit.objects.filter(scene=scene)
+    }
+    stored_animations = {
+        animation.identifier: animation
+        for animation in Animation.objects.filter(outfit__scene=scene)
+    }
+    named = {outfit_data.get("identifier") for outfit_data in outfits_data}
+    unnamed_by_performer = {
+        outfit.performer_id: identifier
+        for identifier, outfit in stored_outfits.items()
+        if identifier not in named
+    }
+
+    outfits_to_create, outfits_to_update = [], []
+    animations_to_create, animations_to_update = [], []
+    kept_outfits, kept_animations = set(), set()
+    for outfit_data in outfits_data:
+        identifier = outfit_data.get("identifier")
+        if identifier is None:
+            identifier = unnamed_by_performer.pop(outfit_data["performer"], None)
+        outfit = claim(identifier, stored_outfits, kept_outfits, "outfit")
+        if outfit is None:
+            outfit = Outfit(scene=scene, settings=DEFAULT_OUTFIT_SETTINGS())
+            outfits_to_create.append(outfit)
+        else:
+            outfits_to_update.append(outfit)
+        outfit.performer_id = outfit_data["performer"]
+        # Outfit.save() names outfits after their performer, bulk writes skip it.
+        outfit.outfit_name = outfit_data.get("outfit_name") or (
+            performer_names[outfit.performer_id]
+        )
+        if "settings" in outfit_data:
+            outfit.settings = outfit_data["settings"]
+
+        animations_data = outfit_data.get("animations", [])
+        outfit.animations_count = len(animations_data)
+        for animation_data in animations_data:
+            animation = claim(
+                animation_data.get("identifier"),
+                stored_animations,
+                kept_animations,
+                "animation",
+            )
+            if animation is None:
+                animation = Animation()
+                animations_to_create.append(animation)
+            else:
+                animations_to_update.append(animation)
+            animation.outfit = outfit
+            animation.animation_type = animation_data["animation_type"]
+            animation.animation_path = animation_data["animation_path"]
+
+    # The order matters: animations move out of outfits before those are deleted,
+    # so the cascade does not catch them, and outfits change performer last, once
+    # the deleted outfits have freed their (scene, performer) slots.
+    # The counts are set outright, the deletes must not adjust them.
+    with counters_suspended():
+        Animation.objects.filter(
+            identifier__in=set(stored_animations) - kept_animations
+        ).delete()
+        Outfit.objects.bulk_create(outfits_to_create)
+        Animation.objects.bulk_create(animations_to_create)
+        Animation.objects.bulk_update(
+            animations_to_update, ["outfit", "animation_type", "animation_path"]
+        )
+        Outfit.objects.filter(
+            identifier__in=set(stored_outfits) - kept_outfits
+        ).delete()
+        Outfit.objects.bulk_update(
+            outfits_to_update,
+            ["performer", "outfit_name", "settings", "animations_count"],
+        )
+
+    scene.scene_name = data.get("scene_name", scene.scene_name)
+    scene.scene_settings = data.get("scene_settings", scene.scene_settings)
+    scene.outfits_count = len(outfits_data)
+    Scene.objects.filter(pk=scene.pk).update(
+        scene_name=scene.scene_name,
+        scene_settings=scene.scene_settings,
+        outfits_count=scene.outfits_count,
+    )
+    return scene
+
+
+# Copies a scene with all of its outfits and animations in one transaction.
+# Identifiers are assigned in memory, so each level is a single read and a
+# single bulk INSERT however large the scene is. The copy is never active.
+def clone_scene(scene, scene_name=None):
+    with transaction.atomic():
+        outfits = list(Outfit.objects.filter(scene=scene).order_by("created_date"))
+        animations = list(Animation.objects.filter(outfit__scene=scene).order_by("id"))
+
+        copy = Scene(
+            identifier=uuid.uuid4(),
+            scene_name=scene_name or scene.scene_name,
+            scene_author_id=scene.scene_author_id,
+            scene_settings=scene.scene_settings,
+            is_active=False,
+            outfits_count=len(outfits),
+        )
+        outfit_copies = {}
+        for outfit in outfits:
+            outfit_copies[outfit.identifier] = Outfit(
+                identifier=uuid.uuid4(),
+                scene=copy,
+                performer_id=outfit.performer_id,
+                outfit_name=outfit.outfit_name,
+                settings=outfit.settings,
+                animations_count=outfit.animations_count,
+            )
+        animation_copies = [
+            Animation(
+                identifier=uuid.uuid4(),
+                outfit=outfit_copies[animation.outfit_id],
+                animation_type=animation.animation_type,
+                animation_path=animation.animation_path,
+            )
+            for animation in animations
+        ]
+
+        # bulk_create() leaves the counters alone, the copies carry their counts.
+        Scene.objects.bulk_create([copy])
+        Outfit.objects.bulk_create(outfit_copies.values())
+        Animation.objects.bulk_create(animation_copies)
+    return copy
+
+
+# Returns the stored row an identifier refers to, or None for a new row.
+def claim(identifier, stored, kept, kind):
+    if identifier is None:
+        return None
+    if identifier not in stored:
+        raise serializers.ValidationError(
+            {"outfits": [f"{kind} {identifier} does not belong to this scene."]}
+        )
+    if identifier in kept:
+        raise serializers.ValidationError(
+            {"outfits": [f"{kind} {identifier} appears more than once."]}
+        )
+    kept.add(identifier)
+    return stored[identifier]
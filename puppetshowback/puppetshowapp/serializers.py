@@ -1,8 +1,22 @@
+import uuid
+from collections import Counter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import SAFE_METHODS
 from .models.configuration_models import Outfit, Scene
 from .models.authentication_models import DiscordPointingUser
-from .models.data_models import Animation, LogFile
+from .models.data_models import Animation, LogEntry, LogFile
+from .models.counter_cache import adjust_counter
 from .models.new_models import Performer
+from .log_index import index_log
+from .log_storage import store_upload
+from .scene_graph import apply_scene_graph
+from .timing import timed
 
 
 # class DiscordDataSerializer(serializers.ModelSerializer):
@@ -12,12 +26,185 @@ from .models.new_models import Performer
 #         read_only_field = ["user_username", "profile_picture"]
 
 
-class AnimationSerializer(serializers.ModelSerializer):
+def parse_field_paths(value):
+    # Turns "identifier,outfits.outfit_name" into
+    # {"identifier": {}, "outfits": {"outfit_name": {}}}.
+    if value is None or isinstance(value, dict):
+        return value
+    if isinstance(value, str):
+        value = value.split(",")
+    tree = {}
+    for path in value:
+        node = tree
+        for part in path.strip().split("."):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+# Sparse fieldsets and opt-in expansion.
+# ?fields= limits a response to the listed fields and ?expand= lists the nested
+# serializers to embed. Both take comma separated names, dotted to reach into
+# nested serializers, e.g. ?fields=identifier,outfits.outfit_name&expand=outfits
+# Without ?expand= every nested serializer is embedded, as it always has been.
+# The same options can be passed to the constructor as fields= and expand=.
+class FlexFieldsMixin:
+    # Ordering used when this serializer's rows are prefetched under a parent.
+    ordering = ()
+
+    def __init__(self, *args, **kwargs):
+        self._flex_options = None
+        if "fields" in kwargs or "expand" in kwargs:
+            self._flex_options = (
+                parse_field_paths(kwargs.pop("fields", None)),
+                parse_field_paths(kwargs.pop("expand", None)),
+            )
+        super().__init__(*args, **kwargs)
+
+    def to_representation(self, instance):
+        with timed("serialize"):
+            return super().to_representation(instance)
+
+    def is_root_serializer(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_flex_options(self):
+        if self._flex_options is not None:
+            return self._flex_options
+        request = self.context.get("request")
+        # Only reads are shaped by the query string, writes need every field.
+        if (
+            request is None
+            or request.method not in SAFE_METHODS
+            or not self.is_root_serializer()
+        ):
+            return None, None
+        return (
+            parse_field_paths(request.query_params.get("fields")),
+            parse_field_paths(request.query_params.get("expand")),
+        )
+
+    def get_child_flex_options(self, name):
+        only, expand = self.get_flex_options()
+        child_only = only.get(name) or None if only is not None else None
+        child_expand = expand.get(name, {}) if expand is not None else None
+        return child_only, child_expand
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, expand = self.get_flex_options()
+        if only is None and expand is None:
+            return fields
+        for name in list(fields):
+            field = fields[name]
+            nested = isinstance(field, serializers.BaseSerializer)
+            if only is not None and name not in only:
+                del fields[name]
+            elif nested and expand is not None and name not in expand:
+                del fields[name]
+            elif nested:
+                target = getattr(field, "child", field)
+                if isinstance(target, FlexFieldsMixin):
+                    target._flex_options = self.get_child_flex_options(name)
+        return fields
+
+    def get_related_lookups(self):
+        # The select_related paths and Prefetch objects needed to serialize
+        # the fields that are left after ?fields= and ?expand= are applied.
+        model = self.Meta.model
+        select_related = []
+        prefetch_related = []
+        for field in self.fields.values():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                child = field.child
+                if not isinstance(child, FlexFieldsMixin):
+                    continue
+                queryset = child.Meta.model.objects.order_by(*child.ordering)
+                prefetch_related.append(
+                    Prefetch(field.source, queryset=child.optimize_queryset(queryset))
+                )
+            elif len(field.source_attrs) > 1:
+                path = field.source_attrs[:-1]
+                try:
+                    if not model._meta.get_field(path[0]).is_relation:
+                        continue
+                except FieldDoesNotExist:
+                    continue
+                select_related.append("__".join(path))
+        return select_related, prefetch_related
+
+    def optimize_queryset(self, queryset):
+        select_related, prefetch_related = self.get_related_lookups()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    def prefetch_instances(self, instances):
+        select_related, prefetch_related = self.get_related_lookups()
+        prefetch_related_objects(instances, *select_related, *prefetch_related)
+
+
+# Looks up the outfits behind a set of outfit_identifier values in one query and
+# checks that the requesting user owns every one of them.
+# Returns {identifier: outfit}, with the outfits' scenes loaded.
+def resolve_owned_outfits(identifiers, context):
+    identifiers = set(identifiers)
+    try:
+        keys = {key: uuid.UUID(str(key)) for key in identifiers}
+    except ValueError:
+        raise serializers.ValidationError("outfit_identifier must be a valid UUID.")
+    outfits = Outfit.objects.select_related("scene").in_bulk(set(keys.values()))
+    missing = [key for key in identifiers if keys[key] not in outfits]
+    if missing:
+        raise serializers.ValidationError(
+            f"outfit_identifier {', '.join(map(str, missing))} does not exist and needs to be added first."
+        )
+    request = context.get("request")
+    if request is not None:
+        user_id = Token.objects.get(key=request.auth).user_id
+        if any(outfit.scene.scene_author_id != user_id for outfit in outfits.values()):
+            raise PermissionDenied("You are not the author of every outfit.")
+    return {key: outfits[keys[key]] for key in identifiers}
+
+
+# Lets animations/ take a list of animations, written with a single bulk INSERT.
+class AnimationListSerializer(serializers.ListSerializer):
+    def create(self, validated_data):
+        for attrs in validated_data:
+            if "outfit_identifier" not in attrs:
+                raise serializers.ValidationError(
+                    f"outfit_identifier is required to create an animation, provided data was {attrs}"
+                )
+        outfits = resolve_owned_outfits(
+            [attrs["outfit_identifier"] for attrs in validated_data], self.context
+        )
+        animations = []
+        added = Counter()
+        for attrs in validated_data:
+            outfit = outfits[attrs.pop("outfit_identifier")]
+            animations.append(Animation(outfit=outfit, **attrs))
+            added[outfit.pk] += 1
+        with transaction.atomic():
+            Animation.objects.bulk_create(animations)
+            adjust_counter(Animation, added)
+        return animations
+
+
+class AnimationSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    ordering = ("id",)
     outfit_identifier = serializers.CharField(write_only=True)
 
     class Meta:
         model = Animation
         fields = ("animation_type", "animation_path", "outfit_identifier", "identifier")
+        list_serializer_class = AnimationListSerializer
 
     def create(self, validated_data):
         if "outfit_identifier" not in validated_data:
@@ -25,19 +212,62 @@ class AnimationSerializer(serializers.ModelSerializer):
                 f"outfit_identifier is required to create an animation, provided data was {validated_data}"
             )
         outfit_id_clean = validated_data.pop("outfit_identifier")
-        try:
-            outfit = Outfit.objects.get(identifier=outfit_id_clean)
-        except Outfit.DoesNotExist:
-            raise serializers.ValidationError(
-                f"outfit_identifier {outfit_id_clean} does not exist and needs to be added first."
-            )
-        validated_data["outfit"] = outfit
+        outfits = resolve_owned_outfits([outfit_id_clean], self.context)
+        validated_data["outfit"] = outfits[outfit_id_clean]
         animation = Animation.objects.create(**validated_data)
         return animation
 
 
-class OutfitSerializer(serializers.ModelSerializer):
-    animations = AnimationSerializer(many=True, required=False, read_only=True)
+# Updates many animations at once for animations/bulk/.
+# Every row must name the animation it changes, every other field is optional.
+class AnimationBulkListSerializer(serializers.ListSerializer):
+    def update(self, instances, validated_data):
+        by_identifier = {animation.identifier: animation for animation in instances}
+        outfits = resolve_owned_outfits(
+            [
+                attrs["outfit_identifier"]
+                for attrs in validated_data
+                if "outfit_identifier" in attrs
+            ],
+            self.context,
+        )
+        deltas = Counter()
+        changed = set()
+        for attrs in validated_data:
+            animation = by_identifier[attrs.pop("identifier")]
+            if "outfit_identifier" in attrs:
+                outfit = outfits[attrs.pop("outfit_identifier")]
+                deltas[animation.outfit_id] -= 1
+                deltas[outfit.pk] += 1
+                animation.outfit = outfit
+                changed.add("outfit")
+            for field, value in attrs.items():
+                setattr(animation, field, value)
+                changed.add(field)
+        with transaction.atomic():
+            if changed:
+                Animation.objects.bulk_update(by_identifier.values(), changed)
+            adjust_counter(Animation, deltas)
+        return list(by_identifier.values())
+
+
+class AnimationBulkSerializer(AnimationSerializer):
+    identifier = serializers.UUIDField()
+    outfit_identifier = serializers.CharField(write_only=True, required=False)
+
+    class Meta(AnimationSerializer.Meta):
+        list_serializer_class = AnimationBulkListSerializer
+        extra_kwargs = {
+            "animation_type": {"required": False},
+            "animation_path": {"required": False},
+        }
+
+
+class OutfitSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    ordering = ("created_date", "identifier")
+    animations = AnimationSerializer(
+        many=True, required=False, read_only=True, source="animation_set"
+    )
     performer_id = serializers.CharField(write_only=True)
 
     class Meta:
@@ -130,8 +360,9 @@ class OutfitSerializerForPerformer(serializers.ModelSerializer):
 #         ]
 
 
-class SceneSerializer(serializers.ModelSerializer):
-    outfits = OutfitSerializerNoScene(many=True, required=False)
+class SceneSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    ordering = ("created_date", "identifier")
+    outfits = OutfitSerializerNoScene(many=True, required=False, source="outfit_set")
 
     class Meta:
         model = Scene
@@ -142,11 +373,13 @@ class SceneSerializer(serializers.ModelSerializer):
             "outfits",
             "identifier",
             "scene_author",
+            "outfits_count",
         )
-        read_only_fields = ["scene_author", "is_active"]
+        read_only_fields = ["scene_author", "is_active", "outfits_count"]
 
 
-class PerformerSerializer(serializers.ModelSerializer):
+class PerformerSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    ordering = ("created_date", "identifier")
     parent_user_snowflake = serializers.CharField(
         source="parent_user.discord_snowflake", read_only=True
     )
@@ -203,11 +436,25 @@ class StageSerializerCustomOutfit(StageSerializer):
         ).data
 
 
+# The user's active scene, with its outfits and animations fetched in bulk
+# instead of one animations query per outfit.
+class ActiveSceneSerializer(SceneSerializer):
+    def get_attribute(self, instance):
+        scene = instance.active_scene
+        if scene is not None:
+            self.prefetch_instances([scene])
+        return scene
+
+
 # TODO: Considier making this more succinct so tha the user's active scene isn't called twice.
-class UserSerializer(serializers.ModelSerializer):
-    scenes = SceneSerializer(many=True, required=False, read_only=True)
-    performers = PerformerSerializer(many=True, required=False, read_only=True)
-    active_scene = SceneSerializer(required=False, read_only=True)
+class UserSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    scenes = SceneSerializer(
+        many=True, required=False, read_only=True, source="scene_set"
+    )
+    performers = PerformerSerializer(
+        many=True, required=False, read_only=True, source="performer_set"
+    )
+    active_scene = ActiveSceneSerializer(required=False, read_only=True)
 
     class Meta:
         model = DiscordPointingUser
@@ -224,14 +471,87 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ["uuid", "discord_snowflake", "added_performer_count"]
 
 
+# The user document without its embedded scene and performer lists.
+# Used by the paged user view, which pages those lists separately.
+class UserSummarySerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    active_scene = ActiveSceneSerializer(required=False, read_only=True)
+
+    class Meta:
+        model = DiscordPointingUser
+        fields = [
+            "uuid",
+            "discord_snowflake",
+            "discord_username",
+            "active_scene",
+            "discord_avatar",
+            "added_performers_count",
+        ]
+        read_only_fields = fields
+
+
+# The writable scene -> outfits -> animations tree taken by the scene graph view.
+# Rows with an identifier are updated, rows without one are created, see scene_graph.py
+class AnimationGraphSerializer(serializers.ModelSerializer):
+    identifier = serializers.UUIDField(required=False)
+
+    class Meta:
+        model = Animation
+        fields = ("animation_type", "animation_path", "identifier")
+
+
+class OutfitGraphSerializer(serializers.ModelSerializer):
+    identifier = serializers.UUIDField(required=False)
+    performer = serializers.UUIDField()
+    animations = AnimationGraphSerializer(many=True, required=False)
+
+    class Meta:
+        model = Outfit
+        fields = ("performer", "outfit_name", "animations", "settings", "identifier")
+        extra_kwargs = {
+            "outfit_name": {"required": False, "allow_blank": True},
+            "settings": {"required": False},
+        }
+
+
+class SceneGraphSerializer(serializers.ModelSerializer):
+    outfits = OutfitGraphSerializer(many=True)
+
+    class Meta:
+        model = Scene
+        fields = ("scene_name", "scene_settings", "outfits")
+        extra_kwargs = {"scene_settings": {"required": False}}
+
+    def update(self, instance, validated_data):
+        return apply_scene_graph(instance, validated_data)
+
+
+# Stores an uploaded log compressed, see log_storage.
 class LogReceiver(serializers.ModelSerializer):
     class Meta:
         model = LogFile
-        fields = ["log_type", "log_file"]
+        fields = ["id", "log_type", "log_file", "created", "size"]
+        extra_kwargs = {"log_file": {"write_only": True}}
 
     def save(self, *args, **kwargs):
         log_file = self.validated_data["log_file"]
         log_type = self.validated_data["log_type"]
-        new_log = LogFile(log_type=log_type, log_file=log_file)
-        new_log.save()
-        return new_log
+        self.instance = store_upload(log_type, log_file)
+        index_log(self.instance)
+        return self.instance
+
+
+class LogEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LogEntry
+        fields = [
+            "id",
+            "log",
+            "timestamp",
+            "level",
+            "logger",
+            "request_id",
+            "fingerprint",
+            "message",
+            "offset",
+            "length",
+        ]
@@ -0,0 +1,165 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import count_cache_lookup, stage_rebuilds
+
+POLL_SECONDS = 0.005
+
+
+def version_key(user_id):
+    return f"stage-version:{user_id}"
+
+
+def new_version():
+    # Never one handed out before, even if the cache lost the last one.
+    return time.time_ns() // 1000
+
+
+# The version of every stage of `user_id`. A stage cached under an older one is
+# out of date.
+def stage_version(user_id):
+    version = cache.get(version_key(user_id))
+    if version is None:
+        cache.add(version_key(user_id), new_version(), None)
+        version = cache.get(version_key(user_id))
+    return version
+
+
+# Called once `user_id` wrote, see ReplicaPinMiddleware: their overlays rebuild
+# their stages on their next poll.
+def bump_stage_version(user_id):
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        cache.set(version_key(user_id), new_version(), None)
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+# Runs one call per key at a time in this process: the threads that ask for a
+# key while its call runs wait for it and share its result. If it fails, or
+# takes longer than `timeout`, they make the call themselves.
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def do(self, key, function, timeout):
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+        if not leader:
+            if flight.done.wait(timeout) and not flight.failed:
+                stage_rebuilds.inc(result="shared")
+                return flight.result
+            stage_rebuilds.inc(result="timeout")
+            return function()
+        try:
+            flight.result = function()
+        except BaseException:
+            flight.failed = True
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result
+
+
+flights = SingleFlight()
+
+
+def cached_entry(key, version):
+    entry = cache.get(key)
+    if entry is not None and entry[1] == version:
+        return entry
+    return None
+
+
+# Waits up to STAGE_COALESCE_WAIT for the worker that holds `lock` to cache the
+# stage, and returns its entry, or None if it did not.
+def wait_for_rebuild(key, version, lock):
+    deadline = time.monotonic() + settings.STAGE_COALESCE_WAIT
+    while True:
+        entry = cached_entry(key, version)
+        if entry is not None:
+            stage_rebuilds.inc(result="shared")
+            return entry
+        if time.monotonic() >= deadline or cache.get(lock) is None:
+            stage_rebuilds.inc(result="timeout")
+            return None
+        time.sleep(POLL_SECONDS)
+
+
+def owner_key(identifier):
+    return f"stage-owner:{identifier}"
+
+
+# Builds the stage of `identifier`, and caches it under `version`, the version
+# of `owner`'s stages read before the build started: a write that lands during
+# the build moves the version past it, so the stage it may have missed is never
+# served. A stage whose owner was not known before is not cached, as no version
+# was read for it, only its owner, for the next request.
+def rebuild(identifier, owner, version, build):
+    key = f"stage:{identifier}"
+    lock = f"stage-rebuild:{identifier}:{version}"
+    locked = False
+    if settings.STAGE_COALESCE_SHARED and version is not None:
+        locked = cache.add(lock, 1, settings.STAGE_COALESCE_WAIT)
+        if not locked:
+            entry = wait_for_rebuild(key, version, lock)
+            if entry is not None:
+                return entry[2]
+    try:
+        built = build(identifier)
+        stage_rebuilds.inc(result="built")
+        if built is None:
+            return None
+        built_owner, data = built
+        if built_owner != owner:
+            cache.set(owner_key(identifier), built_owner, None)
+        elif version is not None:
+            cache.set(key, (owner, version, data), settings.STAGE_CACHE_SECONDS)
+        return data
+    finally:
+        if locked:
+            cache.delete(lock)
+
+
+# The stage of the performer `identifier`, from the cache while its owner's
+# stage version is unchanged. `build(identifier)` makes it on a miss, and
+# returns (owner id, stage) or None when there is no such performer. Every
+# overlay of a streamer misses at once after SetActiveScene, so only one
+# request per stage version rebuilds the stage while the others of the worker
+# wait for it, and, with STAGE_COALESCE_SHARED, those of the other workers too.
+# Without STAGE_CACHE_SECONDS the requests of the worker still share a build.
+def cached_stage(identifier, build):
+    if not settings.STAGE_CACHE_SECONDS:
+        built = flights.do(
+            (identifier, None),
+            lambda: build(identifier),
+            settings.STAGE_COALESCE_WAIT,
+        )
+        return None if built is None else built[1]
+    entry = cache.get(f"stage:{identifier}")
+    owner = entry[0] if entry is not None else cache.get(owner_key(identifier))
+    version = stage_version(owner) if owner is not None else None
+    if entry is not None and entry[1] == version:
+        count_cache_lookup("stage", True)
+        return entry[2]
+    count_cache_lookup("stage", False)
+    return flights.do(
+        (identifier, version),
+        lambda: rebuild(identifier, owner, version, build),
+        settings.STAGE_COALESCE_WAIT,
+    )
@@ -0,0 +1,147 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import (
+    APIClient,
+    APITestCase,
+)
+from rest_framework.authtoken.models import Token
+
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Scene, Outfit
+from puppetshowapp.models.new_models import Performer
+from puppetshowapp.models.data_models import Animation
+
+
+class AnimationBulkTestCase(APITestCase):
+    def setUp(self):
+        self.user = DiscordPointingUser.objects.create(
+            discord_snowflake="1234567890", discord_username="test_user"
+        )
+        self.user_2 = DiscordPointingUser.objects.create(
+            discord_snowflake="09876543210", discord_username="test_user_2"
+        )
+        self.scene = Scene.objects.create(scene_author=self.user, scene_name="scene")
+        self.scene_2 = Scene.objects.create(
+            scene_author=self.user_2, scene_name="scene_2"
+        )
+        self.outfits = []
+        for i in range(4):
+            performer = Performer.objects.create(
+                parent_user=self.user,
+                discord_username=f"test_performer_{i}",
+                discord_snowflake=f"696942{i}",
+            )
+            self.outfits.append(
+                Outfit.objects.create(
+                    performer=performer, scene=self.scene, outfit_name=f"outfit_{i}"
+                )
+            )
+        self.other_outfit = Outfit.objects.create(
+            performer=performer, scene=self.scene_2, outfit_name="other"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(token=self.token)
+
+    def animations(self, outfits, animation_type="START_SPEAKING"):
+        return [
+            {
+                "outfit_identifier": str(outfit.identifier),
+                "animation_type": animation_type,
+                "animation_path": "https://example.com/speak.gif",
+            }
+            for outfit in outfits
+        ]
+
+    # Make sure that a list posted to animations/ is created with a fixed number of queries.
+    def test_create_list(self):
+        url = reverse("animations-create")
+        with CaptureQueriesContext(connection) as one:
+            response = self.client.post(
+                url, self.animations(self.outfits[:1]), format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.post(
+                url, self.animations(self.outfits * 3), format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 12)
+        self.assertEqual(len(one), len(many))
+        self.assertEqual(Animation.objects.count(), 13)
+        self.outfits[0].refresh_from_db()
+        self.assertEqual(self.outfits[0].animations_count, 4)
+
+    # Make sure that nothing is created when any of the outfits belongs to someone else.
+    def test_create_list_not_owner(self):
+        data = self.animations(self.outfits + [self.other_outfit])
+        response = self.client.post(reverse("animations-create"), data, format="json")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Animation.objects.count(), 0)
+
+    # Make sure that animations/bulk/ updates many animations and moves them between outfits.
+    def test_bulk_patch(self):
+        animations = [
+            Animation.objects.create(
+                outfit=outfit,
+                animation_type="START_SPEAKING",
+                animation_path="https://example.com/speak.gif",
+            )
+            for outfit in self.outfits
+        ]
+        data = [
+            {"identifier": str(animation.identifier), "animation_type": "NOT_SPEAKING"}
+            for animation in animations
+        ]
+        data[0]["outfit_identifier"] = str(self.outfits[1].identifier)
+        response = self.client.patch(reverse("animations-bulk"), data, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            Animation.objects.filter(animation_type="NOT_SPEAKING").count(), 4
+        )
+        self.outfits[0].refresh_from_db()
+        self.outfits[1].refresh_from_db()
+        self.assertEqual(self.outfits[0].animations_count, 0)
+        self.assertEqual(self.outfits[1].animations_count, 2)
+
+    # Make sure that animations/bulk/ deletes many animations and keeps the counts right.
+    def test_bulk_delete(self):
+        animations = [
+            Animation.objects.create(
+                outfit=outfit,
+                animation_type="START_SPEAKING",
+                animation_path="https://example.com/speak.gif",
+            )
+            for outfit in self.outfits + self.outfits
+        ]
+        identifiers = [str(animation.identifier) for animation in animations[:5]]
+        response = self.client.delete(
+            reverse("animations-bulk"), {"identifiers": identifiers}, format="json"
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(Animation.objects.count(), 3)
+        self.outfits[0].refresh_from_db()
+        self.outfits[1].refresh_from_db()
+        self.assertEqual(self.outfits[0].animations_count, 0)
+        self.assertEqual(self.outfits[1].animations_count, 1)
+
+    # Make sure that animations belonging to someone else cannot be changed or deleted.
+    def test_bulk_not_owner(self):
+        animation = Animation.objects.create(
+            outfit=self.other_outfit,
+            animation_type="START_SPEAKING",
+            animation_path="https://example.com/speak.gif",
+        )
+        url = reverse("animations-bulk")
+        data = [{"identifier": str(animation.identifier), "animation_path": "x"}]
+        response = self.client.patch(url, data, format="json")
+        self.assertEqual(response.status_code, 400)
+        data[0]["animation_path"] = "https://example.com/other.gif"
+        response = self.client.patch(url, data, format="json")
+        self.assertEqual(response.status_code, 403)
+        response = self.client.delete(
+            url, {"identifiers": [str(animation.identifier)]}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(Animation.objects.filter(pk=animation.pk).exists())
@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from contextlib import redirect_stdout
+
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+
+from puppetshowapp import benchmark
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Outfit, Scene
+
+
+class BenchmarkTestCase(TestCase):
+    def setUp(self):
+        self.counts = benchmark.generate_dataset(
+            users=3,
+            scenes_per_user=2,
+            performers_per_user=3,
+            outfits_per_scene=2,
+            animations_per_outfit=2,
+            seed=1,
+        )
+
+    # Make sure that the dataset has the requested shape and consistent counters.
+    def test_generate_dataset(self):
+        self.assertEqual(
+            self.counts,
+            {"users": 3, "performers": 9, "scenes": 6, "outfits": 12, "animations": 24},
+        )
+        self.assertEqual(Scene.objects.filter(is_active=True).count(), 3)
+        for outfit in Outfit.objects.annotate(total=Count("animation")):
+            self.assertEqual(outfit.animations_count, outfit.total)
+        for scene in Scene.objects.annotate(total=Count("outfit")):
+            self.assertEqual(scene.outfits_count, scene.total)
+
+        # The same seed gives the same rows.
+        identifiers = set(Outfit.objects.values_list("identifier", flat=True))
+        self.assertEqual(benchmark.clear_dataset(), 3)
+        benchmark.generate_dataset(
+            users=3,
+            scenes_per_user=2,
+            performers_per_user=3,
+            outfits_per_scene=2,
+            animations_per_outfit=2,
+            seed=1,
+        )
+        self.assertEqual(
+            set(Outfit.objects.values_list("identifier", flat=True)), identifiers
+        )
+
+    # Make sure that running again without clearing keeps the users there and
+    # only adds the missing ones.
+    def test_generate_again(self):
+        identifiers = set(Outfit.objects.values_list("identifier", flat=True))
+        with redirect_stdout(StringIO()) as output:
+            call_command(
+                "generateDataset",
+                users=4,
+                scenes_per_user=2,
+                performers_per_user=3,
+                outfits_per_scene=2,
+                animations_per_outfit=2,
+                seed=1,
+            )
+        self.assertIn("Created 1 users", output.getvalue())
+        self.assertEqual(DiscordPointingUser.objects.count(), 4)
+        self.assertTrue(
+            identifiers < set(Outfit.objects.values_list("identifier", flat=True))
+        )
+        counts = benchmark.generate_dataset(users=4, seed=1)
+        self.assertEqual(counts["users"], 0)
+
+    # Make sure that every endpoint is measured and that runs can be diffed.
+    def test_run_benchmarks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "baseline.json")
+            with redirect_stdout(StringIO()):
+                call_command("runBenchmarks", requests=4, warmup=1, output=output)
+            with open(output) as file:
+                report = json.load(file)
+        self.assertEqual(list(report["results"]), list(benchmark.ENDPOINTS))
+        for result in report["results"].values():
+            self.assertEqual(result["requests"], 4)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+            self.assertGreater(result["queries_per_request"], 0)
+        self.assertEqual(
+            report["dataset"]["users"], DiscordPointingUser.objects.count()
+        )
+
+        slower = json.loads(json.dumps(report))
+        slower["results"]["stage"]["p50_ms"] = report["results"]["stage"]["p50_ms"] * 2
+        changes = benchmark.compare(report, slower)
+        self.assertEqual(changes["stage"]["p50_ms"][2], 100.0)
+        self.assertEqual(changes["user-info"]["p99_ms"][2], 0.0)
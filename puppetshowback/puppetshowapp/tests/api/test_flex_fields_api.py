@@ -0,0 +1,110 @@
+from django.urls import reverse
+from rest_framework.test import (
+    APIClient,
+    APITestCase,
+)
+from rest_framework.authtoken.models import Token
+
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Scene, Outfit
+from puppetshowapp.models.new_models import Performer
+from puppetshowapp.models.data_models import Animation
+
+
+class FlexFieldsTestCase(APITestCase):
+    def setUp(self):
+        self.user = DiscordPointingUser.objects.create(
+            discord_snowflake="1234567890", discord_username="test_user"
+        )
+        self.scenes = []
+        for i in range(3):
+            scene = Scene.objects.create(
+                scene_author=self.user, scene_name=f"test_scene_{i}"
+            )
+            self.scenes.append(scene)
+        for i in range(3):
+            performer = Performer.objects.create(
+                parent_user=self.user,
+                discord_username=f"test_performer_{i}",
+                discord_snowflake=f"696942{i}",
+            )
+            for scene in self.scenes:
+                outfit = Outfit.objects.create(
+                    performer=performer, scene=scene, outfit_name=f"outfit_{i}"
+                )
+                Animation.objects.create(
+                    outfit=outfit,
+                    animation_type="START_SPEAKING",
+                    animation_path="https://example.com/speak.gif",
+                )
+        self.scenes[0].set_active()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(token=self.token)
+
+    # Make sure that ?fields= limits the response to the listed fields.
+    def test_sparse_fields(self):
+        url = reverse("scene-detail", args=[self.scenes[0].identifier])
+        response = self.client.get(url + "?fields=identifier,scene_name")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {"identifier", "scene_name"})
+        response = self.client.get(url + "?fields=scene_name,outfits.outfit_name")
+        response_dict = response.json()
+        self.assertEqual(set(response_dict), {"scene_name", "outfits"})
+        self.assertEqual(len(response_dict["outfits"]), 3)
+        self.assertEqual(set(response_dict["outfits"][0]), {"outfit_name"})
+
+    # Make sure that nested serializers are only embedded when asked for once ?expand= is used.
+    def test_expand(self):
+        url = reverse("scene-detail", args=[self.scenes[0].identifier])
+        response = self.client.get(url + "?expand=")
+        self.assertNotIn("outfits", response.json())
+        response = self.client.get(url + "?expand=outfits")
+        response_dict = response.json()
+        self.assertEqual(len(response_dict["outfits"]), 3)
+        self.assertNotIn("animations", response_dict["outfits"][0])
+        response = self.client.get(url + "?expand=outfits.animations")
+        response_dict = response.json()
+        self.assertEqual(len(response_dict["outfits"][0]["animations"]), 1)
+        # Without either option the full document is returned, as before.
+        response = self.client.get(url)
+        self.assertEqual(len(response.json()["outfits"][0]["animations"]), 1)
+
+    # Make sure that only the requested relations are queried for.
+    def test_list_queries_follow_expansion(self):
+        url = reverse("scene-list")
+        # Token checks in the permission, token and user in the view, then the scenes.
+        with self.assertNumQueries(4):
+            response = self.client.get(url + "?expand=")
+        self.assertEqual(len(response.json()["results"]), 3)
+        # One more query per expanded level, however many scenes there are.
+        with self.assertNumQueries(6):
+            response = self.client.get(url + "?expand=outfits.animations")
+        self.assertEqual(len(response.json()["results"][2]["outfits"]), 3)
+
+    # Make sure that the user document can be trimmed down to names and ids.
+    def test_user_sparse_fields(self):
+        url = reverse("user-info")
+        response = self.client.get(
+            url + "?fields=uuid,scenes.scene_name,scenes.identifier&expand=scenes"
+        )
+        response_dict = response.json()
+        self.assertEqual(set(response_dict), {"uuid", "scenes"})
+        self.assertEqual(
+            [scene["scene_name"] for scene in response_dict["scenes"]],
+            ["test_scene_0", "test_scene_1", "test_scene_2"],
+        )
+        self.assertEqual(set(response_dict["scenes"][0]), {"scene_name", "identifier"})
+        response = self.client.get(url)
+        response_dict = response.json()
+        self.assertEqual(len(response_dict["performers"]), 3)
+        self.assertEqual(response_dict["active_scene"]["scene_name"], "test_scene_0")
+
+    # Make sure that writes are not affected by the query string.
+    def test_fields_ignored_on_write(self):
+        url = reverse("scene-detail", args=[self.scenes[1].identifier])
+        response = self.client.patch(
+            url + "?fields=identifier", {"scene_name": "renamed"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["scene_name"], "renamed")
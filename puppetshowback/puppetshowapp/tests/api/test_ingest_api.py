@@ -0,0 +1,181 @@
+import gzip
+import json
+import tempfile
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient, APITestCase
+
+from puppetshowapp import ingest
+from puppetshowapp.models.data_models import LogFile
+
+
+def ndjson(*events):
+    return "\n".join(json.dumps(event) for event in events) + "\n"
+
+
+class LogIngestTestCase(APITestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(
+            MEDIA_ROOT=media.name, LOG_INGEST_SAMPLE={}, LOG_COMPRESSION="gzip"
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        ingest.buffer.take()
+        self.addCleanup(ingest.buffer.take)
+        self.client = APIClient()
+        self.url = reverse("log-ingest")
+
+    def post(self, body, client_id="overlay-1"):
+        return self.client.post(
+            self.url,
+            body,
+            content_type="application/x-ndjson",
+            HTTP_X_CLIENT_ID=client_id,
+        )
+
+    # Make sure that events are buffered without touching the database, then
+    # stored in one log per type.
+    def test_ingest(self):
+        body = ndjson(
+            {"level": "error", "message": "stage failed"},
+            {"level": "warn", "message": "slow"},
+            {"level": "error", "message": "stage failed again"},
+        )
+        with self.assertNumQueries(0):
+            response = self.post(body + "not json\n[1]\n")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(
+            response.json(),
+            {
+                "accepted": 3,
+                "sampled_out": 0,
+                "throttled": 0,
+                "rejected": 2,
+                "dropped": 0,
+            },
+        )
+        self.assertEqual(LogFile.objects.count(), 0)
+        logs = {log.log_type: log for log in ingest.buffer.flush()}
+        self.assertEqual(set(logs), {"ERROR", "WARNING"})
+        self.assertEqual(
+            list(logs["ERROR"].entries.values_list("message", flat=True)),
+            ["stage failed", "stage failed again"],
+        )
+        with logs["ERROR"].log_file.open("rb") as file:
+            events = [
+                json.loads(line) for line in gzip.decompress(file.read()).splitlines()
+            ]
+        self.assertEqual(
+            [event["message"] for event in events],
+            ["stage failed", "stage failed again"],
+        )
+        self.assertNotIn("overlay-1", json.dumps(events))
+        self.assertEqual(events[0]["client"], events[1]["client"])
+
+    # Make sure that timestamps out of range fall back to the entry before
+    # them instead of failing the flush.
+    def test_bad_timestamps(self):
+        body = ndjson(
+            {"level": "error", "message": "first", "ts": 1790000000},
+            {"level": "error", "message": "far", "ts": 1e20},
+            {"level": "error", "message": "nan", "ts": float("nan")},
+            {"level": "warn", "message": "slow"},
+        )
+        self.assertEqual(self.post(body).json()["accepted"], 4)
+        logs = {log.log_type: log for log in ingest.buffer.flush()}
+        self.assertEqual(set(logs), {"ERROR", "WARNING"})
+        entries = list(logs["ERROR"].entries.order_by("offset"))
+        self.assertEqual([entry.message for entry in entries], ["first", "far", "nan"])
+        self.assertEqual({entry.timestamp for entry in entries}, {entries[0].timestamp})
+        self.assertEqual(logs["WARNING"].entries.count(), 1)
+
+    # Make sure that sampled out clients lose all their events of that level.
+    def test_sampling(self):
+        with self.settings(LOG_INGEST_SAMPLE={"INFO": 0}):
+            response = self.post(
+                ndjson({"level": "info"}, {"level": "info"}, {"level": "error"})
+            )
+        self.assertEqual(response.json()["accepted"], 1)
+        self.assertEqual(response.json()["sampled_out"], 2)
+
+    # Make sure that addresses are limited to LOG_INGEST_RATE events a minute,
+    # whatever client ids they send.
+    def test_rate_limit(self):
+        with self.settings(LOG_INGEST_RATE=3):
+            response = self.post(ndjson({}, {}))
+            self.assertEqual(response.json()["accepted"], 2)
+            response = self.post(ndjson({}, {}))
+            self.assertEqual(response.json()["accepted"], 1)
+            self.assertEqual(response.json()["throttled"], 1)
+            response = self.post(ndjson({}))
+            self.assertEqual(response.status_code, 429)
+            self.assertTrue(0 < int(response["Retry-After"]) <= 60)
+            response = self.post(ndjson({}), client_id="overlay-2")
+            self.assertEqual(response.status_code, 429)
+            response = self.client.post(
+                self.url,
+                ndjson({}),
+                content_type="application/x-ndjson",
+                HTTP_X_CLIENT_ID="overlay-2",
+                REMOTE_ADDR="10.0.0.2",
+            )
+            self.assertEqual(response.status_code, 202)
+
+    # Make sure that oversized batches are refused and a full buffer drops events.
+    def test_limits(self):
+        with self.settings(LOG_INGEST_MAX_BYTES=10):
+            response = self.post(ndjson({"message": "too long for the limit"}))
+        self.assertEqual(response.status_code, 413)
+        with self.settings(LOG_INGEST_BUFFER_BYTES=150):
+            response = self.post(ndjson(*[{"message": "x" * 20}] * 5))
+        self.assertEqual(response.json()["accepted"], 1)
+        self.assertEqual(response.json()["dropped"], 4)
+
+    # Make sure that events are kept for the next flush when storing them fails.
+    def test_store_failure(self):
+        self.post(ndjson({"level": "error", "message": "kept"}, {"level": "warn"}))
+        with mock.patch.object(
+            ingest.log_storage, "store_log", side_effect=OSError("disk full")
+        ):
+            with self.assertRaises(OSError):
+                ingest.buffer.flush()
+        logs = ingest.buffer.flush()
+        self.assertEqual(len(logs), 2)
+        self.assertEqual(LogFile.objects.count(), 2)
+        self.assertEqual(ingest.buffer.flush(), [])
+
+    # Make sure that a Content-Length that is not a number is a client error.
+    def test_bad_content_length(self):
+        response = self.client.post(
+            self.url,
+            ndjson({}),
+            content_type="application/x-ndjson",
+            CONTENT_LENGTH="many",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    # Make sure that flushes prune the stored logs, as uploads do.
+    def test_flush_prunes(self):
+        self.post(ndjson({"level": "error"}))
+        with mock.patch.object(ingest.log_storage, "maybe_prune") as maybe_prune:
+            ingest.buffer.flush()
+            maybe_prune.assert_called_once_with()
+            ingest.buffer.flush()
+            maybe_prune.assert_called_once_with()
+
+    # Make sure that buffered events are flushed on time even when no other
+    # batch comes in after them.
+    def test_flush_on_time(self):
+        buffer = ingest.IngestBuffer()
+        flushed = threading.Event()
+        buffer.flush = flushed.set
+        with self.settings(LOG_INGEST_FLUSH_SECONDS=0.05):
+            buffer.add([{"message": "alone"}])
+            self.assertFalse(flushed.is_set())
+            self.assertTrue(flushed.wait(5))
@@ -0,0 +1,56 @@
+import asyncio
+
+from django.test import LiveServerTestCase, override_settings
+
+from puppetshowapp import benchmark
+from puppetshowapp.loadgen import Connection, LoadGenerator
+
+
+class LoadGeneratorTestCase(LiveServerTestCase):
+    def setUp(self):
+        benchmark.generate_dataset(
+            users=2,
+            scenes_per_user=2,
+            performers_per_user=2,
+            outfits_per_scene=2,
+            animations_per_outfit=1,
+        )
+        self.streamers = benchmark.benchmark_users(2, benchmark.random.Random(0))
+
+    # Make sure that one connection serves several requests.
+    def test_connection(self):
+        async def fetch():
+            connection = Connection(self.live_server_url)
+            path = f"/ps/stage/{self.streamers[0]['performers'][0]}/"
+            try:
+                return [await connection.request("GET", path) for _ in range(3)]
+            finally:
+                await connection.close()
+
+        for status, body in asyncio.run(fetch()):
+            self.assertEqual(status, 200)
+            self.assertIn(b"get_outfit", body)
+
+    # Make sure that overlays, scene switches and dashboards are all simulated.
+    # The live server's threads share the in-memory test database connection, so
+    # concurrent requests count each other's queries against their budgets, and
+    # may fail on SQLite's table locks. Only the client has to be error free.
+    @override_settings(QUERY_BUDGET_ENFORCE=False)
+    def test_run(self):
+        generator = LoadGenerator(
+            self.live_server_url,
+            self.streamers,
+            clients=4,
+            interval=0.1,
+            switch_every=0.3,
+            dashboard_clients=2,
+            dashboard_interval=0.2,
+        )
+        report = asyncio.run(generator.run(1.0))
+        requests = report["requests"]
+        self.assertGreater(requests["stage"]["requests"], 10)
+        self.assertGreater(requests["set-active"]["requests"], 0)
+        self.assertGreater(requests["stage-burst"]["requests"], 0)
+        self.assertGreater(requests["dashboard"]["requests"], 0)
+        self.assertEqual(set(report["total"]["errors"]) - {"500"}, set())
+        self.assertLessEqual(report["total"]["p50_ms"], report["total"]["p99_ms"])
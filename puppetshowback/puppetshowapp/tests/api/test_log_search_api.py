@@ -0,0 +1,127 @@
+import json
+import tempfile
+
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from puppetshowapp import log_index, log_storage
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.data_models import LogEntry
+
+TEXT_LOG = b"""2026-10-01 12:00:00,100 INFO server started
+2026-10-01 12:00:01,200 ERROR Scene 123 not found
+Traceback (most recent call last):
+  File "views.py", line 10, in get
+KeyError: 123
+2026-10-01 12:00:02,300 ERROR Scene 456 not found
+2026-10-01 12:00:03,400 WARNING slow query
+"""
+
+
+def json_log(*events):
+    return "".join(json.dumps(event) + "\n" for event in events).encode()
+
+
+class LogSearchTestCase(APITestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(
+            MEDIA_ROOT=media.name, LOG_CHUNK_BYTES=64, LOG_COMPRESSION="gzip"
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        admin = DiscordPointingUser.objects.create(
+            discord_snowflake="9876543210", is_superuser=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(token=Token.objects.create(user=admin))
+
+    def store(self, content, log_type="ERROR"):
+        log = log_storage.store_log(log_type, [content])
+        log_index.index_log(log)
+        return log
+
+    # Make sure that entries are split, tracebacks included, and point at
+    # their bytes in the log across frames.
+    def test_index_text(self):
+        log = self.store(TEXT_LOG, "INFO")
+        entries = list(log.entries.order_by("offset"))
+        self.assertEqual(
+            [entry.level for entry in entries], ["INFO", "ERROR", "ERROR", "WARNING"]
+        )
+        self.assertEqual(entries[1].message, "Scene 123 not found")
+        self.assertEqual(
+            entries[1].timestamp.isoformat(), "2026-10-01T12:00:01.200000+00:00"
+        )
+        self.assertEqual(entries[1].fingerprint, entries[2].fingerprint)
+        self.assertNotEqual(entries[1].fingerprint, entries[3].fingerprint)
+        response = self.client.get(
+            reverse("log-download", args=[log.pk]),
+            HTTP_RANGE=f"bytes={entries[1].offset}-{entries[1].offset + entries[1].length - 1}",
+        )
+        body = b"".join(response.streaming_content).decode()
+        self.assertTrue(body.startswith("2026-10-01 12:00:01,200 ERROR"))
+        self.assertTrue(body.endswith("KeyError: 123\n"))
+
+    # Make sure that JSON lines are read field by field.
+    def test_index_json(self):
+        log = self.store(
+            json_log(
+                {
+                    "ts": "2026-10-01T12:00:00+00:00",
+                    "level": "warn",
+                    "logger": "overlay.stage",
+                    "request_id": "r-1",
+                    "message": "reconnecting",
+                },
+                {"timestamp": 1790000000000, "message": "no level"},
+            )
+        )
+        first, second = log.entries.order_by("offset")
+        self.assertEqual(
+            (first.level, first.logger, first.request_id, first.message),
+            ("WARNING", "overlay.stage", "r-1", "reconnecting"),
+        )
+        self.assertEqual(second.level, "ERROR")
+        self.assertEqual(second.timestamp.year, 2026)
+
+    # Make sure that entries can be searched by time range and level, a page at
+    # a time, newest first.
+    def test_search(self):
+        self.store(TEXT_LOG, "INFO")
+        url = reverse("log-entries")
+        response = self.client.get(url, {"level": "error,warning", "page_size": 2})
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual(
+            [entry["message"] for entry in page["results"]],
+            ["slow query", "Scene 456 not found"],
+        )
+        page = self.client.get(page["next"]).json()
+        self.assertEqual(len(page["results"]), 1)
+        self.assertIsNone(page["next"])
+        response = self.client.get(
+            url,
+            {"since": "2026-10-01T12:00:01Z", "until": "2026-10-01T12:00:02Z"},
+        )
+        self.assertEqual(len(response.json()["results"]), 1)
+        self.assertEqual(self.client.get(url, {"level": "loud"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"since": "soon"}).status_code, 400)
+
+    # Make sure that issues are ranked by how often they recur.
+    def test_issues(self):
+        self.store(TEXT_LOG, "INFO")
+        self.store(b"2026-10-01 13:00:00 ERROR Scene 789 not found\n")
+        response = self.client.get(
+            reverse("log-issues"), {"since": "2026-10-01T00:00:00Z", "level": "ERROR"}
+        )
+        issues = response.json()["issues"]
+        self.assertEqual(len(issues), 1)
+        self.assertEqual(issues[0]["count"], 3)
+        self.assertEqual(issues[0]["message"], "Scene 789 not found")
+        self.assertEqual(LogEntry.objects.count(), 5)
+        for limit in ("0", "-1", "many"):
+            response = self.client.get(reverse("log-issues"), {"limit": limit})
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,110 @@
+import gzip
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from puppetshowapp import log_storage
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.data_models import LogFile
+
+CONTENT = b"".join(b"%05d overlay lost its connection\n" % i for i in range(200))
+
+
+class LogStorageTestCase(APITestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(
+            MEDIA_ROOT=media.name, LOG_CHUNK_BYTES=1000, LOG_COMPRESSION="gzip"
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = DiscordPointingUser.objects.create(discord_snowflake="1234567890")
+        self.admin = DiscordPointingUser.objects.create(
+            discord_snowflake="9876543210", is_superuser=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(token=Token.objects.create(user=self.admin))
+
+    def download(self, log, **headers):
+        response = self.client.get(reverse("log-download", args=[log.pk]), **headers)
+        return response, b"".join(response.streaming_content)
+
+    # Make sure that uploads are stored compressed, in frames that can be read
+    # back one by one.
+    def test_upload(self):
+        client = APIClient()
+        client.force_authenticate(token=Token.objects.create(user=self.user))
+        upload = ContentFile(CONTENT, name="overlay.log")
+        response = client.post(
+            reverse("log-upload"), {"log_type": "ERROR", "log_file": upload}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["size"], len(CONTENT))
+        log = LogFile.objects.get(pk=response.json()["id"])
+        self.assertEqual(log.encoding, "gzip")
+        self.assertEqual(len(log.chunks), -(-len(CONTENT) // 1000))
+        self.assertTrue(log.log_file.name.endswith(".gz"))
+        with log.log_file.open("rb") as file:
+            stored = file.read()
+        self.assertEqual(len(stored), log.stored_size)
+        self.assertLess(log.stored_size, len(CONTENT))
+        self.assertEqual(gzip.decompress(stored), CONTENT)
+
+    # Make sure that whole logs and ranges of them are served uncompressed.
+    def test_download(self):
+        log = log_storage.store_log("ERROR", [CONTENT[:700], CONTENT[700:]])
+        response, body = self.download(log)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(body, CONTENT)
+        response, body = self.download(log, HTTP_RANGE="bytes=1500-2600")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 1500-2600/{len(CONTENT)}")
+        self.assertEqual(body, CONTENT[1500:2601])
+        response, body = self.download(log, HTTP_RANGE="bytes=-10")
+        self.assertEqual(body, CONTENT[-10:])
+        response = self.client.get(
+            reverse("log-download", args=[log.pk]),
+            HTTP_RANGE=f"bytes={len(CONTENT)}-",
+        )
+        self.assertEqual(response.status_code, 416)
+        client = APIClient()
+        client.force_authenticate(token=Token.objects.create(user=self.user))
+        response = client.get(reverse("log-download", args=[log.pk]))
+        self.assertEqual(response.status_code, 403)
+
+    # Make sure that logs stored before compression can still be downloaded.
+    def test_download_uncompressed(self):
+        log = LogFile(log_type="INFO")
+        log.log_file.save("old.log", ContentFile(CONTENT))
+        response, body = self.download(log, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(body, CONTENT[10:20])
+
+    # Make sure that logs past their retention or their type's size cap go,
+    # files included, oldest first.
+    def test_prune(self):
+        now = timezone.now()
+        logs = []
+        for days, log_type in ((10, "INFO"), (1, "INFO"), (3, "ERROR"), (2, "ERROR")):
+            log = log_storage.store_log(log_type, [CONTENT])
+            LogFile.objects.filter(pk=log.pk).update(created=now - timedelta(days))
+            logs.append(log)
+        cap = logs[3].stored_size + logs[2].stored_size // 2
+        with self.settings(
+            LOG_RETENTION_DAYS={"INFO": 7}, LOG_MAX_BYTES={"ERROR": cap}
+        ):
+            self.assertEqual(log_storage.prune_logs(now), 2)
+        self.assertEqual(
+            set(LogFile.objects.values_list("pk", flat=True)),
+            {logs[1].pk, logs[3].pk},
+        )
+        self.assertFalse(os.path.exists(logs[0].log_file.path))
+        self.assertFalse(os.path.exists(logs[2].log_file.path))
+        self.assertTrue(os.path.exists(logs[3].log_file.path))
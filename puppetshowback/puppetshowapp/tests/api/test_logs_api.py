@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import sys
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.test import RequestFactory, TestCase
+
+from puppetshowapp import logs
+from puppetshowapp.views import authentication_views
+
+
+def make_record(name="puppetshowapp.test", level=logging.INFO, msg="hello", **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class LogPipelineTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "puppetshow.log")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_handler(self, **kwargs):
+        handler = logs.QueueHandler(
+            filename=self.filename, console_level="CRITICAL", **kwargs
+        )
+        self.addCleanup(handler.close)
+        return handler
+
+    # Make sure that records are written as JSON, with their extra fields.
+    def test_json_format(self):
+        try:
+            raise ValueError("broken")
+        except ValueError:
+            logger = logging.getLogger("puppetshowapp.test")
+            record = logger.makeRecord(
+                logger.name,
+                logging.ERROR,
+                __file__,
+                1,
+                "scene %s failed",
+                ("abc",),
+                sys.exc_info(),
+                extra={"request_id": "r-1"},
+            )
+        document = json.loads(logs.JSONFormatter().format(record))
+        self.assertEqual(document["level"], "ERROR")
+        self.assertEqual(document["logger"], "puppetshowapp.test")
+        self.assertEqual(document["message"], "scene abc failed")
+        self.assertEqual(document["request_id"], "r-1")
+        self.assertIn("ValueError: broken", document["exc"])
+
+    # Make sure that only the records below INFO of sampled loggers are sampled.
+    def test_sampling(self):
+        sampling = logs.SamplingFilter({"puppetshowapp.queries": 0})
+        self.assertFalse(
+            sampling.filter(make_record("puppetshowapp.queries", logging.DEBUG))
+        )
+        self.assertFalse(
+            sampling.filter(make_record("puppetshowapp.queries.sub", logging.DEBUG))
+        )
+        self.assertTrue(
+            sampling.filter(make_record("puppetshowapp.queries", logging.WARNING))
+        )
+        self.assertTrue(sampling.filter(make_record("django", logging.DEBUG)))
+        sampling = logs.SamplingFilter({"puppetshowapp": 0.5})
+        with mock.patch("random.random", return_value=0.4):
+            self.assertTrue(sampling.filter(make_record(level=logging.DEBUG)))
+        with mock.patch("random.random", return_value=0.6):
+            self.assertFalse(sampling.filter(make_record(level=logging.DEBUG)))
+
+    # Make sure that records are written to the file by the writer thread.
+    def test_writes_file(self):
+        handler = self.make_handler()
+        logger = logging.getLogger("puppetshowapp.test.pipeline")
+        logger.addHandler(handler)
+        logger.propagate = False
+        self.addCleanup(logger.removeHandler, handler)
+        self.addCleanup(setattr, logger, "propagate", True)
+        logger.warning("scene %s switched", "abc", extra={"user": "u-1"})
+        handler.flush()
+        self.assertNotEqual(handler.listener._thread, None)
+        with open(self.filename) as file:
+            lines = [json.loads(line) for line in file]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]["message"], "scene abc switched")
+        self.assertEqual(lines[0]["user"], "u-1")
+
+    # Make sure that a full queue drops records instead of blocking, and that
+    # the drops are reported once there is room again.
+    def test_full_queue_drops(self):
+        handler = self.make_handler(maxsize=2)
+        # Pretend the writer is running, so that nothing drains the queue.
+        handler.pid = os.getpid()
+        for _ in range(4):
+            handler.handle(make_record())
+        self.assertEqual(handler.dropped, 2)
+        handler.queue.get_nowait()
+        handler.queue.get_nowait()
+        handler.handle(make_record(msg="after"))
+        self.assertEqual(handler.queue.get_nowait().getMessage(), "after")
+        self.assertEqual(handler.queue.get_nowait().dropped, 2)
+        self.assertEqual(handler.dropped, 0)
+
+    # Make sure that the Discord login does not log secrets or Discord's answers.
+    def test_login_logs_no_secrets(self):
+        token_response = mock.Mock(status_code=200, text="access-secret")
+        token_response.json.return_value = {
+            "access_token": "access-secret",
+            "refresh_token": "refresh-secret",
+        }
+        user_response = mock.Mock(status_code=200)
+        user_response.json.return_value = {
+            "id": "1234567890",
+            "avatar": "avatar",
+            "username": "someone",
+        }
+        request = RequestFactory().get("/callback/", {"code": "code-secret"})
+        discord = {**settings.DISCORD, "CLIENT_SECRET": "client-secret"}
+        with self.settings(DISCORD=discord), mock.patch.object(
+            authentication_views,
+            "discord_request",
+            side_effect=[token_response, user_response],
+        ), self.assertLogs(level=logging.DEBUG) as captured:
+            authentication_views.exchange_code_for_token(request)
+        output = "\n".join(captured.output)
+        for secret in ("access-secret", "code-secret", "client-secret"):
+            self.assertNotIn(secret, output)
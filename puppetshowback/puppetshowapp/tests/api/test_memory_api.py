@@ -0,0 +1,88 @@
+import io
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from puppetshowapp import memory
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+
+
+def allocate():
+    return [bytearray(1024) for _ in range(1000)]
+
+
+class MemorySnapshotTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = self.settings(MEMORY_SNAPSHOT_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        state = dict(memory.state)
+        self.addCleanup(memory.state.update, state)
+        memory.state.update(pid=None, due=0.0, running=False)
+        self.addCleanup(tracemalloc.stop)
+
+    def wait_for_snapshot(self):
+        for thread in threading.enumerate():
+            if thread.name == "memory-snapshot":
+                thread.join()
+
+    # Make sure that sampling only traces during its window, and takes a
+    # snapshot at the end of it.
+    def test_sampling_window(self):
+        with self.settings(MEMORY_PROFILE="sample", MEMORY_SAMPLE_SECONDS=30):
+            memory.maybe_snapshot()
+            self.assertTrue(tracemalloc.is_tracing())
+            memory.maybe_snapshot()
+            self.assertEqual(memory.list_snapshots(), [])
+            memory.state["due"] = 0.0
+            memory.maybe_snapshot()
+            self.wait_for_snapshot()
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(len(memory.list_snapshots()), 1)
+        self.assertGreater(memory.state["due"], time.monotonic())
+
+    # Make sure that the growth between two snapshots points at where it was
+    # allocated, in the command and on the admin page.
+    def test_growth(self):
+        tracemalloc.start()
+        memory.save_snapshot()
+        kept = allocate()
+        time.sleep(0.002)
+        memory.save_snapshot()
+        report = memory.report(since_first=True)
+        self.assertEqual(len(report["snapshots"]), 2)
+        self.assertIn("test_memory_api.py", report["sites"][0]["site"])
+        self.assertGreater(report["sites"][0]["size_diff"], 1024 * 1000)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            call_command("memorySnapshots", "--diff", "--limit", "1")
+        self.assertIn("Growth since", output.getvalue())
+        self.assertIn("bytearray(1024)", output.getvalue())
+
+        admin = DiscordPointingUser.objects.create(
+            discord_snowflake="9876543210", is_superuser=True
+        )
+        self.client.force_login(admin)
+        response = self.client.get(reverse("admin-memory"), {"diff": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "test_memory_api.py")
+        self.assertEqual(len(kept), 1000)
+
+    # Make sure that old snapshots are deleted.
+    def test_keep(self):
+        tracemalloc.start()
+        path = memory.save_snapshot()
+        os.utime(path, (0, 0))
+        memory.save_snapshot()
+        self.assertEqual(len(memory.list_snapshots()), 1)
@@ -0,0 +1,203 @@
+import json
+import os
+import subprocess
+import tempfile
+import threading
+from unittest import mock
+
+import requests
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from puppetshowapp import metrics
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Scene
+
+
+def samples(text):
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            sample, _, value = line.rpartition(" ")
+            values[sample] = float(value)
+    return values
+
+
+class MetricsTestCase(APITestCase):
+    def setUp(self):
+        metrics.reset()
+        self.user = DiscordPointingUser.objects.create(discord_snowflake="1234567890")
+        self.client = APIClient()
+        self.client.force_authenticate(token=Token.objects.create(user=self.user))
+
+    def scrape(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        return samples(response.content.decode())
+
+    # Make sure that requests are counted and timed by route, not by URL.
+    def test_request_metrics(self):
+        scene = Scene.objects.create(scene_author=self.user, scene_name="scene")
+        for _ in range(3):
+            self.client.get(reverse("scene-detail", args=[scene.identifier]))
+        self.client.get("/ps/nothing-here/")
+        values = self.scrape()
+        route = 'route="ps/scenes/<uuid:identifier>/",method="GET"'
+        self.assertEqual(
+            values[f'puppetshow_http_requests_total{{{route},status="200"}}'], 3
+        )
+        self.assertEqual(
+            values[f"puppetshow_http_request_duration_seconds_count{{{route}}}"], 3
+        )
+        self.assertEqual(
+            values[
+                f'puppetshow_http_request_duration_seconds_bucket{{{route},le="+Inf"}}'
+            ],
+            3,
+        )
+        self.assertGreater(
+            values[f"puppetshow_http_response_size_bytes_sum{{{route}}}"], 0
+        )
+        self.assertGreater(
+            values[f"puppetshow_db_queries_per_request_sum{{{route}}}"], 0
+        )
+        self.assertEqual(
+            values[
+                'puppetshow_http_requests_total{route="<unmatched>",method="GET",status="404"}'
+            ],
+            1,
+        )
+
+    # Make sure that the scrape target is not public.
+    def test_allowed_ips(self):
+        with self.settings(METRICS_ALLOWED_IPS=[]):
+            self.assertEqual(self.client.get("/metrics").status_code, 404)
+        # A local proxy's address does not let the client it forwards through.
+        forwarded = {"HTTP_X_FORWARDED_FOR": "203.0.113.7"}
+        self.assertEqual(self.client.get("/metrics", **forwarded).status_code, 404)
+        with self.settings(
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": 1}
+        ):
+            response = self.client.get("/metrics", **forwarded)
+            self.assertEqual(response.status_code, 404)
+            response = self.client.get("/metrics", HTTP_X_FORWARDED_FOR="127.0.0.1")
+            self.assertEqual(response.status_code, 200)
+
+    # Make sure that METRICS_TOKEN is required once set.
+    def test_token(self):
+        with self.settings(METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get("/metrics").status_code, 404)
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong")
+            self.assertEqual(response.status_code, 404)
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+            self.assertEqual(response.status_code, 200)
+
+    # Make sure that threads record without losing updates.
+    def test_threads(self):
+        def record():
+            for _ in range(1000):
+                metrics.cache_requests.inc(cache="test", result="hit")
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        key = ("puppetshow_cache_requests", ("test", "hit"))
+        self.assertEqual(metrics.collect_local()[key], 4000)
+
+    # Make sure that the values of every worker writing to METRICS_DIR are summed.
+    def test_multiprocess(self):
+        with tempfile.TemporaryDirectory() as directory:
+            other = [
+                ["puppetshow_cache_requests", ["test", "miss"], 2],
+                [
+                    "puppetshow_db_queries_per_request",
+                    ["r", "GET"],
+                    [0, 1] + [0] * 7 + [1],
+                ],
+            ]
+            # pid 1 is always running.
+            with open(os.path.join(directory, "metrics-1-1.json"), "w") as file:
+                json.dump(other, file)
+            metrics.count_cache_lookup("test", False)
+            with override_settings(METRICS_DIR=directory):
+                values = self.scrape()
+                self.assertTrue(
+                    os.path.exists(metrics.worker_file(directory)),
+                )
+        self.assertEqual(
+            values['puppetshow_cache_requests_total{cache="test",result="miss"}'], 3
+        )
+        self.assertEqual(
+            values[
+                'puppetshow_db_queries_per_request_bucket{route="r",method="GET",le="1"}'
+            ],
+            1,
+        )
+
+    # Make sure that the values of exited workers are kept, once, even when a
+    # new worker is given the same pid.
+    def test_exited_workers(self):
+        exited = subprocess.Popen(["true"])
+        exited.wait()
+        rows = [["puppetshow_cache_requests", ["test", "miss"], 2]]
+        with tempfile.TemporaryDirectory() as directory:
+            for filename in (
+                f"metrics-{exited.pid}-1.json",
+                f"metrics-{os.getpid()}-1.json",
+            ):
+                with open(os.path.join(directory, filename), "w") as file:
+                    json.dump(rows, file)
+            metrics.count_cache_lookup("test", False)
+            with override_settings(METRICS_DIR=directory):
+                for _ in range(2):
+                    values = self.scrape()
+                    self.assertEqual(
+                        values[
+                            'puppetshow_cache_requests_total{cache="test",result="miss"}'
+                        ],
+                        5,
+                    )
+                self.assertEqual(
+                    sorted(os.listdir(directory)),
+                    sorted(
+                        [
+                            metrics.AGGREGATE,
+                            metrics.LOCK_FILE,
+                            os.path.basename(metrics.worker_file(directory)),
+                        ]
+                    ),
+                )
+
+    # Make sure that a reader's copy does not change with later observations.
+    def test_copies(self):
+        metrics.db_queries.observe(1, route="r", method="GET")
+        key = ("puppetshow_db_queries_per_request", ("r", "GET"))
+        copy = metrics.collect_local()[key]
+        metrics.db_queries.observe(1, route="r", method="GET")
+        self.assertEqual(copy[-1], 1)
+        self.assertEqual(metrics.collect_local()[key][-1], 2)
+
+    # Make sure that Discord API latency and failures are recorded.
+    def test_discord(self):
+        failed = mock.Mock(ok=False, status_code=429)
+        with mock.patch("requests.get", return_value=failed):
+            metrics.discord_request("users/@me", "get", "https://discord.test")
+        with mock.patch("requests.get", side_effect=requests.Timeout):
+            with self.assertRaises(requests.Timeout):
+                metrics.discord_request("users/@me", "get", "https://discord.test")
+        values = self.scrape()
+        errors = 'puppetshow_discord_errors_total{endpoint="users/@me",reason="%s"}'
+        self.assertEqual(values[errors % "429"], 1)
+        self.assertEqual(values[errors % "Timeout"], 1)
+        self.assertEqual(
+            values[
+                'puppetshow_discord_request_duration_seconds_count{endpoint="users/@me"}'
+            ],
+            2,
+        )
@@ -68,6 +68,29 @@ class OutfitEndpointTestCase(APITestCase):
             Performer.objects.filter(discord_snowflake="6969420").count(), 1
         )
 
+    # Make sure that a second outfit for the same performer in a scene is refused
+    # with a 400 rather than a server error.
+    def test_create_duplicate_outfit(self):
+        user_1 = DiscordPointingUser.objects.get(discord_snowflake="1234567890")
+        performer_1 = Performer.objects.get(parent_user=user_1)
+        token = Token.objects.get(user=user_1)
+        scene_1 = Scene.objects.filter(scene_author=user_1).first()
+        url = reverse("outfit-list", args=[scene_1.identifier])
+        client = APIClient()
+        client.force_authenticate(token=token)
+        outfit_data = {
+            "outfit_name": "test_outfit",
+            "performer_id": performer_1.identifier,
+        }
+
+        response = client.post(url, outfit_data, format="json")
+        self.assertEqual(response.status_code, 201)
+        response = client.post(url, outfit_data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("performer_id", response.json())
+        self.assertEqual(Outfit.objects.filter(scene=scene_1).count(), 1)
+        self.assertEqual(Scene.objects.get(pk=scene_1.pk).outfits_count, 1)
+
     # # Test that a a user can create an outfit based only on performer snowflake if the performer doesn't exist.
     # # NOT YET IMPLEMENTED
     # def test_create_outfit_with_performer_snowflake(self):
@@ -0,0 +1,105 @@
+from django.urls import reverse
+from rest_framework.test import (
+    APIClient,
+    APITestCase,
+)
+from rest_framework.authtoken.models import Token
+
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Scene, Outfit
+from puppetshowapp.models.new_models import Performer
+
+
+class KeysetPaginationTestCase(APITestCase):
+    def setUp(self):
+        self.user = DiscordPointingUser.objects.create(
+            discord_snowflake="1234567890", discord_username="test_user"
+        )
+        self.user_2 = DiscordPointingUser.objects.create(
+            discord_snowflake="09876543210", discord_username="test_user_2"
+        )
+        self.scenes = [
+            Scene.objects.create(scene_author=self.user, scene_name=f"scene_{i}")
+            for i in range(5)
+        ]
+        Scene.objects.create(scene_author=self.user_2, scene_name="other_scene")
+        self.performers = [
+            Performer.objects.create(
+                parent_user=self.user,
+                discord_username=f"performer_{i}",
+                discord_snowflake=f"69694{i}",
+            )
+            for i in range(3)
+        ]
+        for performer in self.performers:
+            Outfit.objects.create(
+                performer=performer,
+                scene=self.scenes[0],
+                outfit_name=f"{performer.discord_username}_outfit",
+            )
+        self.token = Token.objects.create(user=self.user)
+
+    def walk(self, client, url):
+        names = []
+        pages = 0
+        while url is not None:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            response_dict = response.json()
+            names.extend(response_dict["results"])
+            url = response_dict["next"]
+            pages += 1
+        return names, pages
+
+    # Make sure that following the next links visits every scene exactly once, in order.
+    def test_scene_list_pages(self):
+        client = APIClient()
+        client.force_authenticate(token=self.token)
+        url = reverse("scene-list") + "?page_size=2"
+        results, pages = self.walk(client, url)
+        self.assertEqual(pages, 3)
+        self.assertEqual(
+            [scene["scene_name"] for scene in results],
+            [f"scene_{i}" for i in range(5)],
+        )
+
+    # Make sure that the performer and outfit lists are paged as well.
+    def test_performer_and_outfit_list_pages(self):
+        client = APIClient()
+        client.force_authenticate(token=self.token)
+        url = reverse("performer-list") + "?page_size=2"
+        results, pages = self.walk(client, url)
+        self.assertEqual(pages, 2)
+        self.assertEqual(
+            [performer["discord_username"] for performer in results],
+            ["performer_0", "performer_1", "performer_2"],
+        )
+        url = reverse("outfit-list", args=[self.scenes[0].identifier]) + "?page_size=1"
+        results, pages = self.walk(client, url)
+        self.assertEqual(pages, 3)
+        self.assertEqual(len(results), 3)
+
+    # Make sure that a garbled cursor is rejected rather than silently restarting.
+    def test_invalid_cursor(self):
+        client = APIClient()
+        client.force_authenticate(token=self.token)
+        response = client.get(reverse("scene-list") + "?cursor=notacursor")
+        self.assertEqual(response.status_code, 404)
+
+    # Make sure that the paged user document embeds first pages and links to the rest.
+    def test_paged_user_document(self):
+        client = APIClient()
+        client.force_authenticate(token=self.token)
+        response = client.get(reverse("user-info-paged") + "?page_size=2")
+        self.assertEqual(response.status_code, 200)
+        response_dict = response.json()
+        self.assertEqual(response_dict["discord_snowflake"], "1234567890")
+        self.assertEqual(len(response_dict["scenes"]), 2)
+        self.assertEqual(len(response_dict["performers"]), 2)
+        self.assertIn(reverse("scene-list"), response_dict["scenes_next"])
+        self.assertIn(reverse("performer-list"), response_dict["performers_next"])
+        results, pages = self.walk(client, response_dict["scenes_next"])
+        self.assertEqual(
+            [scene["scene_name"] for scene in results],
+            ["scene_2", "scene_3", "scene_4"],
+        )
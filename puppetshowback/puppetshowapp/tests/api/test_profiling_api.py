@@ -0,0 +1,94 @@
+import marshal
+import os
+import tempfile
+from datetime import timedelta
+
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from puppetshowapp.log_storage import prune_logs
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Scene
+from puppetshowapp.models.data_models import RequestProfile
+
+
+class ProfilingTestCase(APITestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.admin = DiscordPointingUser.objects.create(
+            discord_snowflake="9876543210", is_superuser=True
+        )
+        self.user = DiscordPointingUser.objects.create(discord_snowflake="1234567890")
+        Scene.objects.create(scene_author=self.admin, scene_name="scene")
+        self.url = reverse("scene-list")
+
+    def client_for(self, user):
+        client = APIClient()
+        token = Token.objects.create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        return client
+
+    # Make sure that superusers get a cProfile profile, with the SQL.
+    def test_profile(self):
+        response = self.client_for(self.admin).get(self.url, {"profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 1)
+        profile = RequestProfile.objects.get(pk=response["X-Profile-Id"])
+        self.assertEqual(profile.user, self.admin)
+        self.assertEqual(profile.mode, "cprofile")
+        self.assertEqual(profile.path, self.url + "?profile=1")
+        self.assertEqual(profile.status, 200)
+        self.assertGreater(profile.query_count, 0)
+        self.assertIn("function calls", profile.report)
+        self.assertIn('FROM "scenes"', profile.report)
+        with profile.profile_file.open("rb") as file:
+            stats = marshal.loads(file.read())
+        self.assertTrue(any(name == "get" for _, _, name in stats))
+
+    # Make sure that query parameters, like the token the request was
+    # authenticated with, are not stored in the profile.
+    def test_params_redacted(self):
+        client = self.client_for(self.admin)
+        response = client.get(self.url, {"profile": "1"})
+        profile = RequestProfile.objects.get(pk=response["X-Profile-Id"])
+        key = Token.objects.get(user=self.admin).key
+        self.assertNotIn(key, profile.report)
+        self.assertIn("authtoken_token", profile.report)
+        self.assertIn("'<str>'", profile.report)
+
+    # Make sure that the sampling profiler can be asked for with a header.
+    def test_sampling_profile(self):
+        with self.settings(PROFILE_SAMPLE_INTERVAL=0.0001):
+            response = self.client_for(self.admin).get(
+                self.url, HTTP_X_PROFILE="sample"
+            )
+        profile = RequestProfile.objects.get(pk=response["X-Profile-Id"])
+        self.assertEqual(profile.mode, "sample")
+        self.assertIn("samples, every 0.1ms", profile.report)
+        with profile.profile_file.open("rb") as file:
+            for line in file.read().decode().splitlines():
+                stack, count = line.rsplit(" ", 1)
+                self.assertGreater(int(count), 0)
+
+    # Make sure that the flag is ignored for everyone else and outside /ps/.
+    def test_ignored(self):
+        response = self.client_for(self.user).get(self.url, {"profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+        response = self.client_for(self.admin).get(self.url)
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertEqual(RequestProfile.objects.count(), 0)
+
+    # Make sure that profiles go once past PROFILE_RETENTION_DAYS.
+    def test_pruned(self):
+        response = self.client_for(self.admin).get(self.url, {"profile": "1"})
+        profile = RequestProfile.objects.get(pk=response["X-Profile-Id"])
+        later = profile.created + timedelta(days=15)
+        with self.settings(PROFILE_RETENTION_DAYS=14):
+            self.assertEqual(prune_logs(later), 1)
+        self.assertFalse(os.path.exists(profile.profile_file.path))
@@ -0,0 +1,101 @@
+from django.test import override_settings
+from django.urls import URLPattern, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from puppetshowapp import urls
+from puppetshowapp.middleware import QueryBudgetExceeded
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Outfit, Scene
+from puppetshowapp.models.data_models import Animation
+from puppetshowapp.models.new_models import Performer
+from puppetshowapp.views.user_views import UserInfoPaged
+
+
+class QueryBudgetTestCase(APITestCase):
+    def setUp(self):
+        self.user = DiscordPointingUser.objects.create(discord_snowflake="1234567890")
+        self.client = APIClient()
+        self.client.force_authenticate(token=Token.objects.create(user=self.user))
+
+    # Make sure that every view declares how many queries it may run.
+    def test_every_view_has_a_budget(self):
+        for pattern in urls.urlpatterns:
+            if not isinstance(pattern, URLPattern):
+                continue
+            view_class = getattr(pattern.callback, "view_class", None)
+            with self.subTest(pattern.name):
+                self.assertIsInstance(getattr(view_class, "query_budget", None), int)
+
+    # Make sure that a view going over its budget fails, listing the repeated queries.
+    def test_over_budget(self):
+        Scene.objects.create(scene_author=self.user, scene_name="scene")
+        url = reverse("user-info-paged")
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with self.settings(QUERY_BUDGET_ENFORCE=True):
+            UserInfoPaged.query_budget, budget = 1, UserInfoPaged.query_budget
+            try:
+                with self.assertRaisesMessage(QueryBudgetExceeded, "over its budget"):
+                    self.client.get(url)
+            finally:
+                UserInfoPaged.query_budget = budget
+
+    # Make sure that going over budget is only logged when it is not enforced.
+    @override_settings(QUERY_BUDGET_ENFORCE=False)
+    def test_over_budget_logged(self):
+        url = reverse("user-info-paged")
+        UserInfoPaged.query_budget, budget = 1, UserInfoPaged.query_budget
+        try:
+            with self.assertLogs("puppetshowapp.queries", "WARNING") as logs:
+                response = self.client.get(url)
+        finally:
+            UserInfoPaged.query_budget = budget
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("UserInfoPaged ran", logs.output[0])
+
+    # Make sure that the budgets hold with a real Authorization header, which
+    # costs the token lookup that force_authenticate skips.
+    def test_budgets_with_token_header(self):
+        scene = Scene.objects.create(
+            scene_author=self.user, scene_name="scene", is_active=True
+        )
+        performer = Performer.objects.create(
+            parent_user=self.user, discord_snowflake="6969420"
+        )
+        outfit = Outfit.objects.create(
+            performer=performer, scene=scene, outfit_name="outfit"
+        )
+        animation = Animation.objects.create(
+            outfit=outfit,
+            animation_type="START_SPEAKING",
+            animation_path="https://example.com/speak.gif",
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.get().key}")
+        requests = [
+            ("get", reverse("user-info"), None),
+            ("get", reverse("user-info-paged"), None),
+            ("get", reverse("scene-list"), None),
+            ("get", reverse("scene-active"), None),
+            ("get", reverse("scene-detail", args=[scene.identifier]), None),
+            ("get", reverse("outfit-list", args=[scene.identifier]), None),
+            ("get", reverse("outfit-detail", args=[outfit.identifier]), None),
+            ("get", reverse("performer-list"), None),
+            ("get", reverse("performer-detail", args=[performer.identifier]), None),
+            ("get", reverse("animations-modify", args=[animation.identifier]), None),
+            ("post", reverse("scene-list"), {"scene_name": "new"}),
+            ("post", reverse("scene-clone", args=[scene.identifier]), {}),
+            ("post", reverse("set-active-scene", args=[scene.identifier]), {}),
+            (
+                "put",
+                reverse("scene-graph", args=[scene.identifier]),
+                {
+                    "scene_name": "scene",
+                    "outfits": [{"performer": str(performer.identifier)}],
+                },
+            ),
+        ]
+        for method, url, data in requests:
+            with self.subTest(f"{method.upper()} {url}"):
+                response = getattr(client, method)(url, data, format="json")
+                self.assertLess(response.status_code, 400, response.content)
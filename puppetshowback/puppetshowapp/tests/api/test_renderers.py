@@ -0,0 +1,103 @@
+import datetime
+import io
+import uuid
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Scene, Outfit
+from puppetshowapp.models.new_models import Performer
+from puppetshowapp.parsers import FastJSONParser
+from puppetshowapp.renderers import FastJSONRenderer
+from puppetshowapp.serializers import UserSerializer
+
+
+class FastJSONTestCase(TestCase):
+    def setUp(self):
+        self.user = DiscordPointingUser.objects.create(
+            discord_snowflake="1234567890", discord_username="tëst_üser"
+        )
+        scene = Scene.objects.create(
+            scene_author=self.user,
+            scene_name="test_scene",
+            scene_settings={"nested": {"list": [1, 2.5, None, True]}},
+        )
+        performer = Performer.objects.create(
+            parent_user=self.user, discord_snowflake="6969420"
+        )
+        Outfit.objects.create(performer=performer, scene=scene, outfit_name="fit")
+        self.token = Token.objects.create(user=self.user)
+
+    # Make sure that the fast renderer produces the same bytes as DRF's renderer.
+    def test_matches_stdlib_renderer(self):
+        data = UserSerializer(self.user).data
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        data = {"text": "line\u2028separator", "id": uuid.uuid4()}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    # Make sure that raw datetimes follow REST_FRAMEWORK's DATETIME_FORMAT.
+    @override_settings(USE_TZ=True, TIME_ZONE="UTC")
+    def test_datetime_format(self):
+        when = datetime.datetime(2023, 6, 1, 14, 7, tzinfo=datetime.timezone.utc)
+        rendered = FastJSONRenderer().render({"when": when, "day": when.date()})
+        self.assertEqual(rendered, b'{"when":"06/01/23 02:07pm","day":"2023-06-01"}')
+        with override_settings(REST_FRAMEWORK={"DATETIME_FORMAT": "iso-8601"}):
+            rendered = FastJSONRenderer().render({"when": when})
+            self.assertEqual(rendered, b'{"when":"2023-06-01T14:07:00Z"}')
+
+    # Make sure that what orjson cannot encode exactly is left to the stdlib, and
+    # that floats only differ in how exponents are written.
+    def test_stdlib_fallback(self):
+        data = {"big": 2**64, "small": -(2**63) - 1}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        data = {"floats": [1e-7, 1e16, 0.1, 2.5]}
+        rendered = FastJSONRenderer().render(data)
+        self.assertEqual(rendered, b'{"floats":[1e-7,1e16,0.1,2.5]}')
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(rendered)), data)
+
+    # Make sure that asking for an indent still works.
+    def test_indent_falls_back(self):
+        data = {"a": [1, 2]}
+        self.assertEqual(
+            FastJSONRenderer().render(data, "application/json; indent=4"),
+            JSONRenderer().render(data, "application/json; indent=4"),
+        )
+
+    def test_parser(self):
+        parser = FastJSONParser()
+        body = '{"scene_name": "tëst", "n": [1, 2.5]}'.encode()
+        self.assertEqual(
+            parser.parse(io.BytesIO(body)), {"scene_name": "tëst", "n": [1, 2.5]}
+        )
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"a": NaN}'))
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b"{not json"))
+        # Integers past 64 bits are kept whole.
+        body = b'{"big": 18446744073709551617, "id": "9000000000000000001"}'
+        self.assertEqual(
+            parser.parse(io.BytesIO(body)),
+            {"big": 18446744073709551617, "id": "9000000000000000001"},
+        )
+
+    # Make sure that the API negotiates the fast renderer and parser by default.
+    def test_api_uses_fast_json(self):
+        client = APIClient()
+        client.force_authenticate(token=self.token)
+        response = client.post(
+            reverse("scene-list"),
+            data='{"scene_name": "posted"}',
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(response.json()["scene_name"], "posted")
+        response = client.get(reverse("user-info"), HTTP_ACCEPT="text/html")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIsInstance(response.accepted_renderer, FastJSONRenderer)
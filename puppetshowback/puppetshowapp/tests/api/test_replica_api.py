@@ -0,0 +1,153 @@
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import (
+    APIClient,
+    APITestCase,
+)
+from rest_framework.authtoken.models import Token
+
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Scene, Outfit
+from puppetshowapp.models.new_models import Performer
+
+REPLICAS = ["replica_0", "replica_1"]
+
+
+# Two in-memory SQLite databases stand in for lagging replicas. They hold older
+# copies of the rows, so the values in a response show which database served it.
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRouterTestCase(APITestCase):
+    databases = {"default", *REPLICAS}
+
+    @classmethod
+    def setUpClass(cls):
+        for alias in REPLICAS:
+            connections.settings[alias] = connections.configure_settings(
+                {
+                    "default": connections.settings["default"],
+                    alias: {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+                }
+            )[alias]
+            with override_settings(DATABASE_REPLICAS=[]):
+                call_command("migrate", database=alias, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in REPLICAS:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+
+    def setUp(self):
+        cache.clear()
+        self.user = DiscordPointingUser.objects.create(
+            discord_snowflake="1234567890", discord_username="test_user"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.performer = Performer.objects.create(
+            parent_user=self.user,
+            discord_username="test_performer",
+            discord_snowflake="6969420",
+        )
+        self.scene = Scene.objects.create(scene_author=self.user, scene_name="scene")
+        self.scene.set_active()
+        self.outfit = Outfit.objects.create(
+            performer=self.performer, scene=self.scene, outfit_name="primary"
+        )
+        # The replicas hold an older copy of the same rows.
+        for alias in REPLICAS:
+            DiscordPointingUser.objects.using(alias).create(
+                uuid=self.user.uuid,
+                login_username="replica",
+                discord_snowflake="1234567890",
+                discord_username="replica_user",
+            )
+            Performer.objects.using(alias).create(
+                identifier=self.performer.identifier,
+                parent_user_id=self.user.uuid,
+                discord_username="test_performer",
+                discord_snowflake="6969420",
+            )
+            Scene.objects.using(alias).create(
+                identifier=self.scene.identifier,
+                scene_author_id=self.user.uuid,
+                scene_name="replica",
+                is_active=True,
+            )
+            Outfit.objects.using(alias).create(
+                identifier=self.outfit.identifier,
+                performer_id=self.performer.identifier,
+                scene_id=self.scene.identifier,
+                outfit_name="replica",
+            )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def stage_outfit_name(self):
+        url = reverse("stage-performance", args=[self.performer.identifier])
+        return self.client.get(url).json()["get_outfit"]["outfit_name"]
+
+    # Make sure that the opted-in views read from a replica.
+    def test_reads_go_to_replicas(self):
+        self.assertEqual(self.stage_outfit_name(), "replica")
+        url = reverse(
+            "stage-performance-specific-outfit",
+            args=[self.performer.identifier, self.outfit.identifier],
+        )
+        self.assertEqual(
+            self.client.get(url).json()["get_outfit"]["outfit_name"], "replica"
+        )
+        response = self.client.get(reverse("scene-active"))
+        self.assertEqual(response.json()["scene_name"], "replica")
+        # The token, and so the user, is read from the primary, and the rest of
+        # their document from the replica.
+        response = self.client.get(reverse("user-info"))
+        self.assertEqual(response.json()["discord_username"], "test_user")
+        self.assertEqual(response.json()["active_scene"]["scene_name"], "replica")
+        scenes = response.json()["scenes"]
+        self.assertEqual([scene["scene_name"] for scene in scenes], ["replica"])
+        self.assertEqual(
+            [outfit["outfit_name"] for outfit in scenes[0]["outfits"]], ["replica"]
+        )
+        self.assertEqual(
+            [
+                performer["discord_username"]
+                for performer in response.json()["performers"]
+            ],
+            ["test_performer"],
+        )
+        # Views that did not opt in read from the primary.
+        response = self.client.get(
+            reverse("scene-detail", args=[self.scene.identifier])
+        )
+        self.assertEqual(response.json()["scene_name"], "scene")
+
+    # Make sure that a user who just wrote reads their own writes from the primary.
+    def test_read_your_writes(self):
+        url = reverse("outfit-detail", args=[self.outfit.identifier])
+        response = self.client.patch(url, {"outfit_name": "edited"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stage_outfit_name(), "edited")
+        response = self.client.get(reverse("scene-active"))
+        self.assertEqual(response.json()["scene_name"], "scene")
+
+        # Once the pin expires, reads go back to the replicas.
+        cache.clear()
+        self.assertEqual(self.stage_outfit_name(), "replica")
+
+    # Make sure that rows missing from the replicas are looked up on the primary.
+    def test_missing_rows(self):
+        performer = Performer.objects.create(
+            parent_user=self.user,
+            discord_username="new_performer",
+            discord_snowflake="6969421",
+        )
+        url = reverse("stage-performance", args=[performer.identifier])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["discord_snowflake"], "6969421")
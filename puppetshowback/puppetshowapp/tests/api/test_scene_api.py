@@ -128,7 +128,7 @@ class SceneEndpointTestCase(APITestCase):
         response = client.get(url)
         self.assertEqual(response.status_code, 200)
         self.assertIsNotNone(response.content)
-        response_dict = response.json()
+        response_dict = response.json()["results"]
         self.assertEqual(len(response_dict), 2)
         self.assertEqual(response_dict[0]["scene_name"], "test_scene")
         self.assertEqual(response_dict[1]["scene_name"], "test_scene_2")
@@ -138,7 +138,7 @@ class SceneEndpointTestCase(APITestCase):
         response = client.get(url)
         self.assertEqual(response.status_code, 200)
         self.assertIsNotNone(response.content)
-        response_dict = response.json()
+        response_dict = response.json()["results"]
         self.assertEqual(len(response_dict), 0)
         client.force_authenticate(user=None)
         response = client.get(url)
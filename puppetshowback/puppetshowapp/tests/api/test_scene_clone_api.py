@@ -0,0 +1,90 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import (
+    APIClient,
+    APITestCase,
+)
+from rest_framework.authtoken.models import Token
+
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Scene, Outfit
+from puppetshowapp.models.new_models import Performer
+from puppetshowapp.models.data_models import Animation
+
+
+class SceneCloneTestCase(APITestCase):
+    def setUp(self):
+        self.user = DiscordPointingUser.objects.create(
+            discord_snowflake="1234567890", discord_username="test_user"
+        )
+        self.small = Scene.objects.create(scene_author=self.user, scene_name="small")
+        self.large = Scene.objects.create(scene_author=self.user, scene_name="large")
+        for i in range(10):
+            performer = Performer.objects.create(
+                parent_user=self.user,
+                discord_username=f"test_performer_{i}",
+                discord_snowflake=f"696942{i}",
+            )
+            scenes = [self.large] if i else [self.small, self.large]
+            for scene in scenes:
+                outfit = Outfit.objects.create(
+                    performer=performer, scene=scene, outfit_name=f"outfit_{i}"
+                )
+                for animation_type in ("START_SPEAKING", "NOT_SPEAKING"):
+                    Animation.objects.create(
+                        outfit=outfit,
+                        animation_type=animation_type,
+                        animation_path="https://example.com/animation.gif",
+                    )
+        self.large.set_active()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(token=self.token)
+
+    # Make sure that the copy has its own outfits and animations with the same content.
+    def test_clone(self):
+        url = reverse("scene-clone", args=[self.large.identifier])
+        response = self.client.post(url, {"scene_name": "copy"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        response_dict = response.json()
+        self.assertEqual(response_dict["scene_name"], "copy")
+        self.assertFalse(response_dict["is_active"])
+        self.assertEqual(response_dict["outfits_count"], 10)
+
+        copy = Scene.objects.get(identifier=response_dict["identifier"])
+        self.assertEqual(copy.outfits_count, 10)
+        self.assertEqual(Outfit.objects.filter(scene=copy).count(), 10)
+        self.assertEqual(Animation.objects.filter(outfit__scene=copy).count(), 20)
+        for outfit in Outfit.objects.filter(scene=copy):
+            self.assertEqual(outfit.animations_count, 2)
+        # The original is left as it was.
+        self.assertEqual(Outfit.objects.filter(scene=self.large).count(), 10)
+        self.large.refresh_from_db()
+        self.assertTrue(self.large.is_active)
+
+    # Make sure that the number of queries does not grow with the size of the scene.
+    def test_constant_queries(self):
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.post(
+                reverse("scene-clone", args=[self.small.identifier])
+            )
+        self.assertEqual(response.status_code, 201)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(
+                reverse("scene-clone", args=[self.large.identifier])
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(small), len(large))
+
+    # Make sure that only the scene's author can clone it.
+    def test_other_user(self):
+        other = DiscordPointingUser.objects.create(
+            discord_snowflake="987654321", discord_username="other_user"
+        )
+        self.client.force_authenticate(token=Token.objects.create(user=other))
+        response = self.client.post(
+            reverse("scene-clone", args=[self.small.identifier])
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Scene.objects.count(), 2)
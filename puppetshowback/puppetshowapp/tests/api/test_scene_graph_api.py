@@ -0,0 +1,190 @@
+import uuid
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import (
+    APIClient,
+    APITestCase,
+)
+from rest_framework.authtoken.models import Token
+
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Scene, Outfit
+from puppetshowapp.models.new_models import Performer
+from puppetshowapp.models.data_models import Animation
+
+
+class SceneGraphTestCase(APITestCase):
+    def setUp(self):
+        self.user = DiscordPointingUser.objects.create(
+            discord_snowflake="1234567890", discord_username="test_user"
+        )
+        self.scene = Scene.objects.create(scene_author=self.user, scene_name="scene")
+        self.performers = [
+            Performer.objects.create(
+                parent_user=self.user,
+                discord_username=f"test_performer_{i}",
+                discord_snowflake=f"696942{i}",
+            )
+            for i in range(12)
+        ]
+        self.outfit = Outfit.objects.create(
+            performer=self.performers[0], scene=self.scene, outfit_name="outfit"
+        )
+        self.animation = Animation.objects.create(
+            outfit=self.outfit,
+            animation_type="START_SPEAKING",
+            animation_path="https://example.com/speak.gif",
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(token=self.token)
+        self.url = reverse("scene-graph", args=[self.scene.identifier])
+
+    def animation_data(self, animation_type="START_SPEAKING", identifier=None):
+        data = {
+            "animation_type": animation_type,
+            "animation_path": f"https://example.com/{animation_type.lower()}.gif",
+        }
+        if identifier is not None:
+            data["identifier"] = str(identifier)
+        return data
+
+    def graph(self, performer_count):
+        return {
+            "scene_name": "edited",
+            "outfits": [
+                {
+                    "performer": str(performer.identifier),
+                    "animations": [
+                        self.animation_data("START_SPEAKING"),
+                        self.animation_data("NOT_SPEAKING"),
+                    ],
+                }
+                for performer in self.performers[:performer_count]
+            ],
+        }
+
+    # Make sure that a tree is created, updated and pruned to match the request.
+    def test_put_graph(self):
+        data = {
+            "scene_name": "edited",
+            "outfits": [
+                {
+                    "identifier": str(self.outfit.identifier),
+                    "performer": str(self.performers[0].identifier),
+                    "outfit_name": "renamed",
+                    "animations": [
+                        self.animation_data("NOT_SPEAKING", self.animation.identifier),
+                        self.animation_data("SLEEPING"),
+                    ],
+                },
+                {
+                    "performer": str(self.performers[1].identifier),
+                    "animations": [self.animation_data()],
+                },
+            ],
+        }
+        response = self.client.put(self.url, data, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["scene_name"], "edited")
+        self.assertEqual(len(response.json()["outfits"]), 2)
+
+        self.scene.refresh_from_db()
+        self.assertEqual(self.scene.outfits_count, 2)
+        self.outfit.refresh_from_db()
+        self.assertEqual(self.outfit.outfit_name, "renamed")
+        self.assertEqual(self.outfit.animations_count, 2)
+        self.animation.refresh_from_db()
+        self.assertEqual(self.animation.animation_type, "NOT_SPEAKING")
+        new_outfit = Outfit.objects.get(performer=self.performers[1])
+        # A blank name falls back to the performer's name, as Outfit.save() does.
+        self.assertEqual(new_outfit.outfit_name, "test_performer_1")
+        self.assertEqual(new_outfit.animations_count, 1)
+
+        # Outfits and animations left out of the tree are deleted.
+        data = {
+            "scene_name": "edited",
+            "outfits": [
+                {
+                    "identifier": str(new_outfit.identifier),
+                    "performer": str(self.performers[1].identifier),
+                    "animations": [
+                        self.animation_data("NOT_SPEAKING", self.animation.identifier)
+                    ],
+                },
+            ],
+        }
+        response = self.client.put(self.url, data, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Outfit.objects.filter(pk=self.outfit.pk).exists())
+        # The animation moved to the kept outfit instead of being cascaded away.
+        self.animation.refresh_from_db()
+        self.assertEqual(self.animation.outfit_id, new_outfit.identifier)
+        self.assertEqual(Animation.objects.filter(outfit__scene=self.scene).count(), 1)
+        self.scene.refresh_from_db()
+        self.assertEqual(self.scene.outfits_count, 1)
+        new_outfit.refresh_from_db()
+        self.assertEqual(new_outfit.animations_count, 1)
+
+    # Make sure that the number of queries does not grow with the size of the tree.
+    def test_constant_queries(self):
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.put(self.url, self.graph(2), format="json")
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.put(self.url, self.graph(12), format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Outfit.objects.filter(scene=self.scene).count(), 12)
+        self.assertEqual(Animation.objects.filter(outfit__scene=self.scene).count(), 24)
+
+    # Make sure that identifiers from outside the scene are rejected without writing anything.
+    def test_unknown_identifier(self):
+        data = self.graph(2)
+        data["outfits"][0]["identifier"] = str(uuid.uuid4())
+        response = self.client.put(self.url, data, format="json")
+        self.assertEqual(response.status_code, 400)
+        data = self.graph(1)
+        data["outfits"][0]["performer"] = str(uuid.uuid4())
+        response = self.client.put(self.url, data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.scene.refresh_from_db()
+        self.assertEqual(self.scene.scene_name, "scene")
+        self.assertEqual(Outfit.objects.filter(scene=self.scene).count(), 1)
+
+    # Make sure that another user's performers cannot be cast in the scene.
+    def test_other_users_performer(self):
+        other = DiscordPointingUser.objects.create(
+            discord_snowflake="987654321", discord_username="other_user"
+        )
+        performer = Performer.objects.create(
+            parent_user=other, discord_username="other", discord_snowflake="5551234"
+        )
+        data = self.graph(1)
+        data["outfits"][0]["performer"] = str(performer.identifier)
+        response = self.client.put(self.url, data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Outfit.objects.filter(performer=performer).exists())
+        self.assertEqual(list(Outfit.objects.filter(scene=self.scene)), [self.outfit])
+
+    # Make sure that only the scene's author can replace its tree.
+    def test_other_user(self):
+        other = DiscordPointingUser.objects.create(
+            discord_snowflake="987654321", discord_username="other_user"
+        )
+        self.client.force_authenticate(token=Token.objects.create(user=other))
+        response = self.client.put(self.url, self.graph(1), format="json")
+        self.assertEqual(response.status_code, 403)
+
+    # Make sure that a scene keeps one outfit per performer.
+    def test_one_outfit_per_performer(self):
+        # Without an identifier, the performer's stored outfit is taken over.
+        response = self.client.put(self.url, self.graph(1), format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(Outfit.objects.filter(scene=self.scene)), [self.outfit])
+        data = self.graph(1)
+        data["outfits"].append(data["outfits"][0])
+        response = self.client.put(self.url, data, format="json")
+        self.assertEqual(response.status_code, 400)
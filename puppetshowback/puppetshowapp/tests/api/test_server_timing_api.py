@@ -0,0 +1,92 @@
+import re
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import URLPattern, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from puppetshowapp import metrics, urls
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Outfit, Scene
+from puppetshowapp.models.new_models import Performer
+from puppetshowapp.timing import ServerTimings, current
+from puppetshowapp.views.mixins import ServerTimingMixin
+
+
+def server_timing(response):
+    entries = {}
+    for entry in response["Server-Timing"].split(", "):
+        name, _, params = entry.partition(";")
+        entries[name] = dict(
+            (key, value.strip('"'))
+            for key, _, value in (param.partition("=") for param in params.split(";"))
+        )
+    return entries
+
+
+@override_settings(SERVER_TIMING=True)
+class ServerTimingTestCase(APITestCase):
+    def setUp(self):
+        self.user = DiscordPointingUser.objects.create(discord_snowflake="1234567890")
+        self.client = APIClient()
+        self.client.force_authenticate(token=Token.objects.create(user=self.user))
+        self.performer = Performer.objects.create(
+            parent_user=self.user, discord_snowflake="6969420"
+        )
+        self.scene = Scene.objects.create(scene_author=self.user, scene_name="scene")
+        Outfit.objects.create(
+            performer=self.performer, scene=self.scene, outfit_name="outfit"
+        )
+
+    # Make sure that every phase of a request is in the header.
+    def test_header(self):
+        response = self.client.get(
+            reverse("scene-detail", args=[self.scene.identifier]),
+            {"expand": "outfits"},
+        )
+        entries = server_timing(response)
+        self.assertEqual(
+            list(entries), ["auth", "db", "serialize", "render", "http", "total"]
+        )
+        durations = {name: float(entry["dur"]) for name, entry in entries.items()}
+        for name in ("auth", "db", "serialize", "render"):
+            self.assertGreater(durations[name], 0, name)
+        self.assertEqual(durations["http"], 0)
+        self.assertLess(
+            sum(durations[name] for name in ("auth", "db", "serialize", "render")),
+            durations["total"],
+        )
+        self.assertTrue(re.search(r"\(\d+ queries\)", entries["db"]["desc"]))
+
+        # The stage views serialize without DRF.
+        response = self.client.get(
+            reverse("stage-performance", args=[self.performer.identifier])
+        )
+        self.assertGreater(float(server_timing(response)["serialize"]["dur"]), 0)
+
+    # Make sure that the header can be turned off, and is only added under /ps/
+    def test_switch(self):
+        url = reverse("scene-detail", args=[self.scene.identifier])
+        with self.settings(SERVER_TIMING=False):
+            self.assertNotIn("Server-Timing", self.client.get(url))
+        self.assertNotIn("Server-Timing", self.client.get("/metrics"))
+
+    # Make sure that calls to Discord are timed as outbound HTTP.
+    def test_http(self):
+        timings = ServerTimings()
+        token = current.set(timings)
+        try:
+            with mock.patch("requests.get", return_value=mock.Mock(ok=True)):
+                metrics.discord_request("users/@me", "get", "https://discord.test")
+        finally:
+            current.reset(token)
+        self.assertGreater(timings.durations["http"], 0)
+
+    # Make sure that every view times its authentication.
+    def test_every_view_is_timed(self):
+        for pattern in urls.urlpatterns:
+            if isinstance(pattern, URLPattern):
+                with self.subTest(pattern.name):
+                    view_class = pattern.callback.view_class
+                    self.assertTrue(issubclass(view_class, ServerTimingMixin))
@@ -0,0 +1,165 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from puppetshowapp import stage_cache
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Outfit, Scene
+from puppetshowapp.models.new_models import Performer
+
+
+class StageCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # On in production only with a shared cache, which LocMem stands in for.
+        settings = self.settings(STAGE_CACHE_SECONDS=60)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = DiscordPointingUser.objects.create(discord_snowflake="1234567890")
+        self.performer = Performer.objects.create(
+            discord_snowflake="6969420", parent_user=self.user
+        )
+        scene_1 = Scene.objects.create(
+            scene_author=self.user, scene_name="scene_1", is_active=True
+        )
+        self.scene_2 = Scene.objects.create(
+            scene_author=self.user, scene_name="scene_2"
+        )
+        Outfit.objects.create(
+            performer=self.performer, scene=scene_1, outfit_name="outfit_1"
+        )
+        Outfit.objects.create(
+            performer=self.performer, scene=self.scene_2, outfit_name="outfit_2"
+        )
+        self.url = reverse("stage-performance", args=[self.performer.identifier])
+
+    # Make sure that a stage is served from the cache until its owner sets
+    # another scene active.
+    def test_cached_until_scene_change(self):
+        client = APIClient()
+        # The first request learns the owner, the second caches the stage.
+        for _ in range(2):
+            self.assertEqual(
+                client.get(self.url).json()["get_outfit"]["outfit_name"], "outfit_1"
+            )
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(self.url)
+        self.assertEqual(response.json()["get_outfit"]["outfit_name"], "outfit_1")
+        self.assertEqual(len(queries), 0)
+
+        owner = APIClient()
+        token = Token.objects.create(user=self.user)
+        owner.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        response = owner.post(
+            reverse("set-active-scene", args=[self.scene_2.identifier])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            client.get(self.url).json()["get_outfit"]["outfit_name"], "outfit_2"
+        )
+
+    # Make sure that a stage built while its owner wrote is not served once the
+    # write is in.
+    def test_write_during_build(self):
+        identifier = str(self.performer.identifier)
+        owner = self.user.pk
+
+        def build(data, write=False):
+            def build(identifier):
+                if write:
+                    stage_cache.bump_stage_version(owner)
+                return owner, data
+
+            return build
+
+        self.assertEqual(stage_cache.cached_stage(identifier, build("old")), "old")
+        self.assertEqual(
+            stage_cache.cached_stage(identifier, build("old", write=True)), "old"
+        )
+        self.assertEqual(stage_cache.cached_stage(identifier, build("new")), "new")
+        self.assertEqual(stage_cache.cached_stage(identifier, build("newer")), "new")
+
+    # Make sure that a request for a stage another worker is rebuilding waits
+    # for that rebuild instead of making its own.
+    def test_shared_rebuild(self):
+        identifier = str(self.performer.identifier)
+        cache.set(f"stage:{identifier}", (self.user.pk, 0, {"stale": True}))
+        version = stage_cache.stage_version(self.user.pk)
+        cache.add(f"stage-rebuild:{identifier}:{version}", 1)
+
+        def rebuilt_elsewhere():
+            time.sleep(0.05)
+            cache.set(f"stage:{identifier}", (self.user.pk, version, {"fresh": True}))
+
+        def build(identifier):
+            raise AssertionError("Rebuilt twice")
+
+        thread = threading.Thread(target=rebuilt_elsewhere)
+        thread.start()
+        with self.settings(STAGE_COALESCE_SHARED=True):
+            data = stage_cache.cached_stage(identifier, build)
+        thread.join()
+        self.assertEqual(data, {"fresh": True})
+
+
+class SingleFlightTestCase(TestCase):
+    # Make sure that concurrent calls for a key make one call and share it.
+    def test_single_flight(self):
+        flights = stage_cache.SingleFlight()
+        calls, results = [], []
+        started = threading.Event()
+
+        def build():
+            calls.append(1)
+            started.set()
+            time.sleep(0.05)
+            return {"stage": len(calls)}
+
+        def request():
+            results.append(flights.do("key", build, 5))
+
+        leader = threading.Thread(target=request)
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(target=request) for _ in range(4)]
+        for thread in followers:
+            thread.start()
+        for thread in [leader, *followers]:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"stage": 1}] * 5)
+        self.assertEqual(flights.flights, {})
+
+    # Make sure that concurrent misses share one build without a cache too.
+    def test_uncached_single_flight(self):
+        calls, results = [], []
+        started = threading.Event()
+
+        def build(identifier):
+            calls.append(identifier)
+            started.set()
+            time.sleep(0.05)
+            return 1, {"stage": identifier}
+
+        def request():
+            results.append(stage_cache.cached_stage("puppet", build))
+
+        with self.settings(STAGE_CACHE_SECONDS=0, STAGE_COALESCE_WAIT=5):
+            leader = threading.Thread(target=request)
+            leader.start()
+            started.wait()
+            followers = [threading.Thread(target=request) for _ in range(4)]
+            for thread in followers:
+                thread.start()
+            for thread in [leader, *followers]:
+                thread.join()
+        self.assertEqual(calls, ["puppet"])
+        self.assertEqual(results, [{"stage": "puppet"}] * 5)
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from puppetshowapp import throttles
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Scene
+from puppetshowapp.models.new_models import Performer
+
+
+class StageThrottleTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # On in production only with a shared cache, which LocMem stands in for.
+        settings = self.settings(STAGE_THROTTLE=True)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        user = DiscordPointingUser.objects.create(discord_snowflake="1234567890")
+        self.performer = Performer.objects.create(
+            discord_snowflake="6969420", parent_user=user
+        )
+        Scene.objects.create(scene_author=user, scene_name="scene", is_active=True)
+        self.url = reverse("stage-performance", args=[self.performer.identifier])
+
+    # Make sure that a bucket lets its burst through, then refills at its rate.
+    def test_token_bucket(self):
+        with mock.patch.object(throttles.time, "time", return_value=1000.0):
+            waits = [throttles.take_token("bucket", 2, 3) for _ in range(4)]
+        self.assertEqual(waits[:3], [0, 0, 0])
+        self.assertEqual(waits[3], 0.5)
+        with mock.patch.object(throttles.time, "time", return_value=1000.5):
+            self.assertEqual(throttles.take_token("bucket", 2, 3), 0)
+            self.assertEqual(throttles.take_token("bucket", 2, 3), 0.5)
+        with mock.patch.object(throttles.time, "time", return_value=1010.0):
+            waits = [throttles.take_token("bucket", 2, 3) for _ in range(4)]
+        self.assertEqual(waits, [0, 0, 0, 0.5])
+
+    # Make sure that a client past its burst gets a 429 with Retry-After,
+    # without a query, and that other clients still get through.
+    def test_throttled_ip(self):
+        with self.settings(STAGE_THROTTLE_IP_RATE=1, STAGE_THROTTLE_IP_BURST=2):
+            for _ in range(2):
+                self.assertEqual(self.client.get(self.url).status_code, 200)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response["Retry-After"], "1")
+            self.assertEqual(len(queries), 0)
+            response = self.client.get(self.url, REMOTE_ADDR="10.0.0.2")
+            self.assertEqual(response.status_code, 200)
+
+    # Make sure that a performer's bucket is shared by every client, and only
+    # drawn from by the requests their own bucket allowed.
+    def test_throttled_performer(self):
+        with self.settings(
+            STAGE_THROTTLE_IP_RATE=1,
+            STAGE_THROTTLE_IP_BURST=1,
+            STAGE_THROTTLE_PERFORMER_RATE=1,
+            STAGE_THROTTLE_PERFORMER_BURST=2,
+        ):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+            self.assertEqual(self.client.get(self.url).status_code, 429)
+            response = self.client.get(self.url, REMOTE_ADDR="10.0.0.2")
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get(self.url, REMOTE_ADDR="10.0.0.3")
+            self.assertEqual(response.status_code, 429)
+            with self.settings(STAGE_THROTTLE=False):
+                response = self.client.get(self.url, REMOTE_ADDR="10.0.0.3")
+                self.assertEqual(response.status_code, 200)
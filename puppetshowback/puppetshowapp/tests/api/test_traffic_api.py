@@ -0,0 +1,230 @@
+import asyncio
+import glob
+import os
+import tempfile
+import time
+
+from django.test import LiveServerTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from puppetshowapp import benchmark
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Outfit, Scene
+from puppetshowapp.models.new_models import Performer
+from puppetshowapp.replay import Remapper, Replayer, load_dataset
+from puppetshowapp.traffic import TraceWriter, pseudonym, read_trace
+
+
+class TrafficCaptureTestCase(APITestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.user = DiscordPointingUser.objects.create(discord_snowflake="1234567890")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}"
+        )
+        self.performer = Performer.objects.create(
+            parent_user=self.user, discord_snowflake="6969420"
+        )
+        self.scene = Scene.objects.create(scene_author=self.user, scene_name="scene")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # Make sure that request shapes are recorded without the identifiers in them.
+    def test_capture(self):
+        with self.settings(TRAFFIC_CAPTURE_DIR=self.directory.name):
+            self.client.get(
+                reverse("scene-detail", args=[self.scene.identifier]),
+                {"expand": "outfits"},
+            )
+            self.client.post(reverse("set-active-scene", args=[self.scene.identifier]))
+            APIClient().get(
+                reverse("stage-performance", args=[self.performer.identifier])
+            )
+            self.client.get("/metrics")
+        records = read_trace([self.directory.name])
+        self.assertEqual(len(records), 3)
+        detail, set_active, stage = records
+        scene = f"scene:{pseudonym(self.scene.identifier)}"
+        self.assertEqual(detail["r"], "ps/scenes/<uuid:identifier>/")
+        self.assertEqual(detail["a"], {"identifier": scene})
+        self.assertEqual(detail["q"], {"expand": "outfits"})
+        self.assertEqual(detail["u"], pseudonym(self.user.pk))
+        self.assertGreater(detail["b"], 0)
+        self.assertGreater(detail["n"], 0)
+        self.assertEqual(
+            (set_active["m"], set_active["a"]), ("POST", {"identifier": scene})
+        )
+        self.assertEqual(
+            stage["a"],
+            {"identifier": f"performer:{pseudonym(self.performer.identifier)}"},
+        )
+        self.assertNotIn("u", stage)
+        for filename in glob.glob(os.path.join(self.directory.name, "*")):
+            with open(filename) as file:
+                contents = file.read()
+            self.assertNotIn(str(self.scene.identifier), contents)
+            self.assertNotIn(str(self.user.pk), contents)
+
+    # Make sure that the trace is rotated and only `keep` old files are kept.
+    def test_rotation(self):
+        writer = TraceWriter(self.directory.name, max_bytes=100, keep=2)
+        for index in range(10):
+            writer.write({"t": index, "padding": "x" * 60})
+        # Two records fill a file, and the last one was just rotated.
+        self.assertEqual(len(os.listdir(self.directory.name)), 2)
+        self.assertEqual(
+            [record["t"] for record in read_trace([self.directory.name])],
+            [6, 7, 8, 9],
+        )
+
+    # Make sure that rotating removes the oldest files of the directory past
+    # max_total_bytes, those left by workers that are gone included, but not the
+    # files running workers write to.
+    def test_total_size_capped(self):
+        def old_file(name, age):
+            filename = os.path.join(self.directory.name, name)
+            with open(filename, "w") as file:
+                file.write("{}\n" * 40)
+            os.utime(filename, (time.time() - age, time.time() - age))
+
+        # A pid that cannot be running, past the largest Linux allows.
+        old_file("traffic-99999999.ndjson", 300)
+        old_file("traffic-99999999.1.ndjson", 400)
+        old_file(f"traffic-{os.getppid()}.ndjson", 500)
+        writer = TraceWriter(
+            self.directory.name, max_bytes=100, keep=2, max_total_bytes=500
+        )
+        for index in range(4):
+            writer.write({"t": index, "padding": "x" * 60})
+        self.assertEqual(
+            sorted(os.listdir(self.directory.name)),
+            sorted(
+                [
+                    f"traffic-{os.getppid()}.ndjson",
+                    f"traffic-{os.getpid()}.1.ndjson",
+                    f"traffic-{os.getpid()}.2.ndjson",
+                ]
+            ),
+        )
+
+
+def record(t, method, route, arguments, user=None, body=0):
+    result = {"t": t, "m": method, "r": route, "a": arguments, "rb": body, "d": 1.0}
+    if user is not None:
+        result["u"] = user
+    return result
+
+
+class RemapperTestCase(APITestCase):
+    def setUp(self):
+        benchmark.generate_dataset(
+            users=3,
+            scenes_per_user=3,
+            performers_per_user=2,
+            outfits_per_scene=2,
+            animations_per_outfit=1,
+        )
+        self.remapper = Remapper(load_dataset())
+
+    # Make sure that pseudonyms map onto objects each request can reach.
+    def test_request(self):
+        path, token = self.remapper.request(
+            record(
+                0,
+                "POST",
+                "ps/scenes/<uuid:identifier>/setActive/",
+                {"identifier": "scene:a"},
+                "u1",
+            )
+        )
+        user = Token.objects.get(key=token).user
+        scene = Scene.objects.get(identifier=path.split("/")[3])
+        self.assertEqual(scene.scene_author, user)
+        # The same pseudonym always maps to the same object, other ones do not.
+        again, _ = self.remapper.request(
+            record(
+                1,
+                "GET",
+                "ps/scenes/<uuid:identifier>/",
+                {"identifier": "scene:a"},
+                "u1",
+            )
+        )
+        other, _ = self.remapper.request(
+            record(
+                2,
+                "GET",
+                "ps/scenes/<uuid:identifier>/",
+                {"identifier": "scene:b"},
+                "u1",
+            )
+        )
+        self.assertEqual(again.split("/")[3], str(scene.identifier))
+        self.assertNotEqual(other.split("/")[3], str(scene.identifier))
+
+        # A stage outfit belongs to the stage's performer.
+        path, token = self.remapper.request(
+            record(
+                3,
+                "GET",
+                "ps/stage/<uuid:identifier>/<uuid:outfit_identifier>/",
+                {"identifier": "performer:p", "outfit_identifier": "outfit:o"},
+            )
+        )
+        self.assertIsNone(token)
+        _, _, _, performer, outfit, _ = path.split("/")
+        self.assertEqual(
+            str(Outfit.objects.get(identifier=outfit).performer_id), performer
+        )
+
+
+class ReplayTestCase(LiveServerTestCase):
+    # Make sure that a trace is replayed, skipping what cannot be.
+    def test_replay(self):
+        benchmark.generate_dataset(users=2, performers_per_user=2, outfits_per_scene=2)
+        stage = {"identifier": "performer:p"}
+        records = [
+            record(0.0, "GET", "ps/stage/<uuid:identifier>/", stage),
+            record(0.1, "GET", "ps/stage/<uuid:identifier>/", stage),
+            record(0.2, "GET", "ps/user/", {}, "u1"),
+            record(
+                0.3,
+                "POST",
+                "ps/scenes/<uuid:identifier>/setActive/",
+                {"identifier": "scene:s"},
+                "u1",
+            ),
+            record(
+                0.4,
+                "PATCH",
+                "ps/scenes/<uuid:identifier>/",
+                {"identifier": "scene:s"},
+                "u1",
+                body=20,
+            ),
+            record(
+                0.5,
+                "DELETE",
+                "ps/scenes/<uuid:identifier>/",
+                {"identifier": "scene:s"},
+                "u1",
+            ),
+        ]
+        replayer = Replayer(
+            self.live_server_url,
+            records,
+            Remapper(load_dataset()),
+            speed=10,
+            concurrency=1,
+        )
+        report = asyncio.run(replayer.run())
+        self.assertEqual((report["replayed"], report["skipped"]), (4, 2))
+        routes = report["routes"]
+        self.assertEqual(routes["GET ps/stage/<uuid:identifier>/"]["requests"], 2)
+        for summary in routes.values():
+            self.assertEqual(summary["error_rate"], 0)
+        self.assertEqual(Scene.objects.count(), 10)
@@ -0,0 +1,98 @@
+import sqlite3
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from puppetshowapp.db import pool
+from puppetshowapp.db.pool import ConnectionPool, PoolTimeout
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+
+
+def connect():
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+def is_usable(connection):
+    try:
+        connection.execute("SELECT 1")
+    except sqlite3.Error:
+        return False
+    return True
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    # Make sure that released connections are handed out again instead of new ones.
+    def test_reuse(self):
+        connections = ConnectionPool(connect, max_size=2)
+        first = connections.acquire()
+        connections.release(first)
+        self.assertIs(connections.acquire(), first)
+        stats = connections.stats()
+        self.assertEqual((stats["created"], stats["reused"]), (1, 1))
+        self.assertEqual((stats["size"], stats["in_use"]), (1, 1))
+
+    # Make sure that no more than max_size connections exist and that waiters time out.
+    def test_bounded(self):
+        connections = ConnectionPool(connect, max_size=2, timeout=0.05)
+        held = [connections.acquire(), connections.acquire()]
+        with self.assertRaises(PoolTimeout):
+            connections.acquire()
+        self.assertEqual(connections.stats()["timeouts"], 1)
+
+        # A waiting thread gets the connection as soon as it is released.
+        connections.timeout = 5
+        borrowed = []
+        waiter = threading.Thread(target=lambda: borrowed.append(connections.acquire()))
+        waiter.start()
+        connections.release(held[0])
+        waiter.join()
+        self.assertIs(borrowed[0], held[0])
+        self.assertEqual(connections.stats()["size"], 2)
+
+    # Make sure that broken, old and unusable connections are replaced.
+    def test_health(self):
+        connections = ConnectionPool(connect, check_interval=-1, is_usable=is_usable)
+        first = connections.acquire()
+        connections.release(first, reusable=False)
+        self.assertEqual(connections.stats()["size"], 0)
+
+        second = connections.acquire()
+        second.close()
+        connections.release(second)
+        third = connections.acquire()
+        self.assertIsNot(third, second)
+        self.assertEqual(connections.stats()["failed_checks"], 1)
+
+        connections.recycle = -1
+        connections.release(third)
+        self.assertIsNot(connections.acquire(), third)
+        self.assertEqual(connections.stats()["recycled"], 1)
+
+    # Make sure that a forked worker does not reuse its parent's connections.
+    def test_fork(self):
+        connections = ConnectionPool(connect)
+        connections.release(connections.acquire())
+        with mock.patch("os.getpid", return_value=-1):
+            connections.acquire()
+            stats = connections.stats()
+        self.assertEqual((stats["pid"], stats["created"], stats["reused"]), (-1, 1, 0))
+
+
+class PoolStatsTestCase(APITestCase):
+    # Make sure that the per-worker counters are only shown to superusers.
+    def test_stats(self):
+        user = DiscordPointingUser.objects.create(discord_snowflake="1234567890")
+        client = APIClient()
+        client.force_authenticate(token=Token.objects.create(user=user))
+        url = reverse("ops-db-pool")
+        self.assertEqual(client.get(url).status_code, 403)
+        user.is_superuser = True
+        user.save()
+        with mock.patch.dict(pool.pools, {("default",): ConnectionPool(connect)}):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["pools"][0]["alias"], "default")
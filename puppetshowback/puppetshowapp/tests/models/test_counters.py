@@ -0,0 +1,95 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models.deletion import Collector
+from django.test import TestCase
+from puppetshowapp.models.configuration_models import Outfit, Scene
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.data_models import Animation, LogEntry
+from puppetshowapp.models.new_models import Performer
+
+
+class CounterCacheTestCase(TestCase):
+    def setUp(self):
+        self.user = DiscordPointingUser.objects.create(discord_snowflake="1234567890")
+        self.scene = Scene.objects.create(scene_author=self.user, scene_name="scene")
+        self.performer_1 = Performer.objects.create(
+            parent_user=self.user, discord_snowflake="1653402"
+        )
+        self.performer_2 = Performer.objects.create(
+            parent_user=self.user, discord_snowflake="72645372"
+        )
+        self.outfit_1 = Outfit.objects.create(
+            performer=self.performer_1, scene=self.scene, outfit_name="outfit_1"
+        )
+        self.outfit_2 = Outfit.objects.create(
+            performer=self.performer_2, scene=self.scene, outfit_name="outfit_2"
+        )
+        for animation_type in ("START_SPEAKING", "NOT_SPEAKING"):
+            Animation.objects.create(
+                outfit=self.outfit_1,
+                animation_type=animation_type,
+                animation_path="https://example.com/a.gif",
+            )
+
+    def counts(self):
+        return (
+            DiscordPointingUser.objects.get(pk=self.user.pk).performers_count,
+            Scene.objects.get(pk=self.scene.pk).outfits_count,
+            Outfit.objects.get(pk=self.outfit_1.pk).animations_count,
+        )
+
+    # Make sure that creating rows bumps their parent's counter.
+    def test_create(self):
+        self.assertEqual(self.counts(), (2, 2, 2))
+        self.assertEqual(
+            DiscordPointingUser.objects.get(pk=self.user.pk).added_performers_count, 2
+        )
+
+    # Make sure that deletes, including cascades and queryset deletes, lower them.
+    def test_delete(self):
+        Animation.objects.filter(outfit=self.outfit_1).first().delete()
+        self.assertEqual(self.counts(), (2, 2, 1))
+        # Deleting a performer cascades to its outfit in the scene.
+        self.performer_2.delete()
+        self.assertEqual(self.counts(), (1, 1, 1))
+        Animation.objects.all().delete()
+        self.assertEqual(self.counts(), (1, 1, 0))
+
+    # Make sure that saving an existing row does not count it twice.
+    def test_update(self):
+        self.outfit_1.outfit_name = "renamed"
+        self.outfit_1.save()
+        self.performer_1.save()
+        self.assertEqual(self.counts(), (2, 2, 2))
+
+    # Make sure that the management command repairs drifted counters.
+    def test_rebuild(self):
+        DiscordPointingUser.objects.update(performers_count=99)
+        Scene.objects.update(outfits_count=-3)
+        Outfit.objects.update(animations_count=7)
+        call_command("rebuildCounters", stdout=StringIO())
+        self.assertEqual(self.counts(), (2, 2, 2))
+        self.assertEqual(Outfit.objects.get(pk=self.outfit_2.pk).animations_count, 0)
+
+    # Make sure that a cascade lowers each counter once, not once per row, and
+    # leaves out the counters of the rows it deletes too.
+    def test_cascade_queries(self):
+        for number in range(48):
+            Animation.objects.create(
+                outfit=self.outfit_2,
+                animation_type=f"TYPE_{number}",
+                animation_path="https://example.com/a.gif",
+            )
+        # The rows of the outfits and the animations, then one DELETE a model.
+        with self.assertNumQueries(5):
+            self.scene.delete()
+        self.assertEqual(Animation.objects.count(), 0)
+        self.assertEqual(
+            DiscordPointingUser.objects.get(pk=self.user.pk).performers_count, 2
+        )
+
+    # Make sure that the models without counters keep their fast deletes.
+    def test_fast_delete(self):
+        self.assertTrue(Collector("default").can_fast_delete(LogEntry.objects.all()))
+        self.assertFalse(Collector("default").can_fast_delete(Animation.objects.all()))
@@ -0,0 +1,97 @@
+import re
+import uuid
+
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from puppetshowapp.models.configuration_models import Outfit, Scene
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.data_models import Animation
+from puppetshowapp.models.new_models import Performer
+from puppetshowapp.views.model_views import PerformerList
+
+
+class IndexUsageTestCase(TestCase):
+    def setUp(self):
+        self.key = uuid.uuid4()
+
+    # Checks the query plan of a queryset for a lookup through one of the named
+    # indexes. SQLite names the indexes behind plain unique constraints itself,
+    # so there the plan is matched on the columns it searches by instead.
+    def assertUsesIndex(self, queryset, names, columns):
+        plan = queryset.explain()
+        if connection.vendor == "sqlite":
+            self.assertRegex(plan, r"SEARCH \w+ USING (COVERING )?INDEX")
+            if not any(name in plan for name in names):
+                self.assertIn(" AND ".join(f"{c}=?" for c in columns), plan)
+        elif connection.vendor == "mysql":
+            self.assertTrue(
+                any(re.search(rf"\b{name}\b", plan) for name in names), plan
+            )
+        else:
+            self.skipTest(f"No plan check for {connection.vendor}")
+
+    # User.active_scene and the stage's active outfit lookup.
+    def test_active_scene(self):
+        self.assertUsesIndex(
+            Scene.objects.filter(scene_author_id=self.key, is_active=True),
+            ["scenes_one_active_per_author", "scenes_author_active_idx"],
+            ["scene_author_id"],
+        )
+
+    # The duplicate check in PerformerList.perform_create
+    def test_performer_snowflake(self):
+        self.assertUsesIndex(
+            PerformerList.same_snowflake(self.key, "1"),
+            ["performers_user_snowflake_uniq"],
+            ["parent_user_id", "discord_snowflake"],
+        )
+
+    # Performer.get_outfit
+    def test_outfit_for_performer(self):
+        self.assertUsesIndex(
+            Outfit.objects.filter(scene_id=self.key, performer_id=self.key),
+            ["outfits_scene_performer_uniq"],
+            ["scene_id", "performer_id"],
+        )
+
+    # Outfit.getImage()
+    def test_animation_type(self):
+        self.assertUsesIndex(
+            Animation.objects.filter(outfit_id=self.key, animation_type="SLEEPING"),
+            ["animations_outfit_type_idx"],
+            ["outfit_id", "animation_type"],
+        )
+
+
+class UniqueConstraintTestCase(TestCase):
+    def setUp(self):
+        self.user = DiscordPointingUser.objects.create(discord_snowflake="1234567890")
+        self.performer = Performer.objects.create(
+            parent_user=self.user, discord_snowflake="1653402"
+        )
+        self.scene = Scene.objects.create(scene_author=self.user, scene_name="scene")
+        Outfit.objects.create(
+            performer=self.performer, scene=self.scene, outfit_name="outfit"
+        )
+
+    # Make sure that an author can only have one active scene, but any number of inactive ones.
+    def test_one_active_scene(self):
+        self.scene.set_active()
+        other = Scene.objects.create(scene_author=self.user, scene_name="other")
+        other.set_active()
+        self.assertEqual(self.user.active_scene, other)
+        if not connection.features.supports_partial_indexes:
+            return
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Scene.objects.create(
+                scene_author=self.user, scene_name="third", is_active=True
+            )
+
+    # Make sure that a performer is only added once per user and once per scene.
+    def test_duplicates(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Performer.objects.create(parent_user=self.user, discord_snowflake="1653402")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Outfit.objects.create(
+                performer=self.performer, scene=self.scene, outfit_name="again"
+            )
@@ -0,0 +1,49 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+BEFORE = [("puppetshowapp", "0003_counter_caches")]
+AFTER = [("puppetshowapp", "0004_hot_query_indexes")]
+
+
+class HotQueryIndexesMigrationTestCase(TransactionTestCase):
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        self.latest = executor.loader.graph.leaf_nodes("puppetshowapp")
+        executor.migrate(BEFORE)
+        self.addCleanup(self.migrate, self.latest)
+        apps = executor.loader.project_state(BEFORE).apps
+        user = apps.get_model("puppetshowapp", "DiscordPointingUser").objects.create(
+            discord_snowflake="1234567890"
+        )
+        performer = apps.get_model("puppetshowapp", "Performer").objects.create(
+            parent_user=user, discord_snowflake="6969420"
+        )
+        scene = apps.get_model("puppetshowapp", "Scene")
+        self.scene = scene.objects.create(scene_author=user, scene_name="scene")
+        self.outfits = [
+            apps.get_model("puppetshowapp", "Outfit").objects.create(
+                performer=performer, scene=self.scene, outfit_name=f"outfit {i}"
+            )
+            for i in range(2)
+        ]
+        # Runs before migrating forward again, which the duplicates would stop.
+        self.addCleanup(self.outfits[1].delete)
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+
+    # Make sure that duplicate outfits stop the migration, listed, instead of
+    # being deleted.
+    def test_duplicates_fail(self):
+        with self.assertRaises(RuntimeError) as raised:
+            self.migrate(AFTER)
+        message = str(raised.exception)
+        for outfit in self.outfits:
+            self.assertIn(str(outfit.pk), message)
+        self.assertIn(f"scene={self.scene.pk}", message)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM charactor_actors")
+            self.assertEqual(cursor.fetchone()[0], 2)
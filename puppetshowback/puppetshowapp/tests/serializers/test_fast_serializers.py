@@ -0,0 +1,113 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from puppetshowapp import fast_serializers
+from puppetshowapp.models.authentication_models import DiscordPointingUser
+from puppetshowapp.models.configuration_models import Scene, Outfit
+from puppetshowapp.models.new_models import Performer
+from puppetshowapp.models.data_models import Animation
+from puppetshowapp.serializers import (
+    OutfitSerializerForPerformer,
+    SceneSerializer,
+    StageSerializer,
+    StageSerializerCustomOutfit,
+)
+
+
+# The fast serializers must render exactly the same JSON as the DRF serializers.
+class FastSerializerTestCase(TestCase):
+    def setUp(self):
+        self.user = DiscordPointingUser.objects.create(
+            discord_snowflake="1234567890", discord_username="test_user"
+        )
+        self.scenes = [
+            Scene.objects.create(
+                scene_author=self.user,
+                scene_name=f"test_scene_{i}",
+                scene_settings={"background": f"#00000{i}"},
+            )
+            for i in range(3)
+        ]
+        Scene.objects.create(scene_author=self.user, scene_name="empty_scene")
+        self.performers = []
+        for i in range(3):
+            performer = Performer.objects.create(
+                parent_user=self.user,
+                discord_username=f"test_performer_{i}",
+                discord_snowflake=f"696942{i}",
+                discord_avatar=f"cdn.discordapp.com/avatars/696942{i}/abc.png",
+            )
+            self.performers.append(performer)
+            for scene in self.scenes:
+                outfit = Outfit.objects.create(
+                    performer=performer,
+                    scene=scene,
+                    outfit_name=f"outfit_{i}",
+                    settings={"show_pronouns": bool(i % 2), "scale": 1.5},
+                )
+                for animation_type in ("START_SPEAKING", "NOT_SPEAKING"):
+                    Animation.objects.create(
+                        outfit=outfit,
+                        animation_type=animation_type,
+                        animation_path=f"https://example.com/{animation_type}.gif",
+                    )
+        # A performer without an outfit in the active scene.
+        self.idle_performer = Performer.objects.create(
+            parent_user=self.user, discord_snowflake="1111", discord_username="idle"
+        )
+        self.scenes[1].set_active()
+
+    def assertRendersEqual(self, reference, fast):
+        self.assertEqual(reference, fast)
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(reference), renderer.render(fast))
+
+    def test_stage(self):
+        for performer in self.performers + [self.idle_performer]:
+            performer = Performer.objects.get(pk=performer.pk)
+            self.assertRendersEqual(
+                StageSerializer(performer).data,
+                fast_serializers.stage_data(performer.identifier),
+            )
+
+    def test_stage_custom_outfit(self):
+        performer = self.performers[0]
+        outfit = Outfit.objects.get(performer=performer, scene=self.scenes[2])
+        self.assertRendersEqual(
+            StageSerializerCustomOutfit(performer, context={"outfit": outfit}).data,
+            fast_serializers.stage_data_for_outfit(performer, outfit),
+        )
+
+    def test_scenes(self):
+        scenes = list(Scene.objects.order_by("created_date", "identifier"))
+        reference = SceneSerializer().optimize_queryset(
+            Scene.objects.order_by("created_date", "identifier")
+        )
+        self.assertRendersEqual(
+            SceneSerializer(reference, many=True).data,
+            fast_serializers.FastSceneSerializer(scenes, many=True).data,
+        )
+        self.assertRendersEqual(
+            SceneSerializer(scenes[0]).data,
+            fast_serializers.FastSceneSerializer(scenes[0]).data,
+        )
+
+    def test_outfits_for_performer(self):
+        outfits = list(Outfit.objects.order_by("pk"))
+        self.assertRendersEqual(
+            OutfitSerializerForPerformer(outfits, many=True).data,
+            fast_serializers.FastOutfitSerializerForPerformer(outfits, many=True).data,
+        )
+
+    # The endpoints serve the fast path, the response should not change.
+    def test_stage_endpoint(self):
+        performer = self.performers[2]
+        response = APIClient().get(
+            reverse("stage-performance", args=[performer.identifier])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.content, JSONRenderer().render(StageSerializer(performer).data)
+        )
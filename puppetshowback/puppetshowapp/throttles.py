@@ -0,0 +1,78 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from .traffic import pseudonym
+
+
+# A token bucket of `burst` tokens refilled at `rate` a second, kept as one
+# integer in the default cache, which the workers share once CACHE_URL is set:
+# the time in milliseconds at which the bucket is full again (GCRA). Taking a token is one atomic incr, and a refused one is handed back
+# with a decr, so a decision never reads and writes back a value another worker
+# may be changing. Returns 0 when a token was taken, otherwise the seconds
+# until one is.
+def take_token(key, rate, burst):
+    now = int(time.time() * 1000)
+    interval = max(int(1000 / rate), 1)
+    tolerance = (burst - 1) * interval
+    timeout = math.ceil((tolerance + interval) / 1000) + 1
+    if cache.add(key, now + interval, timeout):
+        return 0
+    try:
+        full_at = cache.incr(key, interval)
+    except ValueError:
+        # Expired in between, the bucket is full.
+        cache.set(key, now + interval, timeout)
+        return 0
+    if full_at - interval < now:
+        # The bucket had filled up since it was last used. Concurrent requests
+        # may both reset it, and let one more token through between them.
+        cache.set(key, now + interval, timeout)
+        return 0
+    if full_at - now > tolerance + interval:
+        cache.decr(key, interval)
+        return (full_at - interval - tolerance - now) / 1000
+    # The bucket must outlive the time it takes to fill up again.
+    cache.touch(key, timeout)
+    return 0
+
+
+# Throttles the public stage endpoints that overlays poll, every client address
+# and every performer to a bucket of their own, so that neither a runaway
+# overlay nor a scraper can take the workers for itself. The performer's bucket
+# is only drawn from once the address's allowed the request, so that a
+# throttled client does not use up the tokens of the performer's other
+# overlays. Costs one or two cache operations a bucket and never a query; DRF
+# answers 429 with a Retry-After header.
+class StageThrottle(BaseThrottle):
+    def __init__(self):
+        self.retry_after = None
+
+    def buckets(self, request, view):
+        yield (
+            f"ip:{self.get_ident(request)}",
+            settings.STAGE_THROTTLE_IP_RATE,
+            settings.STAGE_THROTTLE_IP_BURST,
+        )
+        if view.kwargs.get("identifier"):
+            yield (
+                f"performer:{view.kwargs['identifier']}",
+                settings.STAGE_THROTTLE_PERFORMER_RATE,
+                settings.STAGE_THROTTLE_PERFORMER_BURST,
+            )
+
+    def allow_request(self, request, view):
+        if not settings.STAGE_THROTTLE:
+            return True
+        for ident, rate, burst in self.buckets(request, view):
+            wait = take_token(f"throttle:stage:{pseudonym(ident)}", rate, burst)
+            if wait:
+                self.retry_after = wait
+                return False
+        return True
+
+    def wait(self):
+        return self.retry_after
@@ -0,0 +1,67 @@
+import time
+from contextvars import ContextVar
+
+# The ServerTimings of the request being served, while ServerTimingMiddleware
+# is on for it.
+current = ContextVar("server_timings", default=None)
+
+# (name, description) of the entries of the Server-Timing header, in order.
+PHASES = (
+    ("auth", "Authentication and permissions"),
+    ("db", "Database"),
+    ("serialize", "Serialization"),
+    ("render", "Rendering"),
+    ("http", "Outbound HTTP"),
+)
+
+
+# Seconds spent in each phase of one request. Phases are timed without the
+# queries they run, which are all counted under db instead, so that the entries
+# do not overlap.
+class ServerTimings:
+    def __init__(self, query_stats=None):
+        self.query_stats = query_stats
+        self.durations = {name: 0.0 for name, _ in PHASES if name != "db"}
+        self.running = set()
+
+    def db_duration(self):
+        return self.query_stats.duration if self.query_stats is not None else 0.0
+
+    def header(self, total):
+        entries = []
+        for name, description in PHASES:
+            duration = self.db_duration() if name == "db" else self.durations[name]
+            if name == "db" and self.query_stats is not None:
+                description = f"{description} ({self.query_stats.count} queries)"
+            entries.append(f'{name};dur={duration * 1000:.2f};desc="{description}"')
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+
+# Adds the time spent in the block to the `name` phase of the current request.
+# Does nothing when Server-Timing is off, and nested blocks of the same phase
+# (a serializer rendering its nested serializers) are only counted once.
+class timed:
+    __slots__ = ("name", "timings", "start", "db_start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        timings = current.get()
+        if timings is None or self.name in timings.running:
+            self.timings = None
+            return
+        timings.running.add(self.name)
+        self.timings = timings
+        self.db_start = timings.db_duration()
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        timings = self.timings
+        if timings is None:
+            return
+        elapsed = time.perf_counter() - self.start
+        elapsed -= timings.db_duration() - self.db_start
+        timings.durations[self.name] += elapsed
+        timings.running.discard(self.name)
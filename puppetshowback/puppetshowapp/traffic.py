@@ -0,0 +1,211 @@
+import glob
+import hashlib
+import hmac
+import json
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+
+# Recorded requests are one JSON object per line, with short keys:
+#   t   when the request arrived, in seconds since the epoch
+#   m   method
+#   r   URL pattern, e.g. "ps/scenes/<uuid:identifier>/"
+#   a   URL arguments, as "kind:pseudonym", e.g. {"identifier": "scene:4f1c..."}
+#   u   pseudonym of the authenticated user, if any
+#   q   the fields and expand query parameters, if any
+#   rb  size of the request body
+#   s   status code
+#   d   time to serve it, in milliseconds
+#   b   size of the response body
+#   n   number of queries run
+# Identifiers and users are replaced by keyed hashes, so the same streamer keeps
+# the same pseudonym throughout a trace without it naming them.
+ARGUMENT = re.compile(r"<(?:\w+:)?(\w+)>")
+KINDS = {
+    "stage": "performer",
+    "performers": "performer",
+    "scenes": "scene",
+    "outfits": "outfit",
+    "animations": "animation",
+}
+SHAPE_PARAMETERS = ("fields", "expand")
+
+
+def pseudonym(value):
+    digest = hmac.new(
+        settings.SECRET_KEY.encode(), str(value).encode(), hashlib.sha256
+    ).hexdigest()
+    return digest[:16]
+
+
+# The kind of object each argument of a URL pattern names, from the path
+# segment before it, or from the argument's own name (outfit_identifier).
+def argument_kinds(route):
+    kinds = {}
+    previous = None
+    for segment in route.strip("/").split("/"):
+        match = ARGUMENT.fullmatch(segment)
+        if match is None:
+            previous = segment
+            continue
+        name = match.group(1)
+        if name.endswith("_identifier"):
+            kinds[name] = name[: -len("_identifier")]
+        else:
+            kinds[name] = KINDS.get(previous, previous)
+        previous = None
+    return kinds
+
+
+def capture_record(request, response, duration):
+    match = request.resolver_match
+    kinds = argument_kinds(match.route)
+    record = {
+        "t": round(time.time() - duration, 3),
+        "m": request.method,
+        "r": match.route,
+        "a": {
+            name: f"{kinds.get(name, name)}:{pseudonym(value)}"
+            for name, value in match.kwargs.items()
+        },
+        "rb": int(request.META.get("CONTENT_LENGTH") or 0),
+        "s": response.status_code,
+        "d": round(duration * 1000, 2),
+        "b": len(response.content) if not response.streaming else None,
+    }
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        record["u"] = pseudonym(user.pk)
+    shape = {
+        name: request.GET[name] for name in SHAPE_PARAMETERS if name in request.GET
+    }
+    if shape:
+        record["q"] = shape
+    stats = getattr(request, "query_stats", None)
+    if stats is not None:
+        record["n"] = stats.count
+    return record
+
+
+LIVE_FILE = re.compile(r"traffic-(\d+)\.ndjson")
+
+
+def running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Appends records to traffic-<pid>.ndjson in `directory`, one file per worker so
+# that workers never share a file. Past `max_bytes`, the file is rotated to
+# traffic-<pid>.1.ndjson and so on, keeping `keep` old files per worker. Every
+# restart of a worker starts new files, so rotating also removes the oldest
+# files of the directory, past `max_total_bytes` all told, except those that
+# running workers are writing to.
+class TraceWriter:
+    def __init__(self, directory, max_bytes, keep, max_total_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.max_total_bytes = max_total_bytes
+        self.lock = threading.Lock()
+        self.file = None
+        self.pid = None
+
+    def path(self, index=0):
+        suffix = f".{index}" if index else ""
+        return os.path.join(self.directory, f"traffic-{self.pid}{suffix}.ndjson")
+
+    def write(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.file = None
+            if self.file is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self.file = open(self.path(), "a", buffering=1)
+            self.file.write(line)
+            if self.file.tell() >= self.max_bytes:
+                self.rotate()
+
+    # Called with the lock held.
+    def rotate(self):
+        self.file.close()
+        self.file = None
+        if os.path.exists(self.path(self.keep)):
+            os.remove(self.path(self.keep))
+        for index in range(self.keep - 1, -1, -1):
+            if os.path.exists(self.path(index)):
+                os.replace(self.path(index), self.path(index + 1))
+        if self.max_total_bytes is not None:
+            self.prune()
+
+    # Called with the lock held. Files can go from under us, removed by the
+    # other workers pruning at the same time.
+    def prune(self):
+        files = []
+        for filename in glob.glob(os.path.join(self.directory, "traffic-*.ndjson")):
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, filename))
+        total = sum(size for _, size, _ in files)
+        for _, size, filename in sorted(files):
+            if total <= self.max_total_bytes:
+                break
+            live = LIVE_FILE.fullmatch(os.path.basename(filename))
+            if live is not None and running(int(live.group(1))):
+                continue
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+writers = {}
+writers_lock = threading.Lock()
+
+
+def get_writer():
+    directory = settings.TRAFFIC_CAPTURE_DIR
+    with writers_lock:
+        if directory not in writers:
+            writers[directory] = TraceWriter(
+                directory,
+                settings.TRAFFIC_CAPTURE_MAX_BYTES,
+                settings.TRAFFIC_CAPTURE_KEEP,
+                settings.TRAFFIC_CAPTURE_MAX_TOTAL_BYTES,
+            )
+        return writers[directory]
+
+
+# The records of the trace files at `paths`, files or directories of them, in
+# the order the requests arrived.
+def read_trace(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "traffic-*.ndjson")))
+        else:
+            files.append(path)
+    records = []
+    for filename in files:
+        with open(filename) as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A line cut short by a worker that died mid-write.
+                    continue
+    records.sort(key=lambda record: record["t"])
+    return records
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework import routers
 from rest_framework.urlpatterns import format_suffix_patterns
-from .views import authentication_views, model_views, user_views
+from .views import authentication_views, log_views, model_views, ops_views, user_views
 
 # router = routers.DefaultRouter()
 # router.register(r"actors", views.ActorViewSet)
@@ -13,6 +13,7 @@ from .views import authentication_views, model_views, user_views
 
 urlpatterns = [
     path("user/", user_views.UserInfo.as_view(), name="user-info"),
+    path("user/paged/", user_views.UserInfoPaged.as_view(), name="user-info-paged"),
     path("scenes/", model_views.SceneList.as_view(), name="scene-list"),
     path("scenes/active/", model_views.ActiveScene.as_view(), name="scene-active"),
     path(
@@ -20,6 +21,16 @@ urlpatterns = [
         model_views.SceneDetail.as_view(),
         name="scene-detail",
     ),
+    path(
+        "scenes/<uuid:identifier>/graph/",
+        model_views.SceneGraph.as_view(),
+        name="scene-graph",
+    ),
+    path(
+        "scenes/<uuid:identifier>/clone/",
+        model_views.CloneScene.as_view(),
+        name="scene-clone",
+    ),
     path(
         "scenes/<uuid:identifier>/outfits/",
         model_views.OutfitList.as_view(),
@@ -35,6 +46,11 @@ urlpatterns = [
         model_views.CreateAnimation.as_view(),
         name="animations-create",
     ),
+    path(
+        "animations/bulk/",
+        model_views.BulkAnimations.as_view(),
+        name="animations-bulk",
+    ),
     path(
         "animations/<uuid:identifier>/",
         model_views.ModifyAnimation.as_view(),
@@ -65,4 +81,18 @@ urlpatterns = [
         model_views.PerformanceSpecificOutfitView.as_view(),
         name="stage-performance-specific-outfit",
     ),
+    path("logs/", log_views.LogUpload.as_view(), name="log-upload"),
+    path("logs/ingest/", log_views.LogIngest.as_view(), name="log-ingest"),
+    path("logs/entries/", log_views.LogEntryList.as_view(), name="log-entries"),
+    path("logs/issues/", log_views.LogIssues.as_view(), name="log-issues"),
+    path(
+        "logs/<int:pk>/download/",
+        log_views.LogDownload.as_view(),
+        name="log-download",
+    ),
+    path(
+        "ops/db-pool/",
+        ops_views.DatabasePoolStats.as_view(),
+        name="ops-db-pool",
+    ),
 ]
@@ -2,6 +2,7 @@ from django.http import JsonResponse, HttpResponse
 from django.shortcuts import redirect
 from django.contrib.auth import logout
 from django.conf import settings
+from ..metrics import discord_request
 from ..models.authentication_models import DiscordPointingUser
 from rest_framework import status
 from rest_framework.authtoken.models import Token
@@ -27,8 +28,7 @@ def discord_user_callback(request):
         redirect_url = f"{settings.FRONTEND}/receive-token/?token={token.key}"
         return redirect(redirect_url)
     else:
-        logging.error("Got abnormal user from request.")
-        logging.error(user)
+        logger.error("Got abnormal user from request: %r", type(user))
         return HttpResponse(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -41,13 +41,19 @@ def exchange_code_for_token(request):
         "code": code,
         "redirect_uri": settings.DISCORD["URLS"]["CALLBACK"],
     }
-    logging.info(data)
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
     try:
-        token_exchange_response = requests.post(
-            settings.DISCORD["URLS"]["TOKEN"], data=data, headers=headers, timeout=4
+        token_exchange_response = discord_request(
+            "oauth2/token",
+            "post",
+            settings.DISCORD["URLS"]["TOKEN"],
+            data=data,
+            headers=headers,
+            timeout=4,
+        )
+        logger.info(
+            "Discord token exchange answered %s", token_exchange_response.status_code
         )
-        logger.info(token_exchange_response.text)
         token_exchange_response.raise_for_status()
     except requests.HTTPError as e:
         logger.error(e)
@@ -56,7 +62,9 @@ def exchange_code_for_token(request):
     token_data = token_exchange_response.json()
     access_token = token_data["access_token"]
     try:
-        response = requests.get(
+        response = discord_request(
+            "users/@me",
+            "get",
             f"{settings.DISCORD['URLS']['API_ENDPOINT']}/users/@me",
             headers={"Authorization": f"Bearer {access_token}"},
             timeout=4,
@@ -0,0 +1,174 @@
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from datetime import timedelta
+
+from .. import ingest, log_index, log_storage
+from ..models.data_models import LogFile
+from ..pagination import LogEntryPagination
+from ..permissions import HasValidToken, IsSuperuser
+from ..serializers import LogEntrySerializer, LogReceiver
+from ..traffic import pseudonym
+from .mixins import ServerTimingMixin
+
+from rest_framework import generics, serializers, status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+from rest_framework.views import APIView
+
+
+# Uploads a log file. The file is compressed while it is received, see
+# log_storage.CompressingUploadHandler.
+class LogUpload(ServerTimingMixin, generics.CreateAPIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [HasValidToken]
+    parser_classes = [MultiPartParser]
+    serializer_class = LogReceiver
+    # One more for every thousand entries past the first thousand.
+    query_budget = 4
+
+    def post(self, request, *args, **kwargs):
+        request.upload_handlers[:] = [
+            log_storage.CompressingUploadHandler(request._request)
+        ]
+        return self.create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        serializer.save()
+        log_storage.maybe_prune()
+
+
+# Streams a stored log back uncompressed. Range requests are answered by
+# decompressing only the frames the range covers.
+class LogDownload(ServerTimingMixin, APIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [HasValidToken, IsSuperuser]
+    query_budget = 4
+
+    def get(self, request, pk):
+        log = get_object_or_404(LogFile, pk=pk)
+        size = log_storage.raw_size(log)
+        try:
+            byte_range = log_storage.parse_range(request.META.get("HTTP_RANGE"), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        start, end = byte_range or (0, size - 1)
+        response = StreamingHttpResponse(
+            log_storage.read_range(log, start, end),
+            status=206 if byte_range else 200,
+            content_type="text/plain; charset=utf-8",
+        )
+        response["Content-Length"] = end - start + 1
+        response["Accept-Ranges"] = "bytes"
+        response["Content-Disposition"] = f'attachment; filename="log-{log.pk}.log"'
+        if byte_range:
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return response
+
+
+# Takes batches of client events, one JSON object per line, from overlays and
+# the frontend. Clients are told apart by their X-Client-Id header, or their IP
+# address, and only stored as a pseudonym. Events are sampled per client and
+# level, limited to LOG_INGEST_RATE per IP address and minute, as a client can
+# pick any id it likes, and buffered to be stored in bulk, see ingest. Nothing
+# here touches the database, so that an error storm costs the workers as little
+# as possible.
+class LogIngest(ServerTimingMixin, APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    parser_classes = []
+    query_budget = 0
+
+    def post(self, request):
+        try:
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST,
+                data={"message": "Invalid Content-Length."},
+            )
+        if length > settings.LOG_INGEST_MAX_BYTES:
+            return Response(
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                data={
+                    "message": f"Batches are limited to {settings.LOG_INGEST_MAX_BYTES} bytes."
+                },
+            )
+        # The address as StageThrottle sees it, behind NUM_PROXIES proxies.
+        address = BaseThrottle().get_ident(request)
+        client = pseudonym(request.META.get("HTTP_X_CLIENT_ID") or address)
+        events, rejected = ingest.parse_events(
+            request.body, settings.LOG_INGEST_MAX_EVENTS
+        )
+        kept = [
+            event for event in events if ingest.sampled(client, ingest.log_type(event))
+        ]
+        throttled = 0
+        if kept:
+            allowed, retry_after = ingest.allowance(pseudonym(address), len(kept))
+            throttled = len(kept) - allowed
+            kept = kept[:allowed]
+            if not kept:
+                return Response(
+                    status=status.HTTP_429_TOO_MANY_REQUESTS,
+                    data={"message": "Too many events, try again later."},
+                    headers={"Retry-After": str(retry_after)},
+                )
+        received = timezone.now().isoformat()
+        for event in kept:
+            event["client"] = client
+            event["received"] = received
+        dropped = ingest.buffer.add(kept)
+        return Response(
+            status=status.HTTP_202_ACCEPTED,
+            data={
+                "accepted": len(kept) - dropped,
+                "sampled_out": len(events) - len(kept) - throttled,
+                "throttled": throttled,
+                "rejected": rejected,
+                "dropped": dropped,
+            },
+        )
+
+
+# Searches the indexed log entries, newest first, see log_index.search for the
+# query parameters.
+class LogEntryList(ServerTimingMixin, generics.ListAPIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [HasValidToken, IsSuperuser]
+    serializer_class = LogEntrySerializer
+    pagination_class = LogEntryPagination
+    query_budget = 4
+
+    def get_queryset(self):
+        try:
+            return log_index.search(self.request.query_params)
+        except ValueError as e:
+            raise serializers.ValidationError({"message": str(e)})
+
+
+# The most recurring issues among the entries matching the same parameters as
+# LogEntryList, over the last day unless `since` is given. `limit` issues are
+# listed, 50 by default.
+class LogIssues(ServerTimingMixin, APIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [HasValidToken, IsSuperuser]
+    query_budget = 5
+
+    def get(self, request):
+        params = request.query_params.dict()
+        params.setdefault("since", (timezone.now() - timedelta(days=1)).isoformat())
+        try:
+            entries = log_index.search(params)
+            limit = int(params.get("limit", 50))
+            if limit < 1:
+                raise ValueError("limit must be at least 1")
+        except ValueError as e:
+            raise serializers.ValidationError({"message": str(e)})
+        return Response({"issues": log_index.top_issues(entries, min(limit, 500))})
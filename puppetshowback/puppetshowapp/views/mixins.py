@@ -0,0 +1,95 @@
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from ..db.routers import is_pinned, pick_replica, primary_reads, replica_reads
+from ..timing import timed
+
+
+# Times the authentication, permission and throttle checks for the Server-Timing
+# header, see timing.py. Every API view uses it.
+class ServerTimingMixin:
+    def initial(self, request, *args, **kwargs):
+        with timed("auth"):
+            super().initial(request, *args, **kwargs)
+
+
+# Shapes a generic view's queryset to what its serializer is going to render.
+# Only the relations left over after ?fields= and ?expand= are joined or prefetched.
+# Plain reads with neither option are served by fast_serializer_class when the
+# view sets one, see fast_serializers.py.
+class OptimizedQuerysetMixin:
+    fast_serializer_class = None
+
+    def use_fast_serializer(self):
+        request = self.request
+        return (
+            self.fast_serializer_class is not None
+            and request is not None
+            and request.method in ("GET", "HEAD")
+            and "fields" not in request.query_params
+            and "expand" not in request.query_params
+        )
+
+    def get_serializer_class(self):
+        if self.use_fast_serializer():
+            return self.fast_serializer_class
+        return super().get_serializer_class()
+
+    def optimize_queryset(self, queryset):
+        return self.get_serializer().optimize_queryset(queryset)
+
+    def optimize_instance(self, instance):
+        if instance is not None:
+            self.get_serializer().prefetch_instances([instance])
+        return instance
+
+    def get_queryset(self):
+        return self.optimize_queryset(super().get_queryset())
+
+    # UpdateModelMixin.update(), except that the relations cleared after the
+    # write are fetched again in bulk instead of one row at a time.
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop("partial", False)
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        serializer.instance._prefetched_objects_cache = {}
+        self.optimize_instance(serializer.instance)
+        return Response(serializer.data)
+
+
+# Lets a read-only view's handler read from the replicas, see db/routers.py
+# Authentication and permission checks still read from the primary, as do any
+# requests that write. Users who wrote in the last few seconds are pinned to the
+# primary. Views that only learn whose data they serve while reading it call
+# read_own_writes() once they know, and use_primary() to retry a row the
+# replica may not have yet.
+class ReplicaReadsMixin:
+    def dispatch(self, request, *args, **kwargs):
+        with primary_reads():
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        user_id = getattr(request.auth, "user_id", None)
+        if request.method in SAFE_METHODS and not is_pinned(user_id):
+            replica_reads.set(pick_replica())
+
+    # The token's user, read from the primary: a fresh login may not have
+    # reached the replicas yet.
+    def get_request_user(self):
+        with primary_reads():
+            return Token.objects.select_related("user").get(key=self.request.auth).user
+
+    # Switches the rest of the request to the primary. Returns True if it did.
+    def use_primary(self):
+        if replica_reads.get():
+            replica_reads.set(False)
+            return True
+        return False
+
+    # Switches to the primary if the owner of the data being served wrote recently.
+    def read_own_writes(self, owner_id):
+        return is_pinned(owner_id) and self.use_primary()
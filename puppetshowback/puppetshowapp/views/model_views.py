@@ -1,26 +1,45 @@
+from collections import Counter
+
 from ..models.configuration_models import Outfit, Scene
+from ..models.counter_cache import adjust_counter, counters_suspended
 from ..serializers import *
+from ..fast_serializers import (
+    FastSceneSerializer,
+    stage_data_for_outfit,
+    stage_data_for_row,
+    stage_performer_row,
+)
 from ..permissions import IsObjectOwner, HasValidToken
+from ..pagination import KeysetPagination
+from ..scene_graph import clone_scene
+from ..stage_cache import cached_stage
+from ..throttles import StageThrottle
+from .mixins import OptimizedQuerysetMixin, ReplicaReadsMixin, ServerTimingMixin
 
+from django.db import IntegrityError, transaction
 from django.http import JsonResponse, Http404
-from rest_framework import status, generics
+from rest_framework import generics, serializers, status
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.views import APIView
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 
 
-class SceneList(generics.ListCreateAPIView):
+class SceneList(ServerTimingMixin, OptimizedQuerysetMixin, generics.ListCreateAPIView):
     # Query all the scenes that the user has created.
     authentication_classes = [TokenAuthentication]
     permission_classes = [HasValidToken]
     serializer_class = SceneSerializer
+    fast_serializer_class = FastSceneSerializer
+    pagination_class = KeysetPagination
     lookup_field = "identifier"
+    query_budget = 7
 
     def get_queryset(self):
         token = self.request.auth
         user = Token.objects.get(key=token).user
-        return Scene.objects.filter(scene_author=user)
+        return self.optimize_queryset(Scene.objects.filter(scene_author=user))
 
     def perform_create(self, serializer):
         token = self.request.auth
@@ -28,38 +47,94 @@ class SceneList(generics.ListCreateAPIView):
         serializer.save(scene_author=user)
 
 
-class SceneDetail(generics.RetrieveUpdateDestroyAPIView):
+class SceneDetail(
+    ServerTimingMixin, OptimizedQuerysetMixin, generics.RetrieveUpdateDestroyAPIView
+):
     authentication_classes = [TokenAuthentication]
     permission_classes = [HasValidToken, IsObjectOwner]
     serializer_class = SceneSerializer
+    fast_serializer_class = FastSceneSerializer
     queryset = Scene.objects.all()
     lookup_field = "identifier"
+    query_budget = 12
 
 
-class ActiveScene(generics.RetrieveAPIView):
+class ActiveScene(
+    ServerTimingMixin,
+    ReplicaReadsMixin,
+    OptimizedQuerysetMixin,
+    generics.RetrieveAPIView,
+):
     authentication_classes = [TokenAuthentication]
     permission_classes = [HasValidToken]
     serializer_class = SceneSerializer
+    fast_serializer_class = FastSceneSerializer
     lookup_field = "identifier"
+    query_budget = 7
 
     def get_object(self):
-        token = self.request.auth
-        user = Token.objects.get(key=token).user
+        user = self.get_request_user()
         active_scene = user.active_scene
         if active_scene is None:
             raise Http404
 
-        return active_scene
+        return self.optimize_instance(active_scene)
+
+
+# Replaces a scene's outfits and animations with the posted tree in one request.
+class SceneGraph(ServerTimingMixin, generics.UpdateAPIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [HasValidToken, IsObjectOwner]
+    serializer_class = SceneGraphSerializer
+    queryset = Scene.objects.all()
+    lookup_field = "identifier"
+    http_method_names = ["put", "options"]
+    query_budget = 22
+
+    def update(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_object(), data=request.data)
+        serializer.is_valid(raise_exception=True)
+        scene = serializer.save()
+        return Response(FastSceneSerializer(scene).data)
+
+
+# Copies a scene, its outfits and their animations. Takes an optional scene_name.
+class CloneScene(ServerTimingMixin, generics.CreateAPIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [HasValidToken, IsObjectOwner]
+    serializer_class = SceneSerializer
+    queryset = Scene.objects.all()
+    lookup_field = "identifier"
+    query_budget = 15
+
+    def create(self, request, *args, **kwargs):
+        scene = self.get_object()
+        scene_name = request.data.get("scene_name")
+        if scene_name is not None:
+            field = Scene._meta.get_field("scene_name")
+            if not isinstance(scene_name, str) or len(scene_name) > field.max_length:
+                return Response(
+                    status=status.HTTP_400_BAD_REQUEST,
+                    data={"message": "Invalid scene_name."},
+                )
+        copy = clone_scene(scene, scene_name)
+        return Response(
+            status=status.HTTP_201_CREATED, data=FastSceneSerializer(copy).data
+        )
 
 
-class OutfitList(generics.ListCreateAPIView):
+class OutfitList(ServerTimingMixin, OptimizedQuerysetMixin, generics.ListCreateAPIView):
     authentication_classes = [TokenAuthentication]
     permission_classes = [HasValidToken]
     serializer_class = OutfitSerializer
+    pagination_class = KeysetPagination
+    query_budget = 12
     # Query all the actors in the provided scene.
 
     def get_queryset(self):
-        return Outfit.objects.filter(scene__identifier=self.kwargs["identifier"])
+        return self.optimize_queryset(
+            Outfit.objects.filter(scene_id=self.kwargs["identifier"])
+        )
 
     def perform_create(self, serializer):
         token = self.request.auth
@@ -70,71 +145,127 @@ class OutfitList(generics.ListCreateAPIView):
                 data={"message": f"Invalid data: {serializer.errors}"},
             )
         scene = Scene.objects.get(identifier=self.kwargs["identifier"])
-        if scene.scene_author != user:
+        if scene.scene_author_id != user.pk:
             return JsonResponse(
                 status=status.HTTP_403_FORBIDDEN,
                 data={"message": "You are not the author of this outfit."},
             )
-        serializer.save(scene=scene)
+        try:
+            with transaction.atomic():
+                serializer.save(scene=scene)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {"performer_id": ["A scene can only hold one outfit per performer."]}
+            )
 
 
-class OutfitDetail(generics.RetrieveUpdateDestroyAPIView):
+class OutfitDetail(
+    ServerTimingMixin, OptimizedQuerysetMixin, generics.RetrieveUpdateDestroyAPIView
+):
     authentication_classes = [TokenAuthentication]
     permission_classes = [HasValidToken, IsObjectOwner]
     queryset = Outfit.objects.all()
     serializer_class = OutfitSerializer
     lookup_field = "identifier"
+    query_budget = 11
 
 
-class PerformerList(generics.ListCreateAPIView):
+class PerformerList(
+    ServerTimingMixin, OptimizedQuerysetMixin, generics.ListCreateAPIView
+):
     authentication_classes = [TokenAuthentication]
     permission_classes = [HasValidToken]
     serializer_class = PerformerSerializer
+    pagination_class = KeysetPagination
+    query_budget = 9
 
     def get_queryset(self):
         token = self.request.auth
         user = Token.objects.get(key=token).user
-        return Performer.objects.filter(parent_user=user)
+        return self.optimize_queryset(Performer.objects.filter(parent_user=user))
+
+    # The user's performers with `snowflake`, looked up through the
+    # (parent_user, discord_snowflake) unique constraint's index.
+    @staticmethod
+    def same_snowflake(user, snowflake):
+        return Performer.objects.filter(parent_user=user, discord_snowflake=snowflake)
 
     def perform_create(self, serializer):
         token = self.request.auth
         user = Token.objects.get(key=token).user
         if serializer.is_valid():
-            try:
-                # See if there is already a performer by this user with the same snowflake.
-                performer = Performer.objects.get(
-                    parent_user__discord_snowflake=user.discord_snowflake,
-                    discord_snowflake=serializer.validated_data["discord_snowflake"],
-                )
+            # See if there is already a performer by this user with the same snowflake.
+            snowflake = serializer.validated_data["discord_snowflake"]
+            if self.same_snowflake(user, snowflake).exists():
                 return JsonResponse(
                     status=status.HTTP_409_CONFLICT,
                     data={
                         "message": "Performer with that snowflake already exists under this account."
                     },
                 )
-            except Performer.DoesNotExist:
-                pass
             serializer.save(parent_user=user)
 
 
-class PerformerDetail(generics.RetrieveUpdateDestroyAPIView):
+class PerformerDetail(
+    ServerTimingMixin, OptimizedQuerysetMixin, generics.RetrieveUpdateDestroyAPIView
+):
     authentication_classes = [TokenAuthentication]
     permission_classes = [HasValidToken, IsObjectOwner]
     queryset = Performer.objects.all()
     serializer_class = PerformerSerializer
     lookup_field = "identifier"
+    query_budget = 6
 
 
-class PerformanceView(generics.RetrieveAPIView):
+class PerformanceView(ServerTimingMixin, ReplicaReadsMixin, generics.RetrieveAPIView):
     queryset = Performer.objects.all()
     serializer_class = StageSerializer
     lookup_field = "identifier"
-
-
-class PerformanceSpecificOutfitView(generics.RetrieveAPIView):
+    throttle_classes = [StageThrottle]
+    query_budget = 4
+
+    # Served from the stage cache, see stage_cache.py, or else from values rows
+    # by fast_serializers. StageSerializer is the reference.
+    def retrieve(self, request, *args, **kwargs):
+        data = cached_stage(kwargs[self.lookup_field], self.build_stage)
+        if data is None:
+            raise Http404
+        return Response(data)
+
+    def build_stage(self, identifier):
+        performer_row = stage_performer_row(identifier)
+        # A missing row may not have reached the replica yet.
+        if performer_row is None:
+            if self.use_primary():
+                performer_row = stage_performer_row(identifier)
+        elif self.read_own_writes(performer_row[4]):
+            performer_row = stage_performer_row(identifier)
+        if performer_row is None:
+            return None
+        return performer_row[4], stage_data_for_row(performer_row)
+
+
+class PerformanceSpecificOutfitView(
+    ServerTimingMixin, ReplicaReadsMixin, generics.RetrieveAPIView
+):
     queryset = Performer.objects.all()
     serializer_class = StageSerializerCustomOutfit
     lookup_field = "identifier"
+    throttle_classes = [StageThrottle]
+    query_budget = 7
+
+    def get_performer_and_outfit(self, identifier, outfit_identifier):
+        try:
+            performer = Performer.objects.get(identifier=identifier)
+            outfit = Outfit.objects.get(identifier=outfit_identifier)
+        except (Performer.DoesNotExist, Outfit.DoesNotExist):
+            # A missing row may not have reached the replica yet.
+            if self.use_primary():
+                return self.get_performer_and_outfit(identifier, outfit_identifier)
+            raise
+        if self.read_own_writes(performer.parent_user_id):
+            return self.get_performer_and_outfit(identifier, outfit_identifier)
+        return performer, outfit
 
     def get(self, request, identifier, outfit_identifier):
         if not identifier or not outfit_identifier:
@@ -143,8 +274,9 @@ class PerformanceSpecificOutfitView(generics.RetrieveAPIView):
                 data={"message": "Both identifiers are required."},
             )
         try:
-            performer = Performer.objects.get(identifier=identifier)
-            outfit = Outfit.objects.get(identifier=outfit_identifier)
+            performer, outfit = self.get_performer_and_outfit(
+                identifier, outfit_identifier
+            )
         except Performer.DoesNotExist:
             return Response(
                 status=status.HTTP_404_NOT_FOUND,
@@ -160,29 +292,23 @@ class PerformanceSpecificOutfitView(generics.RetrieveAPIView):
                 status=status.HTTP_403_FORBIDDEN,
                 data={"message": "Outfit does not belong to this performer."},
             )
-        outfit_obj = Outfit.objects.get(identifier=outfit_identifier)
-        serializer = self.serializer_class(performer, context={"outfit": outfit_obj})
-        # Change the get_outfit value of the serializer to the passed outfit
-        # if not serializer.is_valid():
-        #     return Response(
-        #         status=status.HTTP_400_BAD_REQUEST,
-        #         data={"message": f"Invalid data: {serializer.errors}"},
-        #     )
-        return Response(serializer.data)
+        # Served by fast_serializers, StageSerializerCustomOutfit is the reference.
+        return Response(stage_data_for_outfit(performer, outfit))
 
 
-class SetActiveScene(generics.CreateAPIView):
+class SetActiveScene(ServerTimingMixin, generics.CreateAPIView):
     authentication_classes = [TokenAuthentication]
     permission_classes = [HasValidToken]
     queryset = Scene.objects.all()
     serializer_class = SceneSerializer
     lookup_field = "identifier"
+    query_budget = 10
 
     def create(self, request, *args, **kwargs):
         token = self.request.auth
-        user = Token.objects.get(key=token).user
+        user_id = Token.objects.get(key=token).user_id
         scene = self.get_object()
-        if scene.scene_author != user:
+        if scene.scene_author_id != user_id:
             return Response(
                 status=status.HTTP_403_FORBIDDEN,
                 data={"message": "You are not the author of this scene."},
@@ -194,15 +320,82 @@ class SetActiveScene(generics.CreateAPIView):
         )
 
 
-class CreateAnimation(generics.CreateAPIView):
+class CreateAnimation(ServerTimingMixin, generics.CreateAPIView):
     authentication_classes = [TokenAuthentication]
     permission_classes = [HasValidToken]
     serializer_class = AnimationSerializer
+    query_budget = 8
+
+    # A list of animations is created in bulk, see AnimationListSerializer.
+    def get_serializer(self, *args, **kwargs):
+        if isinstance(kwargs.get("data"), list):
+            kwargs["many"] = True
+        return super().get_serializer(*args, **kwargs)
+
+
+# Changes or deletes many animations in one request.
+# PATCH takes a list of animations, each with its identifier and the fields to change.
+# DELETE takes {"identifiers": [...]}.
+class BulkAnimations(ServerTimingMixin, generics.GenericAPIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [HasValidToken]
+    serializer_class = AnimationBulkSerializer
+    queryset = Animation.objects.all()
+    query_budget = 11
+
+    # Loads the animations in one query and checks that the user owns all of them.
+    def get_animations(self, identifiers):
+        if len(set(identifiers)) != len(identifiers):
+            raise serializers.ValidationError("Each animation may only be listed once.")
+        animations = list(
+            self.get_queryset()
+            .filter(identifier__in=identifiers)
+            .select_related("outfit__scene")
+        )
+        if len(animations) != len(identifiers):
+            raise Http404
+        user_id = Token.objects.get(key=self.request.auth).user_id
+        if any(
+            animation.outfit.scene.scene_author_id != user_id
+            for animation in animations
+        ):
+            raise PermissionDenied("You are not the author of every animation.")
+        return animations
+
+    def patch(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST,
+                data={"message": "Expected a list of animations."},
+            )
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        animations = self.get_animations(
+            [attrs["identifier"] for attrs in serializer.validated_data]
+        )
+        serializer.instance = animations
+        serializer.save()
+        return Response(serializer.data)
+
+    def delete(self, request, *args, **kwargs):
+        identifiers = serializers.ListField(
+            child=serializers.UUIDField()
+        ).run_validation(
+            request.data.get("identifiers") if isinstance(request.data, dict) else None
+        )
+        animations = self.get_animations(identifiers)
+        removed = Counter(animation.outfit_id for animation in animations)
+        # One counter UPDATE per outfit count instead of one per deleted row.
+        with transaction.atomic(), counters_suspended():
+            Animation.objects.filter(identifier__in=identifiers).delete()
+            adjust_counter(Animation, {pk: -count for pk, count in removed.items()})
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ModifyAnimation(generics.RetrieveUpdateDestroyAPIView):
+class ModifyAnimation(ServerTimingMixin, generics.RetrieveUpdateDestroyAPIView):
     authentication_classes = [TokenAuthentication]
     permission_classes = [HasValidToken, IsObjectOwner]
     serializer_class = AnimationSerializer
     queryset = Animation.objects.all()
     lookup_field = "identifier"
+    query_budget = 10
@@ -0,0 +1,59 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from .. import metrics
+from ..db.pool import pool_stats
+from ..permissions import HasValidToken, IsSuperuser
+from .mixins import ServerTimingMixin
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from rest_framework.views import APIView
+
+
+# Connection pool counters of the worker that serves the request.
+# Each worker has its own pools, so repeated calls may land on different ones.
+class DatabasePoolStats(ServerTimingMixin, APIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [HasValidToken, IsSuperuser]
+    query_budget = 4
+
+    def get(self, request):
+        return Response({"pools": pool_stats()})
+
+
+# The address of the client as far as NUM_PROXIES trusts X-Forwarded-For, the
+# same one the throttles see. A request forwarded by proxies it does not trust
+# has none, as REMOTE_ADDR is then the proxy's.
+def client_address(request):
+    if api_settings.NUM_PROXIES:
+        return BaseThrottle().get_ident(request)
+    if request.META.get("HTTP_X_FORWARDED_FOR"):
+        return None
+    return request.META.get("REMOTE_ADDR")
+
+
+def has_metrics_token(request):
+    if not settings.METRICS_TOKEN:
+        return True
+    return hmac.compare_digest(
+        request.META.get("HTTP_AUTHORIZATION", "").encode(),
+        f"Bearer {settings.METRICS_TOKEN}".encode(),
+    )
+
+
+# Prometheus scrape target. The totals of every worker when METRICS_DIR is set,
+# otherwise those of the worker that serves the request.
+def prometheus_metrics(request):
+    if client_address(request) not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    if not has_metrics_token(request):
+        raise Http404
+    return HttpResponse(
+        metrics.render(metrics.collect()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
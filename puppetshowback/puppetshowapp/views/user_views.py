@@ -1,19 +1,95 @@
 from ..models.authentication_models import DiscordPointingUser
-from ..serializers import UserSerializer
+from ..models.configuration_models import Scene
+from ..models.new_models import Performer
+from ..serializers import (
+    UserSerializer,
+    UserSummarySerializer,
+    SceneSerializer,
+    PerformerSerializer,
+)
 from ..permissions import HasValidToken
+from ..pagination import KeysetPagination
+from .mixins import OptimizedQuerysetMixin, ReplicaReadsMixin, ServerTimingMixin
+from django.urls import reverse
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
 
 from rest_framework import generics
 
 
-class UserInfo(generics.RetrieveUpdateAPIView):
+class UserInfo(
+    ServerTimingMixin,
+    ReplicaReadsMixin,
+    OptimizedQuerysetMixin,
+    generics.RetrieveUpdateAPIView,
+):
     authentication_classes = [TokenAuthentication]
     permission_classes = [HasValidToken]
     serializer_class = UserSerializer
+    query_budget = 19
+
+    def get_object(self):
+        user = self.get_request_user()
+        return self.optimize_instance(user)
+
+
+# The user document with its scenes and performers paged.
+# Only the first page of each list is embedded. The "scenes_next" and
+# "performers_next" links continue from there through the list endpoints.
+class UserInfoPaged(ServerTimingMixin, generics.RetrieveAPIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [HasValidToken]
+    serializer_class = UserSummarySerializer
+    query_budget = 9
 
     def get_object(self):
         token = self.request.auth
-        user = Token.objects.get(key=token).user
-        return user
+        return Token.objects.select_related("user").get(key=token).user
+
+    def get_first_page(self, queryset, serializer, list_url_name):
+        paginator = KeysetPagination(base_url=reverse(list_url_name))
+        paginator.request = self.request
+        rows = paginator.get_page(
+            serializer.child.optimize_queryset(queryset),
+            page_size=paginator.get_page_size(self.request),
+        )
+        serializer.instance = rows
+        return serializer.data, paginator.get_next_link()
+
+    def retrieve(self, request, *args, **kwargs):
+        user = self.get_object()
+        summary = self.get_serializer(user)
+        data = summary.data
+        only, expand = summary.get_flex_options()
+        pages = [
+            (
+                "scenes",
+                Scene.objects.filter(scene_author=user),
+                SceneSerializer,
+                "scene-list",
+            ),
+            (
+                "performers",
+                Performer.objects.filter(parent_user=user),
+                PerformerSerializer,
+                "performer-list",
+            ),
+        ]
+        for name, queryset, serializer_class, list_url_name in pages:
+            if only is not None and name not in only:
+                continue
+            if expand is not None and name not in expand:
+                continue
+            child_only, child_expand = summary.get_child_flex_options(name)
+            serializer = serializer_class(
+                many=True,
+                context=self.get_serializer_context(),
+                fields=child_only,
+                expand=child_expand,
+            )
+            data[name], data[f"{name}_next"] = self.get_first_page(
+                queryset, serializer, list_url_name
+            )
+        return Response(data)
@@ -12,11 +12,8 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 import os
 import environ
 import logging
-from datetime import datetime
 from pathlib import Path
-
-os.makedirs(os.path.dirname("./logs/"), exist_ok=True)
-
+from django.core.exceptions import ImproperlyConfigured
 
 logger = logging.getLogger(__name__)
 
@@ -63,11 +60,18 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "puppetshowapp.middleware.ProfilingMiddleware",
+    "puppetshowapp.middleware.MemorySnapshotMiddleware",
+    "puppetshowapp.middleware.MetricsMiddleware",
+    "puppetshowapp.middleware.QueryBudgetMiddleware",
+    "puppetshowapp.middleware.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "puppetshowapp.db.routers.ReplicaPinMiddleware",
+    "puppetshowapp.middleware.TrafficCaptureMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -96,6 +100,7 @@ WSGI_APPLICATION = "puppetshowsite.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
+DB_POOL_SIZE = env.int("DB_POOL_SIZE", 0)
 DATABASES = (
     {
         "default": {
@@ -106,16 +111,90 @@ DATABASES = (
     if DEBUG
     else {
         "default": {
-            "ENGINE": "django.db.backends.mysql",
+            # With DB_POOL_SIZE set, connections are borrowed from a per-worker pool
+            # for each request and returned afterwards, see puppetshowapp/db/pool.py
+            # Without it, each thread keeps its own connection for DB_CONN_MAX_AGE seconds.
+            "ENGINE": "puppetshowapp.db.backends.mysql_pool"
+            if DB_POOL_SIZE
+            else "django.db.backends.mysql",
             "NAME": env("DB_NAME"),
             "USER": env("DB_USER"),
             "PASSWORD": env("DB_PASSWORD"),
             "HOST": env("DB_HOST"),
             "PORT": env("DB_PORT"),
+            "CONN_MAX_AGE": 0 if DB_POOL_SIZE else env.int("DB_CONN_MAX_AGE", 60),
+            "CONN_HEALTH_CHECKS": True,
+            "POOL": {
+                "MAX_SIZE": DB_POOL_SIZE,
+                "TIMEOUT": env.float("DB_POOL_TIMEOUT", 10.0),
+                "RECYCLE": env.float("DB_POOL_RECYCLE", 3600.0),
+                "CHECK_INTERVAL": env.float("DB_POOL_CHECK_INTERVAL", 30.0),
+            },
         }
     }
 )
 
+# Read replicas, as comma separated host[:port] entries sharing the primary's
+# credentials. The stage, active scene and user views read from them, see
+# puppetshowapp/db/routers.py. A user who writes is pinned to the primary for
+# REPLICA_PIN_SECONDS so that they read their own writes.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(env.list("DB_REPLICA_HOSTS", default=[])):
+    host, _, port = replica.partition(":")
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"].get("PORT", ""),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["puppetshowapp.db.routers.ReplicaRouter"]
+REPLICA_PIN_SECONDS = env.int("REPLICA_PIN_SECONDS", 5)
+
+# The cache holds the replica pins, rate limits, throttles and cached stages,
+# which the workers only share when CACHE_URL points at Redis, e.g.
+# redis://127.0.0.1:6379/1. The default, each worker's own memory, only suits a
+# single process, so the features that rely on sharing stay off with it.
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+SHARED_CACHE = CACHES["default"]["BACKEND"] not in (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+# Raise instead of logging when a view runs more queries than its query_budget,
+# see puppetshowapp/middleware.py. The tests always enforce the budgets.
+QUERY_BUDGET_ENFORCE = env.bool("QUERY_BUDGET_ENFORCE", False)
+
+# Break the time of every /ps/ response down in a Server-Timing header, see
+# puppetshowapp/timing.py. On by default in development only.
+SERVER_TIMING = env.bool("SERVER_TIMING", DEBUG)
+
+# Prometheus metrics, served at /metrics to METRICS_ALLOWED_IPS only, see
+# puppetshowapp/metrics.py. Behind a reverse proxy, set NUM_PROXIES in
+# REST_FRAMEWORK so that the client's address is checked rather than the
+# proxy's: forwarded requests are refused without it. With METRICS_TOKEN set,
+# scrapes must also send it as "Authorization: Bearer <token>". With several
+# worker processes, point METRICS_DIR at a directory they share, and empty it
+# whenever the service starts.
+METRICS_DIR = env("METRICS_DIR", default="")
+METRICS_FLUSH_SECONDS = env.float("METRICS_FLUSH_SECONDS", 5.0)
+METRICS_ALLOWED_IPS = env.list("METRICS_ALLOWED_IPS", default=["127.0.0.1", "::1"])
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
+# Opt-in capture of pseudonymized request shapes for the replayTraffic command,
+# see puppetshowapp/traffic.py. Each worker writes its own files, rotated past
+# TRAFFIC_CAPTURE_MAX_BYTES, keeping TRAFFIC_CAPTURE_KEEP old ones. Rotating
+# removes the oldest files, those of restarted workers included, past
+# TRAFFIC_CAPTURE_MAX_TOTAL_BYTES for the whole directory.
+TRAFFIC_CAPTURE_DIR = env("TRAFFIC_CAPTURE_DIR", default="")
+TRAFFIC_CAPTURE_SAMPLE = env.float("TRAFFIC_CAPTURE_SAMPLE", 1.0)
+TRAFFIC_CAPTURE_MAX_BYTES = env.int("TRAFFIC_CAPTURE_MAX_BYTES", 50 * 1024 * 1024)
+TRAFFIC_CAPTURE_KEEP = env.int("TRAFFIC_CAPTURE_KEEP", 5)
+TRAFFIC_CAPTURE_MAX_TOTAL_BYTES = env.int(
+    "TRAFFIC_CAPTURE_MAX_TOTAL_BYTES", 1024 * 1024 * 1024
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -171,6 +250,17 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.TokenAuthentication"
     ],
+    # orjson backed JSON for every /ps/ route. Both fall back to the stdlib
+    # implementations when orjson is not installed.
+    "DEFAULT_RENDERER_CLASSES": [
+        "puppetshowapp.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "puppetshowapp.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
 # Media
@@ -178,41 +268,119 @@ REST_FRAMEWORK = {
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media/")
 
+# Logging goes through a bounded queue to a writer thread, see
+# puppetshowapp.logs. LOG_FILE gets JSON lines from every worker; rotate it with
+# logrotate rather than from the workers. LOG_LEVELS sets the level of single
+# loggers, e.g. "puppetshowapp.queries=DEBUG,django.db.backends=WARNING", and
+# LOG_SAMPLE keeps only a fraction of their records below INFO, e.g.
+# "puppetshowapp.queries=0.01".
+LOG_LEVEL = env("LOG_LEVEL", default="DEBUG" if DEBUG else "INFO")
+LOG_FILE = env("LOG_FILE", default=os.path.join(BASE_DIR, "logs", "puppetshow.log"))
+LOG_QUEUE_SIZE = env.int("LOG_QUEUE_SIZE", 10000)
+LOG_LEVELS = env.dict("LOG_LEVELS", default={})
+LOG_SAMPLE = env.dict("LOG_SAMPLE", default={})
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
-    "loggers": {
-        "": {
-            "level": "DEBUG",
-            "handlers": ["console", "file"],
-        },
+    "root": {
+        "level": LOG_LEVEL,
+        "handlers": ["queue"],
     },
-    "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-            "level": "INFO",
-            "formatter": "simple",
-        },
-        "file": {
-            "class": "logging.handlers.TimedRotatingFileHandler",
-            "filename": f"{os.path.join('logs', datetime.now().strftime('%Y-%m-%d %H-%M-%S'))}.log",
-            "when": "midnight",
-            "level": "DEBUG",
-            "formatter": "verbose",
+    "loggers": {name: {"level": level} for name, level in LOG_LEVELS.items()},
+    "filters": {
+        "sample": {
+            "()": "puppetshowapp.logs.SamplingFilter",
+            "rates": LOG_SAMPLE,
         },
     },
-    "formatters": {
-        "verbose": {
-            "format": "{name} {levelname} {asctime} {module} {process:d} {thread:d} {message}",
-            "style": "{",
-        },
-        "simple": {
-            "format": "{levelname} {message}",
-            "style": "{",
+    "handlers": {
+        "queue": {
+            "()": "puppetshowapp.logs.QueueHandler",
+            "filename": LOG_FILE,
+            "console_level": "INFO",
+            "console_json": not DEBUG,
+            "maxsize": LOG_QUEUE_SIZE,
+            "filters": ["sample"],
         },
     },
 }
 
+# Uploaded logs, see puppetshowapp.log_storage. They are compressed with zstd
+# when the zstandard package is installed, gzip otherwise, in frames of
+# LOG_CHUNK_BYTES. Workers prune them every LOG_PRUNE_SECONDS (0 turns that off,
+# for running the pruneLogs command instead): logs past their type's retention in
+# days go first, then the oldest logs of each type beyond its size cap in bytes.
+LOG_COMPRESSION = env("LOG_COMPRESSION", default="zstd")
+LOG_CHUNK_BYTES = env.int("LOG_CHUNK_BYTES", 1024 * 1024)
+LOG_PRUNE_SECONDS = env.int("LOG_PRUNE_SECONDS", 3600)
+LOG_RETENTION_DAYS = env.dict(
+    "LOG_RETENTION_DAYS",
+    default={"INFO": 7, "WARNING": 30, "ERROR": 90, "CRITICAL": 180},
+)
+LOG_MAX_BYTES = env.dict(
+    "LOG_MAX_BYTES",
+    default={
+        "INFO": 1024**3,
+        "WARNING": 1024**3,
+        "ERROR": 2 * 1024**3,
+        "CRITICAL": 2 * 1024**3,
+    },
+)
+# Client events posted to ps/logs/ingest/, see puppetshowapp.ingest. Batches are
+# limited to LOG_INGEST_MAX_BYTES and LOG_INGEST_MAX_EVENTS, client addresses
+# to LOG_INGEST_RATE events a minute, and LOG_INGEST_SAMPLE keeps a fraction of
+# the clients per level, e.g. "INFO=0.1". Events are buffered up to
+# LOG_INGEST_BUFFER_BYTES per worker and stored once LOG_INGEST_FLUSH_BYTES are
+# buffered or LOG_INGEST_FLUSH_SECONDS have passed.
+LOG_INGEST_MAX_BYTES = env.int("LOG_INGEST_MAX_BYTES", 256 * 1024)
+LOG_INGEST_MAX_EVENTS = env.int("LOG_INGEST_MAX_EVENTS", 500)
+LOG_INGEST_RATE = env.int("LOG_INGEST_RATE", 600)
+LOG_INGEST_SAMPLE = env.dict("LOG_INGEST_SAMPLE", default={"INFO": 0.1})
+LOG_INGEST_BUFFER_BYTES = env.int("LOG_INGEST_BUFFER_BYTES", 32 * 1024 * 1024)
+LOG_INGEST_FLUSH_BYTES = env.int("LOG_INGEST_FLUSH_BYTES", 4 * 1024 * 1024)
+LOG_INGEST_FLUSH_SECONDS = env.int("LOG_INGEST_FLUSH_SECONDS", 60)
+# Requests profiled for superusers, see puppetshowapp.profiling. Kept for
+# PROFILE_RETENTION_DAYS by the log pruner.
+PROFILE_SAMPLE_INTERVAL = env.float("PROFILE_SAMPLE_INTERVAL", 0.001)
+PROFILE_RETENTION_DAYS = env.int("PROFILE_RETENTION_DAYS", 14)
+# Memory snapshots of the workers, see puppetshowapp.memory, read with the
+# memorySnapshots command or at admin-pages/memory/. Off unless
+# MEMORY_SNAPSHOT_DIR is set. MEMORY_PROFILE "sample" traces allocations for
+# MEMORY_SAMPLE_SECONDS out of every MEMORY_SNAPSHOT_SECONDS, which is cheap
+# enough for production; "full" traces them all the time. Every allocation keeps
+# MEMORY_TRACE_FRAMES frames of its traceback, and snapshots older than
+# MEMORY_SNAPSHOT_KEEP periods are deleted.
+MEMORY_SNAPSHOT_DIR = env("MEMORY_SNAPSHOT_DIR", default="")
+MEMORY_PROFILE = env("MEMORY_PROFILE", default="sample")
+MEMORY_SNAPSHOT_SECONDS = env.int("MEMORY_SNAPSHOT_SECONDS", 900)
+MEMORY_SAMPLE_SECONDS = env.int("MEMORY_SAMPLE_SECONDS", 30)
+MEMORY_TRACE_FRAMES = env.int("MEMORY_TRACE_FRAMES", 1)
+MEMORY_SNAPSHOT_KEEP = env.int("MEMORY_SNAPSHOT_KEEP", 96)
+# Token buckets for the public stage endpoints, see puppetshowapp.throttles:
+# requests a second and burst, per client address and per performer. The
+# buckets live in the default cache, so STAGE_THROTTLE is only on with a shared
+# one: with a cache per worker the real limit would be the rate times the
+# number of workers. NUM_PROXIES in REST_FRAMEWORK says how many
+# X-Forwarded-For entries to trust for the address. Turn STAGE_THROTTLE off on
+# servers that loadTest drives from a single address.
+STAGE_THROTTLE = env.bool("STAGE_THROTTLE", SHARED_CACHE)
+if STAGE_THROTTLE and not SHARED_CACHE:
+    raise ImproperlyConfigured("STAGE_THROTTLE needs a shared CACHE_URL")
+STAGE_THROTTLE_IP_RATE = env.float("STAGE_THROTTLE_IP_RATE", 10.0)
+STAGE_THROTTLE_IP_BURST = env.int("STAGE_THROTTLE_IP_BURST", 50)
+STAGE_THROTTLE_PERFORMER_RATE = env.float("STAGE_THROTTLE_PERFORMER_RATE", 50.0)
+STAGE_THROTTLE_PERFORMER_BURST = env.int("STAGE_THROTTLE_PERFORMER_BURST", 200)
+# Stages cached for STAGE_CACHE_SECONDS (0 turns the cache off), see
+# puppetshowapp.stage_cache, until their owner writes. Off by default without a
+# shared cache, where a write would only make the stages of the worker that
+# served it out of date. Only one request per stage rebuilds it after a miss,
+# while the others of the worker wait up to STAGE_COALESCE_WAIT seconds for it.
+# STAGE_COALESCE_SHARED extends that to the other workers, through a lock in
+# the default cache.
+STAGE_CACHE_SECONDS = env.int("STAGE_CACHE_SECONDS", 60 if SHARED_CACHE else 0)
+STAGE_COALESCE_WAIT = env.float("STAGE_COALESCE_WAIT", 2.0)
+STAGE_COALESCE_SHARED = env.bool("STAGE_COALESCE_SHARED", False)
 
 AUTH_USER_MODEL = "puppetshowapp.DiscordPointingUser"
 AUTH_USER_MODEL_MANAGER = "puppetshowapp.DiscordPointingUserManager"
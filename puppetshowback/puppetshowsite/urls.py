@@ -15,13 +15,19 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from puppetshowapp.views import authentication_views
+from puppetshowapp.admin import memory_report
+from puppetshowapp.views import authentication_views, ops_views
 from django.conf import settings
 from django.conf.urls.static import static
 from .views import RedirectToMainPageView
 
 urlpatterns = [
     path("", RedirectToMainPageView.as_view()),
+    path(
+        "admin-pages/memory/",
+        admin.site.admin_view(memory_report),
+        name="admin-memory",
+    ),
     path("admin-pages/", admin.site.urls),
     path("ps/", include("puppetshowapp.urls")),
     path("login/", authentication_views.login_redirect_discord),
@@ -29,6 +35,7 @@ urlpatterns = [
         "callback/", authentication_views.discord_user_callback, name="token-exchange"
     ),
     path("logout/", authentication_views.discord_user_logout),
+    path("metrics", ops_views.prometheus_metrics, name="metrics"),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)